@@ -0,0 +1,174 @@
+"""
+Constraint-aware allocation of a monthly amount across categories.
+
+allocate() splits a total in proportion to per-category weights, subject to
+floors (minimums), caps (maximums) and priorities:
+
+  1. Floors are funded first, higher priority first. If the money runs out
+     inside a priority level, that level's floors are scaled down evenly and
+     lower levels get nothing.
+  2. What is left goes to the highest priority level until every category
+     in it is capped, then to the next level, and so on.
+  3. Within a level, each category gets clip(level * weight, floor, cap) for
+     the one water level that spends the level's share. The level is found
+     by sorting the 2n points where categories start and stop rising and
+     walking them once, so a level of n categories costs O(n log n).
+  4. Amounts are rounded to cents with the largest-remainder method, so they
+     add up to the total to the cent (or to the sum of the caps when every
+     category is capped; the rest stays unallocated).
+
+Floors and caps are taken to the cent. A category with weight 0 gets its
+floor and nothing more. budget.allocate_variable_budget() is the special
+case of fixed weights with no floors, caps or priorities, and
+budget_vec.allocate_batch() is the columnar form for many totals at once.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import perf
+
+# Remainders are compared at this resolution (fractions of a cent) so ties are
+# broken by category order, the same way in allocate() and allocate_batch().
+REMAINDER_STEPS = 1_000_000
+
+
+def water_level(
+    budget: float, weights: Sequence[float], floors: Sequence[float], caps: Sequence[float]
+) -> float:
+    """
+    The level L with sum(clip(L * w, floor, cap)) == budget, for
+    sum(floors) <= budget <= what the categories can hold.
+    """
+    # Breakpoints: a category rises from its floor at floor/w and stops at cap/w.
+    events: List[Tuple[float, float]] = []
+    for w, lo, hi in zip(weights, floors, caps):
+        if w > 0:
+            events.append((lo / w, w))
+            events.append((hi / w, -w))
+    events.sort()
+
+    value = math.fsum(floors)
+    level = slope = 0.0
+    for at, change in events:
+        if slope > 0:
+            reached = value + slope * (at - level)
+            if reached >= budget:
+                break
+            value = reached
+        level = at
+        slope += change
+    if slope <= 0:
+        return level
+    return level + (budget - value) / slope
+
+
+def _fill(
+    budget: float, weights: Sequence[float], floors: Sequence[float], caps: Sequence[float]
+) -> List[float]:
+    level = water_level(budget, weights, floors, caps)
+    return [min(hi, max(lo, level * w)) for w, lo, hi in zip(weights, floors, caps)]
+
+
+def to_cents(amounts: Sequence[float], total_cents: int) -> List[int]:
+    """
+    Whole cents for each amount, adding up to total_cents: everything is
+    rounded down, then the missing cents go to the largest remainders.
+    """
+    scaled = [a * 100.0 for a in amounts]
+    base = [math.floor(v) for v in scaled]
+    missing = total_cents - sum(base)
+    if missing > 0:
+        keys = [-round((v - b) * REMAINDER_STEPS) for v, b in zip(scaled, base)]
+        # Largest remainder first; equal remainders in category order.
+        for i in sorted(range(len(base)), key=keys.__getitem__)[:missing]:
+            base[i] += 1
+    return base
+
+
+def allocate(
+    total: float,
+    weights: Dict[str, float],
+    floors: Optional[Dict[str, float]] = None,
+    caps: Optional[Dict[str, float]] = None,
+    priorities: Optional[Dict[str, int]] = None,
+) -> Dict[str, float]:
+    """
+    Splits `total` across the categories of `weights` (see the module
+    docstring). Missing floors are 0, missing caps unlimited, missing
+    priorities 0; a higher priority is funded first. Returns dollars to the
+    cent, in the order of `weights`.
+    """
+    names = list(weights)
+    if total <= 0 or not names:
+        return {name: 0.0 for name in names}
+    total = float(total)
+    w = [max(0.0, float(v)) for v in weights.values()]
+
+    if not floors and not caps and len(set((priorities or {}).values())) <= 1:
+        # Plain proportional split: the water level is total / sum(weights).
+        weight_sum = math.fsum(w)
+        if weight_sum <= 0:
+            return {name: 0.0 for name in names}
+        x = [total * v / weight_sum for v in w]
+        cents = to_cents(x, round(total * 100.0))
+        return {name: c / 100.0 for name, c in zip(names, cents)}
+
+    floors = floors or {}
+    caps = caps or {}
+    priorities = priorities or {}
+    lo = [round(max(0.0, float(floors.get(n, 0.0))), 2) for n in names]
+    hi = [max(l, round(float(caps.get(n, math.inf)), 2)) for n, l in zip(names, lo)]
+    x = allocate_levels(total, w, lo, hi, [priorities.get(n, 0) for n in names])
+
+    allocated = min(total, math.fsum(x))
+    cents = to_cents(x, round(allocated * 100.0))
+    return {name: c / 100.0 for name, c in zip(names, cents)}
+
+
+def allocate_levels(
+    total: float, weights: List[float], floors: List[float], caps: List[float], priorities: Sequence[int]
+) -> List[float]:
+    """allocate() before cent rounding, on parallel lists."""
+    n = len(weights)
+    if len(set(priorities)) <= 1:
+        levels = [list(range(n))]
+    else:
+        by_priority: Dict[int, List[int]] = {}
+        for i, p in enumerate(priorities):
+            by_priority.setdefault(p, []).append(i)
+        levels = [by_priority[p] for p in sorted(by_priority, reverse=True)]
+
+    x = [0.0] * n
+    remaining = total
+
+    # 1) Floors, highest priority first.
+    for members in levels:
+        need = math.fsum(floors[i] for i in members)
+        if need <= 0:
+            continue
+        share = 1.0 if remaining >= need else remaining / need
+        for i in members:
+            x[i] = floors[i] * share
+        remaining = max(0.0, remaining - need)
+        if share < 1.0:
+            return x
+
+    # 2) The rest, a level at a time, up to the caps.
+    for members in levels:
+        if remaining <= 0:
+            break
+        w = [weights[i] for i in members]
+        lo = [floors[i] for i in members]
+        hi = [caps[i] for i in members]
+        room = math.fsum(h - l for h, l, wi in zip(hi, lo, w) if wi > 0)
+        give = min(remaining, room)
+        if give <= 0:
+            continue
+        for i, v in zip(members, _fill(math.fsum(lo) + give, w, lo, hi)):
+            x[i] = v
+        remaining -= give
+    return x
+
+
+# Only allocate() gets a span; the helpers run once per priority level.
+perf.instrument(globals(), "allocation", skip=("water_level", "to_cents", "allocate_levels"))
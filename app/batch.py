@@ -0,0 +1,197 @@
+"""
+Headless batch budgeting.
+
+Computes the Advice tab's payload (income, fixed totals, savings target,
+discretionary money, variable targets, warnings) for many households and
+streams one JSON line per household, in input order.
+
+Inputs are JSONL files, one household per line:
+
+    {"id": "h1", "profile": {...}, "incomes": [{"amount": 2000, "frequency": "biweekly"}],
+     "expenses": [{"amount": 1200, "frequency": "monthly", "category": "Rent"}]}
+
+or TrueBudget SQLite databases, one household each (id = file name). The
+profile uses the columns of the profile table and may be omitted.
+
+Work is cut into chunks of raw lines (or database paths) that are parsed,
+computed and serialized in a process pool, so the parent only moves
+strings. With --advice each payload is also sent to Ollama through
+llm.generate_advice(), so answers already in the advice cache are reused.
+
+Usage: python app/batch.py households.jsonl [more.jsonl | db.sqlite3 ...] [-o out.jsonl]
+                           [--workers N] [--chunk 500] [--advice] [--model llama3.1:8b]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from budget import advice_payload, household_payload
+from db import get_profile, read_totals
+
+CHUNK_SIZE = 500
+SQLITE_SUFFIXES = (".sqlite3", ".sqlite", ".db")
+
+# ("jsonl", source, first line number, lines) or ("sqlite", "", 0, paths)
+Task = Tuple[str, str, int, List[str]]
+
+
+#  Workers
+def _jsonl_household(line: str) -> Dict[str, Any]:
+    h = json.loads(line)
+    return {"id": h.get("id"), "payload": household_payload(h.get("profile"), h.get("incomes") or [], h.get("expenses") or [])}
+
+
+def _sqlite_household(path: str) -> Dict[str, Any]:
+    # Read-only: a nightly run never migrates or locks a household's database.
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+            # Never opened by this version of the app, so no monthly_amount column yet.
+            incomes = [dict(r) for r in conn.execute("SELECT amount, frequency FROM income_sources")]
+            expenses = [dict(r) for r in conn.execute("SELECT amount, frequency, category FROM expenses")]
+            payload = household_payload(get_profile(conn), incomes, expenses)
+        else:
+            payload = advice_payload(get_profile(conn), *read_totals(conn))
+        return {"id": Path(path).stem, "payload": payload}
+    finally:
+        conn.close()
+
+
+def run_chunk(task: Task) -> List[str]:
+    """Computes one chunk; a bad household becomes an error line instead of failing the chunk."""
+    kind, source, first, items = task
+    out = []
+    for n, item in enumerate(items):
+        if kind == "jsonl" and not item.strip():
+            continue
+        try:
+            record = _jsonl_household(item) if kind == "jsonl" else _sqlite_household(item)
+        except Exception as e:
+            where = {"source": source, "line": first + n} if kind == "jsonl" else {"source": item}
+            record = {**where, "error": f"{type(e).__name__}: {e}"}
+        out.append(json.dumps(record, separators=(",", ":")))
+    return out
+
+
+#  Input
+def _jsonl_tasks(f: IO[str], source: str, chunk: int) -> Iterator[Task]:
+    line_no = 1
+    while True:
+        lines = list(islice(f, chunk))
+        if not lines:
+            return
+        yield "jsonl", source, line_no, lines
+        line_no += len(lines)
+
+
+def read_tasks(inputs: Iterable[str], chunk: int = CHUNK_SIZE) -> Iterator[Task]:
+    """Chunks of work from JSONL files ("-" = stdin) and SQLite databases, in input order."""
+    paths: List[str] = []
+    for name in inputs:
+        if name.endswith(SQLITE_SUFFIXES):
+            paths.append(name)
+            if len(paths) == chunk:
+                yield "sqlite", "", 0, paths
+                paths = []
+            continue
+        if paths:
+            yield "sqlite", "", 0, paths
+            paths = []
+        if name == "-":
+            yield from _jsonl_tasks(sys.stdin, "<stdin>", chunk)
+        else:
+            with open(name, encoding="utf-8") as f:
+                yield from _jsonl_tasks(f, name, chunk)
+    if paths:
+        yield "sqlite", "", 0, paths
+
+
+#  Pipeline
+def run(tasks: Iterable[Task], workers: int) -> Iterator[str]:
+    """Result lines in input order. Only a few chunks per worker are in flight at once."""
+    if workers <= 1:
+        for task in tasks:
+            yield from run_chunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Future] = deque()
+        for task in tasks:
+            pending.append(pool.submit(run_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def with_advice(lines: Iterable[str], model: str, workers: int) -> Iterator[str]:
+    """Adds an "advice" (or "advice_error") field to every computed household, keeping order."""
+    from llm import generate_advice
+
+    def advise(line: str) -> str:
+        record = json.loads(line)
+        if "payload" in record:
+            try:
+                record["advice"] = generate_advice(record["payload"], model)
+            except Exception as e:
+                record["advice_error"] = f"{type(e).__name__}: {e}"
+        return json.dumps(record, separators=(",", ":"))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-advice") as pool:
+        pending: Deque[Future] = deque()
+        for line in lines:
+            pending.append(pool.submit(advise, line))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="JSONL files (- for stdin) and/or TrueBudget databases")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="households per task")
+    parser.add_argument("--advice", action="store_true", help="also generate advice with the local model")
+    parser.add_argument("--model", default=None, help="Ollama model for --advice")
+    parser.add_argument("--advice-workers", type=int, default=1, help="concurrent Ollama requests")
+    args = parser.parse_args(argv)
+
+    lines = run(read_tasks(args.inputs, args.chunk), args.workers)
+    if args.advice:
+        from llm import DEFAULT_MODEL
+
+        lines = with_advice(lines, args.model or DEFAULT_MODEL, args.advice_workers)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.perf_counter()
+    count = errors = 0
+    try:
+        for line in lines:
+            out.write(line + "\n")
+            count += 1
+            errors += '"error":' in line
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{count:,} households in {elapsed:.2f}s ({count / elapsed if elapsed else 0:,.0f} profiles/sec, "
+        f"{args.workers} workers, {errors:,} errors)",
+        file=sys.stderr,
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+import perf
+from allocation import allocate
 
 
 FREQ_TO_MONTHLY = {
@@ -53,6 +56,7 @@ def allocate_variable_budget(discretionary: float, focus_categories: List[str])
     """
     Allocate discretionary money across variable categories.
     If the user selected focus categories, slightly boost those weights.
+    The fixed-weight case of allocation.allocate(): amounts add up to the cent.
     """
     if discretionary <= 0:
         return {k: 0.0 for k in DEFAULT_VARIABLE_WEIGHTS.keys()}
@@ -69,7 +73,7 @@ def allocate_variable_budget(discretionary: float, focus_categories: List[str])
     total_w = sum(weights.values())
     weights = {k: v / total_w for k, v in weights.items()}
 
-    return {k: round(discretionary * w, 2) for k, w in weights.items()}
+    return allocate(discretionary, weights)
 
 
 def warnings(monthly_income: float, fixed_total: float, savings_target: float) -> List[str]:
@@ -89,3 +93,50 @@ def warnings(monthly_income: float, fixed_total: float, savings_target: float) -
         w.append(f"Your fixed expenses + savings goal exceed income by about ${gap:.2f}/month.")
 
     return w
+
+
+def focus_categories(profile: Optional[dict]) -> List[str]:
+    """The profile's comma-separated focus categories as a list."""
+    return [x.strip() for x in ((profile or {}).get("focus_categories") or "").split(",") if x.strip()]
+
+
+def advice_payload(
+    profile: Optional[dict], monthly_income: float, fixed_total: float, fixed_by_cat: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Everything the Advice tab hands the model, from a saved profile (or None)
+    and monthly totals. The UI and the batch runner both build it here.
+    """
+    prof = profile or {}
+    goal_type = prof.get("savings_goal_type", "amount")
+    goal_value = float(prof.get("savings_goal_value", 0.0))
+    savings_target = compute_savings_target(monthly_income, goal_type, goal_value)
+
+    discretionary = round(monthly_income - fixed_total - savings_target, 2)
+
+    focus_list = focus_categories(prof)
+
+    return {
+        "location": prof.get("location", ""),
+        "monthly_income": monthly_income,
+        "fixed_expenses_total": fixed_total,
+        "fixed_expenses_by_category": fixed_by_cat,
+        "savings_goal_type": goal_type,
+        "savings_goal_value": goal_value,
+        "savings_target_monthly": savings_target,
+        "discretionary_left": discretionary,
+        "focus_categories": focus_list,
+        "suggested_variable_targets": allocate_variable_budget(max(discretionary, 0.0), focus_list),
+        "warnings": warnings(monthly_income, fixed_total, savings_target),
+        "note": "The app computed all numbers. Use these numbers exactly.",
+    }
+
+
+def household_payload(profile: Optional[dict], incomes: List[dict], expenses: List[dict]) -> Dict[str, Any]:
+    """advice_payload() straight from income and expense rows (amount, frequency[, category])."""
+    fixed_total, fixed_by_cat = summarize_fixed_expenses(expenses)
+    return advice_payload(profile, summarize_income(incomes), fixed_total, fixed_by_cat)
+
+
+# to_monthly runs once per row inside the summarize_* calls, which are timed instead.
+perf.instrument(globals(), "budget", skip=("to_monthly",))
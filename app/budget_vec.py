@@ -0,0 +1,344 @@
+"""
+Columnar versions of the budget.py functions.
+
+Items are passed as parallel arrays (amounts, frequency codes, category codes
+and optionally a profile id per item) so whole ledgers, or many households at
+once, are summarized in a handful of NumPy passes. Results match budget.py
+bit for bit: group sums use np.bincount, which accumulates in item order
+exactly like the Python loops, and cent rounding falls back to round() for
+values that sit on a half cent. allocate_batch() is allocation.allocate()
+for many totals at once and gives the same cents.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from allocation import REMAINDER_STEPS
+from budget import DEFAULT_VARIABLE_WEIGHTS, FREQ_TO_MONTHLY
+
+FREQUENCIES: Tuple[str, ...] = tuple(FREQ_TO_MONTHLY)
+FREQ_FACTORS = np.array([FREQ_TO_MONTHLY[f] for f in FREQUENCIES], dtype=np.float64)
+
+VARIABLE_CATEGORIES: Tuple[str, ...] = tuple(DEFAULT_VARIABLE_WEIGHTS)
+VARIABLE_WEIGHTS = np.array([DEFAULT_VARIABLE_WEIGHTS[c] for c in VARIABLE_CATEGORIES], dtype=np.float64)
+FOCUS_BOOST = 0.08
+
+
+#  Encoding
+def encode(values: Sequence[str], vocabulary: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Dictionary-encodes strings. Returns (codes, vocabulary); unseen values are
+    appended to a copy of the given vocabulary.
+    """
+    vocab = list(vocabulary or [])
+    index = {v: i for i, v in enumerate(vocab)}
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, v in enumerate(values):
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(vocab)
+            vocab.append(v)
+        codes[i] = code
+    return codes, vocab
+
+
+def encode_frequencies(frequencies: Sequence[str]) -> np.ndarray:
+    codes, vocab = encode(frequencies, FREQUENCIES)
+    if len(vocab) > len(FREQUENCIES):
+        raise ValueError(f"Unknown frequency: {vocab[len(FREQUENCIES)]}")
+    return codes
+
+
+def columns_from_records(
+    records: Sequence[dict], categories: Optional[Sequence[str]] = None
+) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], List[str]]:
+    """Converts db.list_income()/list_expenses() rows to (amounts, freq_codes, category_codes, categories)."""
+    amounts = np.fromiter((float(r["amount"]) for r in records), dtype=np.float64, count=len(records))
+    freq_codes = encode_frequencies([r["frequency"] for r in records])
+    if records and "category" in records[0]:
+        cat_codes, vocab = encode([r["category"] for r in records], categories)
+        return amounts, freq_codes, cat_codes, vocab
+    return amounts, freq_codes, None, list(categories or [])
+
+
+#  Core math
+def round_cents(values: np.ndarray) -> np.ndarray:
+    """Vectorized round(x, 2) with identical results."""
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100.0
+    out = np.rint(scaled) / 100.0
+    # x * 100 carries rounding error, so values within a few ulps of a half
+    # cent may land on the wrong side; let Python's correctly rounded round() decide.
+    frac = scaled - np.floor(scaled)
+    tol = np.maximum(1e-9, np.abs(scaled) * 1e-15)
+    near = np.abs(frac - 0.5) <= tol
+    if near.any():
+        out[near] = [round(float(v), 2) for v in values[near]]
+    return out
+
+
+def monthly_amounts(amounts: np.ndarray, freq_codes: np.ndarray) -> np.ndarray:
+    return np.asarray(amounts, dtype=np.float64) * FREQ_FACTORS[freq_codes]
+
+
+def _profiles(n_items: int, profile_ids: Optional[np.ndarray], n_profiles: Optional[int]) -> Tuple[np.ndarray, int]:
+    if profile_ids is None:
+        return np.zeros(n_items, dtype=np.int64), 1 if n_profiles is None else n_profiles
+    profile_ids = np.asarray(profile_ids, dtype=np.int64)
+    if n_profiles is None:
+        n_profiles = int(profile_ids.max()) + 1 if len(profile_ids) else 0
+    return profile_ids, n_profiles
+
+
+def income_totals(
+    amounts: np.ndarray,
+    freq_codes: np.ndarray,
+    profile_ids: Optional[np.ndarray] = None,
+    n_profiles: Optional[int] = None,
+) -> np.ndarray:
+    """summarize_income() per profile; shape (n_profiles,)."""
+    pids, n = _profiles(len(amounts), profile_ids, n_profiles)
+    return np.bincount(pids, weights=monthly_amounts(amounts, freq_codes), minlength=n)
+
+
+def fixed_totals(
+    amounts: np.ndarray,
+    freq_codes: np.ndarray,
+    category_codes: np.ndarray,
+    n_categories: int,
+    profile_ids: Optional[np.ndarray] = None,
+    n_profiles: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    summarize_fixed_expenses() per profile.
+    Returns:
+      totals (n_profiles,), category_totals (n_profiles, n_categories)
+    """
+    pids, n = _profiles(len(amounts), profile_ids, n_profiles)
+    monthly = monthly_amounts(amounts, freq_codes)
+    totals = np.bincount(pids, weights=monthly, minlength=n)
+    cells = pids * n_categories + np.asarray(category_codes, dtype=np.int64)
+    by_cat = np.bincount(cells, weights=monthly, minlength=n * n_categories).reshape(n, n_categories)
+    return totals, by_cat
+
+
+def category_dict(category_totals: np.ndarray, categories: Sequence[str], present: Optional[np.ndarray] = None) -> Dict[str, float]:
+    """One profile's row of category totals as the dict summarize_fixed_expenses() returns."""
+    if present is None:
+        present = category_totals != 0
+    return {c: float(v) for c, v, p in zip(categories, category_totals, present) if p}
+
+
+def savings_targets(monthly_income: np.ndarray, goal_is_percent: np.ndarray, goal_value: np.ndarray) -> np.ndarray:
+    """compute_savings_target() per profile."""
+    goal_value = np.asarray(goal_value, dtype=np.float64)
+    by_percent = np.asarray(monthly_income, dtype=np.float64) * (goal_value / 100.0)
+    return np.maximum(0.0, np.where(goal_is_percent, by_percent, goal_value))
+
+
+def focus_counts(focus_lists: Sequence[Sequence[str]]) -> np.ndarray:
+    """How often each variable category appears in each profile's focus list; shape (n_profiles, n_categories)."""
+    index = {c: i for i, c in enumerate(VARIABLE_CATEGORIES)}
+    counts = np.zeros((len(focus_lists), len(VARIABLE_CATEGORIES)), dtype=np.int64)
+    for p, focus in enumerate(focus_lists):
+        for c in focus:
+            if c in index:
+                counts[p, index[c]] += 1
+    return counts
+
+
+def variable_weights(counts: np.ndarray) -> np.ndarray:
+    """Normalized allocate_variable_budget() weights per profile."""
+    counts = np.asarray(counts)
+    weights = np.broadcast_to(VARIABLE_WEIGHTS, counts.shape).copy()
+    # Add the boost once per mention, in sequence, as the Python loop does.
+    for k in range(int(counts.max()) if counts.size else 0):
+        weights += np.where(counts > k, FOCUS_BOOST, 0.0)
+    total = weights[:, 0].copy()
+    for j in range(1, weights.shape[1]):
+        total += weights[:, j]
+    return weights / total[:, None]
+
+
+def allocate_variable_budgets(discretionary: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """allocate_variable_budget() per profile; shape (n_profiles, len(VARIABLE_CATEGORIES))."""
+    return allocate_batch(discretionary, variable_weights(counts))
+
+
+#  Allocation engine
+def water_levels(budgets: np.ndarray, weights: np.ndarray, floors: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """allocation.water_level() per row of (P, K) weights/floors/caps; shape (P,)."""
+    rising = weights > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at = np.concatenate([np.where(rising, floors / weights, np.inf), np.where(rising, caps / weights, np.inf)], axis=1)
+    change = np.concatenate([np.where(rising, weights, 0.0), np.where(rising, -weights, 0.0)], axis=1)
+    order = np.argsort(at, axis=1, kind="stable")
+    at = np.take_along_axis(at, order, axis=1)
+    slope = np.cumsum(np.take_along_axis(change, order, axis=1), axis=1)  # slope after each breakpoint
+
+    # Total at each breakpoint, walking them in order like the scalar loop.
+    with np.errstate(invalid="ignore"):
+        step = np.where(slope[:, :-1] > 0, slope[:, :-1] * (at[:, 1:] - at[:, :-1]), 0.0)
+    values = np.concatenate([np.zeros((len(at), 1)), np.cumsum(step, axis=1)], axis=1) + floors.sum(axis=1)[:, None]
+
+    reached = values[:, 1:] >= budgets[:, None]
+    found = reached.any(axis=1)
+    j = np.where(found, reached.argmax(axis=1), at.shape[1] - 1)
+    rows = np.arange(len(at))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level = at[rows, j] + (budgets - values[rows, j]) / slope[rows, j]
+    # Not reached: everything is at its cap, which the last finite breakpoint already gives.
+    last = np.where(np.isfinite(at), at, -np.inf).max(axis=1, initial=0.0)
+    return np.where(found & (slope[rows, j] > 0), level, last)
+
+
+def cents_batch(amounts: np.ndarray, total_cents: np.ndarray) -> np.ndarray:
+    """allocation.to_cents() per row; whole cents, shape (P, K)."""
+    scaled = amounts * 100.0
+    base = np.floor(scaled)
+    missing = total_cents - base.sum(axis=1)
+    keys = np.rint((scaled - base) * REMAINDER_STEPS)
+    order = np.argsort(-keys, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(amounts.shape[1])[None, :].repeat(len(amounts), axis=0), axis=1)
+    return base + (rank < missing[:, None])
+
+
+def allocate_batch(
+    totals: np.ndarray,
+    weights: np.ndarray,
+    floors: Optional[np.ndarray] = None,
+    caps: Optional[np.ndarray] = None,
+    priorities: Optional[Sequence[int]] = None,
+) -> np.ndarray:
+    """
+    allocation.allocate() for every total at once, e.g. many profiles or a
+    scenario grid. weights, floors and caps are (K,) or (P, K); priorities
+    (K,) are shared by all rows. Returns dollars to the cent, shape (P, K).
+    """
+    totals = np.asarray(totals, dtype=np.float64)
+    n = len(totals)
+    w = np.maximum(np.asarray(weights, dtype=np.float64), 0.0)
+    k = w.shape[-1]
+    if w.ndim == 1 and floors is None and caps is None and (priorities is None or len(set(priorities)) <= 1):
+        # allocate()'s plain proportional split, the same operations on every row at once.
+        weight_sum = math.fsum(w.tolist())
+        if weight_sum <= 0:
+            return np.zeros((n, k))
+        out = cents_batch(totals[:, None] * w[None, :] / weight_sum, np.rint(totals * 100.0)) / 100.0
+        out[totals <= 0] = 0.0
+        return out
+    w = np.broadcast_to(w, (n, k))
+    with np.errstate(invalid="ignore"):
+        lo = np.broadcast_to(round_cents(np.maximum(0.0, floors if floors is not None else 0.0)), (n, k))
+        hi = np.broadcast_to(np.maximum(lo, round_cents(caps) if caps is not None else np.inf), (n, k))
+
+    if priorities is None or len(set(priorities)) <= 1:
+        levels = [np.arange(k)]
+    else:
+        p = np.asarray(priorities)
+        levels = [np.flatnonzero(p == v) for v in sorted(set(p.tolist()), reverse=True)]
+
+    x = np.zeros((n, k))
+    remaining = np.maximum(totals, 0.0)
+
+    # 1) Floors, highest priority first. Once a level runs short nothing is left for the next.
+    for m in levels:
+        need = lo[:, m].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = np.where(remaining >= need, 1.0, remaining / need)
+        x[:, m] = np.where((need > 0)[:, None], lo[:, m] * share[:, None], 0.0)
+        remaining = np.where(need > 0, np.maximum(0.0, remaining - need), remaining)
+
+    # 2) The rest, a level at a time, up to the caps.
+    for m in levels:
+        wm, lm, hm = w[:, m], lo[:, m], hi[:, m]
+        room = np.where(wm > 0, hm - lm, 0.0).sum(axis=1)
+        give = np.minimum(remaining, room)
+        rows = np.flatnonzero(give > 0)
+        if not len(rows):
+            continue
+        level = water_levels(lm[rows].sum(axis=1) + give[rows], wm[rows], lm[rows], hm[rows])
+        with np.errstate(invalid="ignore"):
+            rising = np.where(wm[rows] > 0, level[:, None] * wm[rows], 0.0)
+        x[rows[:, None], m] = np.minimum(hm[rows], np.maximum(lm[rows], rising))
+        remaining[rows] -= give[rows]
+
+    allocated = np.minimum(totals, x.sum(axis=1))
+    out = cents_batch(x, np.rint(allocated * 100.0)) / 100.0
+    out[totals <= 0] = 0.0
+    return out
+
+
+def warning_lists(monthly_income: np.ndarray, fixed_total: np.ndarray, savings_target: np.ndarray) -> List[List[str]]:
+    """warnings() per profile. Flags are computed in bulk; strings are only built where needed."""
+    income = np.asarray(monthly_income, dtype=np.float64)
+    fixed = np.asarray(fixed_total, dtype=np.float64)
+    savings = np.asarray(savings_target, dtype=np.float64)
+
+    no_income = income <= 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fixed_pct = (fixed / income) * 100.0
+    need = fixed + savings
+    over = need > income
+
+    out: List[List[str]] = [[] for _ in range(len(income))]
+    for p in np.flatnonzero(no_income | (fixed_pct > 45) | over):
+        out[p] = warning_text(float(income[p]), float(fixed_pct[p]), float(need[p] - income[p]))
+    return out
+
+
+def warning_text(monthly_income: float, fixed_pct: float, gap: float) -> List[str]:
+    """
+    warnings() for one profile from its precomputed numbers: fixed_pct is
+    fixed / income * 100 and gap is (fixed + savings) - income.
+    """
+    if monthly_income <= 0:
+        return ["No income entered yet. Add at least one income source."]
+    w = []
+    if fixed_pct > 60:
+        w.append(f"Fixed expenses are {fixed_pct:.0f}% of income. That’s high; flexibility may be limited.")
+    elif fixed_pct > 45:
+        w.append(f"Fixed expenses are {fixed_pct:.0f}% of income. Watch discretionary spending carefully.")
+    if gap > 0:
+        w.append(f"Your fixed expenses + savings goal exceed income by about ${gap:.2f}/month.")
+    return w
+
+
+#  Whole-budget evaluation
+def evaluate(
+    income_amounts: np.ndarray,
+    income_freq_codes: np.ndarray,
+    expense_amounts: np.ndarray,
+    expense_freq_codes: np.ndarray,
+    expense_category_codes: np.ndarray,
+    n_categories: int,
+    goal_is_percent: np.ndarray,
+    goal_value: np.ndarray,
+    focus: np.ndarray,
+    income_profile_ids: Optional[np.ndarray] = None,
+    expense_profile_ids: Optional[np.ndarray] = None,
+    n_profiles: Optional[int] = None,
+) -> Dict[str, object]:
+    """
+    Everything the Dashboard/Advice tabs derive from the inputs, for every
+    profile at once. `focus` is the focus_counts() matrix.
+    """
+    if n_profiles is None:
+        n_profiles = len(np.atleast_1d(goal_value))
+    monthly_income = income_totals(income_amounts, income_freq_codes, income_profile_ids, n_profiles)
+    fixed_total, fixed_by_cat = fixed_totals(
+        expense_amounts, expense_freq_codes, expense_category_codes, n_categories, expense_profile_ids, n_profiles
+    )
+    savings = savings_targets(monthly_income, goal_is_percent, goal_value)
+    discretionary = round_cents(monthly_income - fixed_total - savings)
+    return {
+        "monthly_income": monthly_income,
+        "fixed_total": fixed_total,
+        "fixed_by_category": fixed_by_cat,
+        "savings_target": savings,
+        "discretionary": discretionary,
+        "variable_alloc": allocate_variable_budgets(np.maximum(discretionary, 0.0), focus),
+        "warnings": warning_lists(monthly_income, fixed_total, savings),
+    }
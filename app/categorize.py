@@ -0,0 +1,280 @@
+"""
+Rule-based transaction categorization.
+
+A rule (db.category_rules) gives its category to transactions whose
+description contains its text ("contains") or starts with it ("prefix"),
+or, for "amount" rules, to any transaction; every rule can also require the
+amount's size to be in [min_amount, max_amount], so refunds match like
+purchases. Text is compared case-insensitively with runs of whitespace
+collapsed. When several rules match, the highest priority wins, then the
+longest text, then the oldest rule.
+
+RuleIndex compiles the text rules into one Aho-Corasick automaton, so a
+description is scanned once however many rules there are; a prefix rule is
+a match that starts at 0. Rule edits are applied from db.rule_changes()
+without recompiling: new and edited rules go to a short list that is
+checked directly and removed ones are masked, until COMPACT_AT edits have
+piled up and the automaton is rebuilt. The candidate rules of each
+description are memoized, since bank exports repeat the same merchants.
+
+get_index() keeps one index per database and brings it up to date with one
+query, rebuilding it if the edits it missed were pruned from the log. The
+importer fills missing categories with categorize_rows(), and apply_rules()
+recategorizes stored transactions a chunk at a time, writing only the rows
+that change in one executemany per chunk, then prunes the applied log.
+"""
+import threading
+from collections import deque
+from itertools import chain
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import db
+import perf
+
+COMPACT_AT = 64        # pending rule edits before the automaton is rebuilt
+MEMO_SIZE = 100_000    # descriptions whose candidate rules are remembered
+CHUNK_ROWS = 50_000
+KINDS = ("contains", "prefix", "amount")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class Rule(NamedTuple):
+    id: int
+    kind: str
+    pattern: str  # normalized
+    category: str
+    min_amount: Optional[float]
+    max_amount: Optional[float]
+    priority: int
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Rule":
+        pattern = "" if row["kind"] == "amount" else normalize(row["pattern"] or "")
+        return cls(
+            row["id"], row["kind"], pattern, row["category"], row["min_amount"], row["max_amount"],
+            row["priority"] or 0,
+        )
+
+    def fits(self, amount: float) -> bool:
+        size = abs(amount)
+        return (self.min_amount is None or size >= self.min_amount) and (
+            self.max_amount is None or size <= self.max_amount
+        )
+
+
+class Automaton:
+    """Aho-Corasick matcher over (pattern, value) pairs."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[Tuple[Any, int]]] = [[]]
+        for pattern, value in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append((value, len(pattern)))
+
+        # Failure links breadth first; each node also reports its suffixes' matches.
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str) -> List[Tuple[Any, int]]:
+        """(value, start) for every occurrence of every pattern in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: List[Tuple[Any, int]] = []
+        node = 0
+        for i, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.extend((value, i - length) for value, length in out[node])
+        return hits
+
+
+class RuleIndex:
+    """
+    Compiled rules as of `version` of the rule log. Safe to share between
+    threads: edits swap in new structures instead of changing ones in use.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = (), version: int = 0) -> None:
+        self.version = version
+        self.rules: Dict[int, Rule] = {r.id: r for r in rules}
+        self.compactions = 0
+        self.compact()
+
+    def compact(self) -> None:
+        """Rebuilds the automaton from every current text rule."""
+        text = [r for r in self.rules.values() if r.pattern]
+        self._compiled = {r.id for r in text}
+        always = sorted((r for r in self.rules.values() if not r.pattern), key=_rank)
+        # (automaton, text rules not in it yet, its rules deleted or edited since,
+        #  amount-only rules, memo), swapped as a whole so readers see one version.
+        self._state = (Automaton((r.pattern, r) for r in text), (), frozenset(), tuple(always), {})
+        self.compactions += 1
+
+    @property
+    def pending(self) -> int:
+        """Edits not yet compiled into the automaton."""
+        return len(self._state[1]) + len(self._state[2])
+
+    def apply(self, changes: Dict[int, Optional[Rule]], version: int) -> None:
+        """Applies {rule id: new rule, or None if deleted} as of `version`."""
+        automaton, added, removed, always, _ = self._state
+        added = [r for r in added if r.id not in changes]
+        removed = set(removed)
+        always_changed = False
+        for rule_id, rule in changes.items():
+            old = self.rules.pop(rule_id, None)
+            if rule_id in self._compiled:
+                removed.add(rule_id)
+            always_changed |= old is not None and not old.pattern
+            if rule is None:
+                continue
+            self.rules[rule_id] = rule
+            if rule.pattern:
+                added.append(rule)
+            else:
+                always_changed = True
+        self.version = version
+        if len(added) + len(removed) > COMPACT_AT:
+            self.compact()
+            return
+        if always_changed:
+            always = tuple(sorted((r for r in self.rules.values() if not r.pattern), key=_rank))
+        self._state = (automaton, tuple(added), frozenset(removed), always, {})
+
+    def candidates(self, description: str) -> Tuple[Rule, ...]:
+        """Rules whose text matches `description`, plus the amount-only rules, best first."""
+        automaton, added, removed, always, memo = self._state
+        found = memo.get(description)
+        if found is not None:
+            return found
+        text = normalize(description)
+        matched: Dict[int, Rule] = {}
+        for rule, start in automaton.find(text):
+            if (start == 0 or rule.kind != "prefix") and rule.id not in removed:
+                matched[rule.id] = rule
+        for rule in added:
+            if text.startswith(rule.pattern) if rule.kind == "prefix" else rule.pattern in text:
+                matched[rule.id] = rule
+        found = tuple(sorted(chain(matched.values(), always), key=_rank)) if matched else always
+        if len(memo) >= MEMO_SIZE:
+            memo.clear()
+        memo[description] = found
+        return found
+
+    def match(self, description: str, amount: float) -> Optional[Rule]:
+        """The winning rule for one transaction, or None."""
+        for rule in self.candidates(description or ""):
+            if rule.fits(amount):
+                return rule
+        return None
+
+    def categorize(self, descriptions: Sequence[str], amounts: Sequence[float]) -> List[Optional[Rule]]:
+        """match() over parallel columns."""
+        match = self.match
+        return [match(d, a) for d, a in zip(descriptions, amounts)]
+
+    def categorize_rows(self, rows: List[tuple]) -> List[tuple]:
+        """
+        Importer rows (date, description, amount, category, account,
+        fingerprint) with the rule id appended; rows without a category get
+        the winning rule's.
+        """
+        match = self.match
+        out = []
+        for row in rows:
+            rule = None if row[3] else match(row[1], row[2])
+            out.append(row + (None,) if rule is None else row[:3] + (rule.category,) + row[4:] + (rule.id,))
+        return out
+
+
+def _rank(rule: Rule) -> Tuple[int, int, int]:
+    # Best rule first.
+    return (-rule.priority, -len(rule.pattern), rule.id)
+
+
+_indexes: Dict[str, RuleIndex] = {}
+_pruned: Dict[str, int] = {}  # rule log version each database was last pruned up to
+_lock = threading.Lock()
+
+
+def get_index() -> RuleIndex:
+    """The current database's rule index, updated with the rule edits logged since it was last used."""
+    path = str(db.DB_PATH)
+    with _lock:
+        index = _indexes.get(path)
+        version, changes, full = db.rule_changes(index.version if index is not None else 0)
+        if index is None or full:
+            index = _indexes[path] = RuleIndex((Rule.from_row(r) for r in changes.values()), version)
+        elif version != index.version:
+            index.apply({i: Rule.from_row(r) if r else None for i, r in changes.items()}, version)
+        return index
+
+
+def apply_rules(chunk_rows: int = CHUNK_ROWS) -> Dict[str, int]:
+    """
+    Runs the rules over stored transactions that are uncategorized or were
+    categorized by a rule; categories from a bank file or typed in are kept.
+    A transaction whose rule no longer matches loses its category. Returns
+    {"scanned", "changed"}.
+    """
+    index = get_index()
+    scanned = changed = 0
+    pending = None
+    after = 0
+    while True:
+        rows = db.rule_targets(after, chunk_rows)
+        if not rows:
+            break
+        after = rows[-1][0]
+        scanned += len(rows)
+        match = index.match
+        updates = []
+        for tid, description, amount, category, rule_id in rows:
+            rule = match(description, amount)
+            new = (None, None) if rule is None else (rule.category, rule.id)
+            if new != (category, rule_id):
+                updates.append(new + (tid,))
+        if updates:
+            # Read and match the next chunk while the writer commits this one.
+            if pending is not None:
+                changed += pending.result()
+            pending = db.set_transaction_categories(updates, wait=False)
+    if pending is not None:
+        changed += pending.result()
+    # The log is only needed to catch up indexes; drop what this one has applied.
+    path = str(db.DB_PATH)
+    if _pruned.get(path) != index.version:
+        db.prune_rule_log(index.version)
+        _pruned[path] = index.version
+    return {"scanned": scanned, "changed": changed}
+
+
+# Per-transaction methods stay unwrapped; get_index() and apply_rules() get spans.
+perf.instrument(globals(), "categorize", skip=("normalize",))
@@ -0,0 +1,220 @@
+"""
+Dashboard figures, memoized on the numbers they show.
+
+Each builder fingerprints its inputs (the aggregates, not the figure) and
+returns the figure built last time for the same fingerprint, so an
+unchanged chart skips both DataFrame and Plotly construction. The cache is
+a small LRU shared by every session. Returned figures are shared too:
+don't mutate them.
+
+Identical figures also serialize to identical specs, which lets
+Streamlit's message cache send a reference instead of the spec again (see
+.streamlit/config.toml).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+import perf
+
+FIGURE_CACHE_SIZE = 64
+
+_figures: "OrderedDict[str, go.Figure]" = OrderedDict()
+_lock = threading.Lock()
+_stats: Dict[str, Any] = {"hits": 0, "misses": 0, "evictions": 0, "build_seconds": 0.0, "builds": {}}
+
+
+def _encode(part: Any) -> bytes:
+    if isinstance(part, np.ndarray):
+        return f"{part.dtype}{part.shape}".encode() + np.ascontiguousarray(part).tobytes()
+    return json.dumps(part, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+def fingerprint(kind: str, *parts: Any) -> str:
+    """Stable hash of a chart kind and its inputs (JSON-able values or NumPy arrays)."""
+    h = hashlib.blake2b(kind.encode(), digest_size=16)
+    for part in parts:
+        h.update(b"\0")
+        h.update(_encode(part))
+    return h.hexdigest()
+
+
+def cached_figure(kind: str, parts: Sequence[Any], build: Callable[[], go.Figure]) -> go.Figure:
+    """The figure for `parts`, built with build() only when not cached."""
+    key = fingerprint(kind, *parts)
+    with _lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            _stats["hits"] += 1
+            return fig
+
+    started = time.perf_counter()
+    with perf.span(f"charts.build.{kind}"):
+        fig = build()
+    elapsed = time.perf_counter() - started
+
+    with _lock:
+        _stats["misses"] += 1
+        _stats["build_seconds"] += elapsed
+        per_kind = _stats["builds"].setdefault(kind, {"count": 0, "seconds": 0.0, "last_ms": 0.0})
+        per_kind["count"] += 1
+        per_kind["seconds"] += elapsed
+        per_kind["last_ms"] = elapsed * 1000
+        _figures[key] = fig
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+            _stats["evictions"] += 1
+    return fig
+
+
+def chart_stats() -> Dict[str, Any]:
+    """Hit/miss counts and build time, overall and per chart kind."""
+    with _lock:
+        stats = dict(_stats)
+        stats["builds"] = {k: dict(v) for k, v in _stats["builds"].items()}
+        stats["cached"] = len(_figures)
+    return stats
+
+
+def clear() -> None:
+    with _lock:
+        _figures.clear()
+
+
+#  Builders
+def budget_split(fixed_total: float, savings_target: float, discretionary: float) -> go.Figure:
+    """Donut: where the monthly money goes."""
+    def build() -> go.Figure:
+        overall_df = pd.DataFrame([
+            {"Bucket": "Fixed", "Amount": fixed_total},
+            {"Bucket": "Savings", "Amount": savings_target},
+            {"Bucket": "Discretionary", "Amount": max(discretionary, 0.0)},
+        ])
+        return px.pie(
+            overall_df,
+            names="Bucket",
+            values="Amount",
+            hole=0.5,
+            title="Where your monthly money goes (Fixed vs Savings vs Discretionary)"
+        )
+
+    return cached_figure("budget_split", (fixed_total, savings_target, max(discretionary, 0.0)), build)
+
+
+def fixed_by_category(fixed_by_cat: Dict[str, float]) -> go.Figure:
+    def build() -> go.Figure:
+        fixed_cat_df = (
+            pd.DataFrame([{"Category": k, "Monthly": v} for k, v in fixed_by_cat.items()])
+            .sort_values("Monthly", ascending=False)
+        )
+        return px.bar(
+            fixed_cat_df,
+            x="Category",
+            y="Monthly",
+            title="Fixed expenses by category (monthly)"
+        )
+
+    return cached_figure("fixed_by_category", (list(fixed_by_cat.items()),), build)
+
+
+def variable_targets(variable_alloc: Dict[str, float]) -> go.Figure:
+    def build() -> go.Figure:
+        var_df = (
+            pd.DataFrame([{"Category": k, "Target": v} for k, v in variable_alloc.items()])
+            .sort_values("Target", ascending=False)
+        )
+        return px.bar(
+            var_df,
+            x="Category",
+            y="Target",
+            title="Suggested variable spending targets (monthly)"
+        )
+
+    return cached_figure("variable_targets", (list(variable_alloc.items()),), build)
+
+
+def actual_vs_target(actual_df: pd.DataFrame, title: str) -> go.Figure:
+    def build() -> go.Figure:
+        return px.bar(
+            actual_df.melt(id_vars="Category", value_vars=["Target", "Actual"], var_name="", value_name="Amount"),
+            x="Category",
+            y="Amount",
+            color="",
+            barmode="group",
+            title=title,
+        )
+
+    rows = actual_df[["Category", "Target", "Actual"]].values.tolist()
+    return cached_figure("actual_vs_target", (rows, title), build)
+
+
+def feasibility_heatmap(discretionary: np.ndarray, savings_targets: np.ndarray, income_labels: Sequence[str]) -> go.Figure:
+    def build() -> go.Figure:
+        return px.imshow(
+            discretionary,
+            x=savings_targets,
+            y=list(income_labels),
+            color_continuous_scale="RdYlGn",
+            color_continuous_midpoint=0.0,
+            aspect="auto",
+            labels={"x": "Savings target", "y": "Income change", "color": "Discretionary"},
+            title="Discretionary money left (red = plan not feasible)",
+        )
+
+    return cached_figure("feasibility_heatmap", (discretionary, savings_targets, list(income_labels)), build)
+
+
+def savings_sensitivity(savings_targets: np.ndarray, discretionary: np.ndarray, current: float) -> go.Figure:
+    def build() -> go.Figure:
+        curve_df = pd.DataFrame({
+            "Savings target": savings_targets,
+            "Discretionary": discretionary,
+        })
+        fig = px.line(curve_df, x="Savings target", y="Discretionary", title="Sensitivity to the savings target")
+        fig.add_vline(x=current, line_dash="dash")
+        fig.add_hline(y=0.0, line_color="red")
+        return fig
+
+    return cached_figure("savings_sensitivity", (savings_targets, discretionary, current), build)
+
+
+def projected_balance(proj) -> go.Figure:
+    """Expected balance with a mean ± 2σ band for a projection.Projection."""
+    def build() -> go.Figure:
+        proj_df = pd.DataFrame({
+            "Date": proj.dates(),
+            "Expected": proj.expected_balance,
+            "Low (mean - 2σ)": proj.mean_balance - 2 * proj.std_balance,
+            "High (mean + 2σ)": proj.mean_balance + 2 * proj.std_balance,
+        })
+        fig = px.line(proj_df, x="Date", y=list(proj_df.columns[1:]), title="Projected running balance")
+        fig.add_hline(y=0.0, line_color="red")
+        return fig
+
+    return cached_figure(
+        "projected_balance",
+        (proj.start.isoformat(), proj.expected_balance, proj.mean_balance, proj.std_balance),
+        build,
+    )
+
+
+def spending_history(months: Sequence[str], categories: Sequence[str], spent: np.ndarray) -> go.Figure:
+    """Spending per month stacked by category; spent is (months, categories), see columnar.monthly_spending()."""
+    def build() -> go.Figure:
+        fig = go.Figure([go.Bar(name=c, x=list(months), y=spent[:, j]) for j, c in enumerate(categories)])
+        fig.update_layout(barmode="stack", title="Spending by month", xaxis_title="Month", yaxis_title="Spent")
+        return fig
+
+    return cached_figure("spending_history", (list(months), list(categories), spent), build)
+
+
+perf.instrument(globals(), "charts", skip=("fingerprint", "cached_figure", "chart_stats", "clear"))
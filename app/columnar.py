@@ -0,0 +1,371 @@
+"""
+Memory-mapped columnar snapshot of the budget tables.
+
+Each table in db.SNAPSHOT_TABLES is exported next to the database, to
+<db>.columns/<table>/ (or $TRUEBUDGET_COLUMNS/<table>/), as one raw
+fixed-width little-endian array per column plus header.json:
+
+  {"format": 1, "table": ..., "rows": N, "max_id": ..., "log_seq": ..., "generation": ...,
+   "columns": {name: {"dtype": "<f8", "file": "amount.3.bin"[, "vocabulary": [...]]}}}
+
+Strings are dictionary-encoded: the column holds codes into the header's
+vocabulary, -1 for NULL. Frequencies use budget_vec's codes and dates are
+days since 1970-01-01. Free text (names, descriptions) is not exported.
+
+Table maps a header's files read-only with np.memmap as it is opened:
+columns are paged in only when used, the page cache is shared by every
+process reading the snapshot, and a Table stays readable after a refresh
+unlinks the files it was opened with.
+
+refresh() brings a table up to date with the database:
+  - rows with an id above the header's max_id are appended to the files;
+  - rows updated since the last refresh (db.row_changes) are patched into
+    copies of the columns they changed, written under a new file name;
+  - deletions, or updates to over a quarter of the rows, rewrite the table,
+    as does a change log that no longer covers the snapshot (the database
+    only logs changes for tables with a snapshot, up to db.ROW_CHANGES_MAX).
+The header is replaced last, atomically, so a reader sees either the old
+snapshot or the new one. Files only an older header used are unlinked,
+which leaves existing maps of them readable. One process should refresh a
+snapshot at a time.
+
+open_table() returns a table refreshed for the current db.data_version(),
+for one PRAGMA when nothing changed. read_totals() and monthly_spending()
+compute the budget aggregates from the columns.
+
+Usage: python app/columnar.py [--db FILE] [--rebuild]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import db
+import perf
+from budget_vec import FREQUENCIES, fixed_totals, income_totals
+
+FORMAT_VERSION = 1
+HEADER = "header.json"
+# Updates to more than this share of a table's rows rewrite it instead of patching.
+REWRITE_SHARE = 0.25
+
+
+class Column(NamedTuple):
+    name: str
+    source: str  # column in the database table
+    dtype: str
+    kind: str  # "number", "date" or "dict"
+    seed: Tuple[str, ...] = ()  # vocabulary a dict column starts with
+
+
+_ID = Column("id", "id", "<i8", "number")
+SCHEMAS: Dict[str, Tuple[Column, ...]] = {
+    "income_sources": (
+        _ID,
+        Column("amount", "amount", "<f8", "number"),
+        Column("frequency", "frequency", "|i1", "dict", FREQUENCIES),
+    ),
+    "expenses": (
+        _ID,
+        Column("amount", "amount", "<f8", "number"),
+        Column("frequency", "frequency", "|i1", "dict", FREQUENCIES),
+        Column("category", "category", "<i4", "dict"),
+    ),
+    "transactions": (
+        _ID,
+        Column("day", "date", "<i4", "date"),
+        Column("amount", "amount", "<f8", "number"),
+        Column("category", "category", "<i4", "dict"),
+        Column("account", "account", "<i4", "dict"),
+    ),
+}
+
+
+def snapshot_dir() -> Path:
+    return Path(os.environ.get("TRUEBUDGET_COLUMNS") or f"{db.DB_PATH}.columns")
+
+
+#  Reading
+class Table:
+    """One table's snapshot, as of the header it was opened with."""
+
+    def __init__(self, path: Path, header: Dict[str, Any]) -> None:
+        self.path = path
+        self.header = header
+        self.rows: int = header["rows"]
+        # Every file is mapped now: a refresh may unlink them once a newer header
+        # is committed, and only existing maps keep their pages readable.
+        self._maps: Dict[str, np.ndarray] = {
+            name: np.memmap(path / spec["file"], dtype=spec["dtype"], mode="r", shape=(self.rows,))
+            if self.rows else np.empty(0, dtype=spec["dtype"])
+            for name, spec in header["columns"].items()
+        }
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.header["columns"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """The column as a read-only array (a memory map unless the table is empty)."""
+        return self._maps[name]
+
+    def vocabulary(self, name: str) -> List[str]:
+        return self.header["columns"][name].get("vocabulary", [])
+
+    def decode(self, name: str) -> np.ndarray:
+        """A dict column's strings (None for NULL); this one copies."""
+        vocab = np.array(self.vocabulary(name) + [None], dtype=object)
+        return vocab[self[name]]
+
+    def frame(self, columns: Optional[Sequence[str]] = None) -> Any:
+        """
+        The columns as a DataFrame: dict columns become categoricals over
+        their codes and days become dates.
+        """
+        import pandas as pd
+
+        data = {}
+        for name in columns or self.columns:
+            spec = self.header["columns"][name]
+            if "vocabulary" in spec:
+                data[name] = pd.Categorical.from_codes(self[name], categories=spec["vocabulary"])
+            elif name == "day":
+                data["date"] = self[name].astype("datetime64[D]")
+            else:
+                data[name] = self[name]
+        return pd.DataFrame(data, copy=False)
+
+
+def read_header(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        header = json.loads((path / HEADER).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return header if header.get("format") == FORMAT_VERSION else None
+
+
+#  Writing
+def _encode(column: Column, values: Sequence[Any], spec: Dict[str, Any], index: Dict[Any, int]) -> np.ndarray:
+    if column.kind == "number":
+        return np.array(values, dtype=column.dtype)
+    if column.kind == "date":
+        return np.array(values, dtype="datetime64[D]").astype(column.dtype)
+    vocab = spec["vocabulary"]
+    for value in dict.fromkeys(values):
+        if value not in index:
+            index[value] = len(vocab)
+            vocab.append(value)
+    if len(vocab) > np.iinfo(column.dtype).max:
+        raise ValueError(f"Too many distinct {column.name} values for {column.dtype}")
+    return np.fromiter(map(index.__getitem__, values), dtype=column.dtype, count=len(values))
+
+
+def _indexes(schema: Sequence[Column], header: Dict[str, Any]) -> Dict[str, Dict[Any, int]]:
+    # value -> code for each dict column; None (NULL) is always -1.
+    out = {}
+    for column in schema:
+        if column.kind == "dict":
+            index: Dict[Any, int] = {None: -1}
+            index.update((v, i) for i, v in enumerate(header["columns"][column.name]["vocabulary"]))
+            out[column.name] = index
+    return out
+
+
+def _append_rows(path: Path, table: str, header: Dict[str, Any], after: int) -> bool:
+    """Appends rows with id > after to the column files. Returns whether there were any."""
+    schema = SCHEMAS[table]
+    specs = header["columns"]
+    indexes = _indexes(schema, header)
+    files = {}
+    try:
+        for c in schema:
+            f = files[c.name] = open(path / specs[c.name]["file"], "r+b" if header["rows"] else "wb")
+            # Drop anything a refresh that died left past the last committed row.
+            f.seek(header["rows"] * np.dtype(c.dtype).itemsize)
+            f.truncate()
+        added = False
+        for rows in db.scan_rows(table, [c.source for c in schema[1:]], after=after):
+            values = list(zip(*rows))
+            for c, col in zip(schema, values):
+                files[c.name].write(_encode(c, col, specs[c.name], indexes.get(c.name, {})).tobytes())
+            header["rows"] += len(rows)
+            header["max_id"] = rows[-1][0]
+            added = True
+        return added
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def _new_header(table: str, generation: int) -> Dict[str, Any]:
+    columns = {}
+    for c in SCHEMAS[table]:
+        columns[c.name] = {"dtype": c.dtype, "file": f"{c.name}.{generation}.bin"}
+        if c.kind == "dict":
+            columns[c.name]["vocabulary"] = list(c.seed)
+    return {
+        "format": FORMAT_VERSION, "table": table, "rows": 0, "max_id": 0, "log_seq": 0,
+        "generation": generation, "columns": columns,
+    }
+
+
+def _patch(path: Path, table: str, header: Dict[str, Any], positions: np.ndarray, rows: List[Tuple]) -> None:
+    """Writes updated rows (in position order) into new copies of the columns whose values changed."""
+    old = Table(path, header)
+    generation = header["generation"] + 1
+    indexes = _indexes(SCHEMAS[table], header)
+    for c, values in zip(SCHEMAS[table][1:], list(zip(*rows))[1:]):
+        spec = header["columns"][c.name]
+        new = _encode(c, values, spec, indexes.get(c.name, {}))
+        if np.array_equal(old[c.name][positions], new):
+            continue
+        name = f"{c.name}.{generation}.bin"
+        with open(path / spec["file"], "rb") as src, open(path / name, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+            dst.truncate(header["rows"] * np.dtype(c.dtype).itemsize)
+        patched = np.memmap(path / name, dtype=c.dtype, mode="r+", shape=(header["rows"],))
+        patched[positions] = new
+        patched.flush()
+        del patched
+        spec["file"] = name
+    header["generation"] = generation
+
+
+def _commit(path: Path, header: Dict[str, Any]) -> None:
+    tmp = path / f"{HEADER}.tmp"
+    tmp.write_text(json.dumps(header, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path / HEADER)
+    keep = {spec["file"] for spec in header["columns"].values()} | {HEADER}
+    for f in path.iterdir():
+        if f.name not in keep:
+            try:
+                f.unlink()
+            except OSError:
+                pass  # still mapped on a platform that won't unlink open files; next refresh retries
+
+
+_lock = threading.Lock()
+_open: Dict[Tuple[str, str], Tuple[int, Table]] = {}
+
+
+def refresh(table: str, rebuild: bool = False) -> Table:
+    """Brings the snapshot of `table` up to date with the database (see the module docstring)."""
+    if table not in SCHEMAS:
+        raise ValueError(f"Unknown table: {table}")
+    path = snapshot_dir() / table
+    path.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        header = read_header(path)
+        seq, changed, complete = db.row_changes(table, header["log_seq"] if header and not rebuild else 0)
+        if header is None or rebuild or not complete:
+            # (Re)start the change log first, so it covers everything after the rows read below.
+            seq = db.track_row_changes(table)
+            rebuild = True
+        dirty = False
+        if not rebuild and changed:
+            ids = Table(path, header)["id"]
+            wanted = np.array(changed, dtype=np.int64)
+            positions = np.searchsorted(ids, wanted)
+            inside = positions < len(ids)
+            inside[inside] = ids[positions[inside]] == wanted[inside]
+            # Changed rows past max_id are still to be appended, with their current values.
+            positions, wanted = positions[inside], wanted[inside]
+            rows = [r for chunk in db.scan_rows(table, [c.source for c in SCHEMAS[table][1:]], ids=wanted.tolist())
+                    for r in chunk]
+            if len(rows) < len(wanted) or len(wanted) > header["rows"] * REWRITE_SHARE:
+                rebuild = True
+            elif rows:
+                _patch(path, table, header, positions, rows)
+                dirty = True
+        if header is None or rebuild:
+            header = _new_header(table, (header or {}).get("generation", 0) + 1)
+            dirty = True
+        dirty |= _append_rows(path, table, header, header["max_id"])
+        if dirty or header["log_seq"] != seq:
+            header["log_seq"] = seq
+            _commit(path, header)
+        if changed:
+            db.prune_row_changes(table, seq)
+        return Table(path, header)
+
+
+def open_table(table: str) -> Table:
+    """The snapshot of `table`, refreshed first if the database may have changed since the last call."""
+    key = (str(snapshot_dir()), table)
+    version = db.data_version()
+    hit = _open.get(key)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    snapshot = refresh(table)
+    _open[key] = (version, snapshot)
+    return snapshot
+
+
+#  Aggregates
+def read_totals(incomes: Table, expenses: Table) -> db.Totals:
+    """db.read_totals() over the snapshot: monthly income, fixed total and fixed total per category."""
+    income = income_totals(incomes["amount"], incomes["frequency"])[0]
+    vocab = expenses.vocabulary("category")
+    codes = expenses["category"]
+    total, by_category = fixed_totals(expenses["amount"], expenses["frequency"], codes, len(vocab))
+    present = np.bincount(codes, minlength=len(vocab)) > 0
+    return db.Totals(
+        float(income), float(total[0]), {c: float(v) for c, v, p in zip(vocab, by_category[0], present) if p}
+    )
+
+
+def monthly_spending(transactions: Table) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    (months 'YYYY-MM', categories, spent[month, category]) over every month
+    from the first transaction to the last, like db.monthly_actuals() per month.
+    """
+    if not transactions.rows:
+        return [], [], np.zeros((0, 0))
+    months = transactions["day"].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    first = int(months.min())
+    n_months = int(months.max()) - first + 1
+
+    categories = list(transactions.vocabulary("category"))
+    if db.UNCATEGORIZED not in categories:
+        categories.append(db.UNCATEGORIZED)
+    codes = transactions["category"].astype(np.int64)
+    codes[codes < 0] = categories.index(db.UNCATEGORIZED)
+    k = len(categories)
+
+    spent = np.maximum(-transactions["amount"], 0.0)
+    grid = np.bincount((months - first) * k + codes, weights=spent, minlength=n_months * k).reshape(n_months, k)
+    used = np.bincount(codes, minlength=k) > 0
+    labels = np.datetime_as_string(np.arange(first, first + n_months).astype("datetime64[M]")).tolist()
+    return labels, [c for c, u in zip(categories, used) if u], grid[:, used]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", help="database to snapshot (default: the app's)")
+    parser.add_argument("--rebuild", action="store_true", help="rewrite every table instead of refreshing")
+    args = parser.parse_args(argv)
+    if args.db:
+        db.DB_PATH = Path(args.db)
+    db.init_db()
+    for table in SCHEMAS:
+        started = time.perf_counter()
+        snapshot = refresh(table, rebuild=args.rebuild)
+        size = sum(os.path.getsize(snapshot.path / s["file"]) for s in snapshot.header["columns"].values())
+        print(f"{snapshot.path}: {snapshot.rows:,} rows, {size / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s")
+    db.stop_writer()
+    return 0
+
+
+# Table methods and open_table() run per chart; refresh and the aggregates get spans.
+perf.instrument(globals(), "columnar", skip=("snapshot_dir", "read_header", "open_table", "main"))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,18 +1,554 @@
+import atexit
+import os
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
-DB_PATH = Path(__file__).resolve().parent.parent / "truebudget.sqlite3"
+import perf
+from budget import FREQ_TO_MONTHLY
 
+DB_PATH = Path(os.environ.get("TRUEBUDGET_DB", Path(__file__).resolve().parent.parent / "truebudget.sqlite3"))
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# Applied to every new connection. WAL lets readers run alongside the writer,
+# NORMAL sync is durable under WAL except for power loss, and the mmap/page
+# cache keep hot pages warm between reruns.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-16000",
+)
+STATEMENT_CACHE_SIZE = 256
+MAX_IDLE_CONNECTIONS = 8
+
+_local = threading.local()
+_idle: List[sqlite3.Connection] = []
+_idle_lock = threading.Lock()
+
+
+class _Connection(sqlite3.Connection):
+    # Last PRAGMA data_version observed on this handle; see data_version().
+    seen_data_version: Optional[int] = None
+
+
+def _open_conn() -> sqlite3.Connection:
+    # check_same_thread=False because a warm handle is handed to the next
+    # Streamlit script thread once its owner exits; it is never shared by two
+    # live threads at the same time.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE, factory=_Connection)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
-def init_db() -> None:
+def _release(conn: sqlite3.Connection, path: str) -> None:
+    if conn.in_transaction:
+        conn.rollback()
+    with _idle_lock:
+        if str(DB_PATH) == path and len(_idle) < MAX_IDLE_CONNECTIONS:
+            _idle.append(conn)
+            return
+    conn.close()
+
+
+class _ConnHolder:
+    """Thread-local owner of a connection; returns it to the idle pool when the thread ends."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.path = str(DB_PATH)
+
+    def __del__(self) -> None:
+        if self.conn is None:
+            return
+        try:
+            _release(self.conn, self.path)
+        except Exception:
+            pass
+
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Returns this thread's connection, reusing a warm idle one when possible.
+    Callers must not close it; use close_conn() to drop it explicitly.
+    """
+    holder = getattr(_local, "holder", None)
+    if holder is not None and holder.path == str(DB_PATH):
+        return holder.conn
+
+    conn = None
+    with _idle_lock:
+        if _idle:
+            conn = _idle.pop()
+    if conn is None:
+        conn = _open_conn()
+    _local.holder = _ConnHolder(conn)
+    return conn
+
+
+def close_conn() -> None:
+    """Close this thread's connection, every idle one and the writer (e.g. before swapping DB_PATH)."""
+    stop_writer()
+    holder = getattr(_local, "holder", None)
+    if holder is not None:
+        _local.holder = None
+        holder.conn.close()
+        holder.conn = None
+    with _idle_lock:
+        while _idle:
+            _idle.pop().close()
+
+
+#  Writer 
+# Every write goes through one thread that owns the only writing connection.
+# Operations that queue up while a group is committing form the next group
+# and share one transaction, so many sessions writing at once cost one commit
+# between them instead of taking turns on SQLite's write lock (and timing out
+# with "database is locked"). If one operation fails the group is rolled
+# back and replayed without it, so ops must only touch the database (no
+# other side effects) and may run more than once. Anything else that goes
+# wrong inside the writer (a failed ROLLBACK, a broken connection) fails the
+# group and everything still queued, and marks the writer dead; the next
+# submit_write starts a new one.
+#
+# GROUP_COMMIT_WINDOW additionally holds a group open for late arrivals, at
+# most that many seconds. Commits are cheap under WAL + synchronous=NORMAL,
+# so it is off by default; raise it when commits are expensive (FULL sync,
+# slow disks).
+GROUP_COMMIT_WINDOW = 0.0  # seconds
+MAX_GROUP_SIZE = 256
+
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+
+class _Writer:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.commits = 0
+        self.ops = 0
+        self._last_group = 0
+        self.dead: Optional[BaseException] = None
+        self._dead_lock = threading.Lock()
+        self._queue: "queue.SimpleQueue[Optional[Tuple[WriteOp, Future]]]" = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, op: WriteOp) -> Future:
+        fut: Future = Future()
+        with self._dead_lock:
+            if self.dead is not None:
+                raise RuntimeError("db writer thread has died") from self.dead
+            self._queue.put((op, fut))
+        return fut
+
+    def stop(self) -> None:
+        """Commits everything already queued, then closes the connection."""
+        self._queue.put(None)
+        self.thread.join()
+
+    def _collect(self) -> Tuple[List[Tuple[WriteOp, Future]], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        group = [first]
+        # A lone writer commits right away; the window only opens once the
+        # previous group showed that several sessions are writing.
+        window = GROUP_COMMIT_WINDOW if self._last_group > 1 else 0.0
+        deadline = time.monotonic() + window
+        while len(group) < MAX_GROUP_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return group, True
+            group.append(item)
+        return group, False
+
+    def _run(self) -> None:
+        conn = _open_conn()
+        conn.isolation_level = None  # transactions are managed by hand below
+        self.conn = conn
+        stop = False
+        while not stop:
+            group, stop = self._collect()
+            self._last_group = len(group)
+            if not group:
+                continue
+            try:
+                self._commit(conn, group)
+            except BaseException as e:
+                self._die(group, e)
+                break
+        conn.close()
+
+    def _die(self, group: List[Tuple[WriteOp, Future]], error: BaseException) -> None:
+        # Fails the group and everything still queued; submit raises from now on.
+        with self._dead_lock:
+            self.dead = error
+        failed = [fut for _, fut in group]
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                failed.append(item[1])
+        for fut in failed:
+            if not fut.done():
+                fut.set_exception(error)
+
+    def _commit(self, conn: sqlite3.Connection, group: List[Tuple[WriteOp, Future]]) -> None:
+        pending = [(op, fut) for op, fut in group if fut.set_running_or_notify_cancel()]
+        while pending:
+            results: List[Any] = []
+            op_failed = False
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for op, _ in pending:
+                    op_failed = True
+                    results.append(op(conn))
+                    op_failed = False
+                conn.execute("COMMIT")
+            except BaseException as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if not op_failed:  # BEGIN or COMMIT itself failed
+                    for _, fut in pending:
+                        fut.set_exception(e)
+                    return
+                # Only the failing operation is dropped; the rest of the group is replayed.
+                pending.pop(len(results))[1].set_exception(e)
+                continue
+            self.commits += 1
+            self.ops += len(pending)
+            _bump_version()
+            # Callers are released only once their write is committed.
+            for (_, fut), value in zip(pending, results):
+                fut.set_result(value)
+            return
+
+
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer:
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.path != str(DB_PATH) or _writer.dead is not None:
+            if _writer is not None:
+                _writer.stop()
+            _writer = _Writer(str(DB_PATH))
+        return _writer
+
+
+def stop_writer() -> None:
+    """Flushes queued writes and stops the writer thread; the next write starts a new one."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+
+atexit.register(stop_writer)
+
+
+def submit_write(op: WriteOp) -> Future:
+    """
+    Queues op(conn) for the writer thread. The future resolves to op's return
+    value (or raises its exception) after the group it ran in has committed.
+    op must not commit or roll back itself.
+    """
+    writer = _get_writer()
+    if threading.current_thread() is writer.thread:
+        # Called from inside another write: already in the open transaction.
+        fut: Future = Future()
+        fut.set_result(op(writer.conn))
+        return fut
+    return writer.submit(op)
+
+
+def _write(op: WriteOp, wait: bool) -> Any:
+    fut = submit_write(op)
+    return fut.result() if wait else fut
+
+
+def writer_stats() -> Dict[str, int]:
+    """Commits and operations handled by the current writer thread."""
+    with _writer_lock:
+        if _writer is None:
+            return {"commits": 0, "ops": 0}
+        return {"commits": _writer.commits, "ops": _writer.ops}
+
+
+#  Change tracking 
+# _write_version is a process-wide counter bumped by every group the writer
+# commits and whenever a connection's PRAGMA data_version shows a commit made
+# elsewhere (another process).
+_write_version = 0
+_version_lock = threading.Lock()
+_cache: Dict[str, Tuple[int, Any]] = {}
+_cache_lock = threading.Lock()
+MAX_CACHED = 256  # past this, entries from older versions are dropped
+
+
+def _bump_version() -> None:
+    global _write_version
+    with _version_lock:
+        _write_version += 1
+
+
+def data_version() -> int:
+    """Returns a number that changes whenever the budget data may have changed."""
+    global _write_version
     conn = get_conn()
+    dv = conn.execute("PRAGMA data_version").fetchone()[0]
+    with _version_lock:
+        # A connection we have never seen has no baseline, so treat it as changed.
+        if conn.seen_data_version != dv:
+            conn.seen_data_version = dv
+            _write_version += 1
+        return _write_version
+
+
+def _cached(name: str, loader: Callable[[], Any]) -> Any:
+    version = data_version()
+    with _cache_lock:
+        hit = _cache.get(name)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    # Loaded outside the lock: two sessions may both load on a miss, which is
+    # cheaper than making every reader wait on one slow query.
+    value = loader()
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHED:
+            for key in [k for k, (v, _) in _cache.items() if v != version]:
+                del _cache[key]
+        _cache[name] = (version, value)
+    return value
+
+
+#  Schema 
+# amount * FREQ_TO_MONTHLY[frequency], spelled in SQL so backfills match to_monthly() exactly.
+MONTHLY_AMOUNT_SQL = "amount * CASE frequency {} END".format(
+    " ".join(f"WHEN '{freq}' THEN {factor!r}" for freq, factor in FREQ_TO_MONTHLY.items())
+)
+
+
+def _monthly(amount: float, frequency: str) -> Optional[float]:
+    # Unknown frequencies are left to the table's CHECK constraint.
+    factor = FREQ_TO_MONTHLY.get(frequency)
+    return None if factor is None else float(amount) * factor
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [r["name"] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_monthly_amount(conn: sqlite3.Connection) -> None:
+    for table in ("income_sources", "expenses"):
+        if "monthly_amount" not in _column_names(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN monthly_amount REAL")
+        conn.execute(f"UPDATE {table} SET monthly_amount = {MONTHLY_AMOUNT_SQL} WHERE monthly_amount IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category, monthly_amount)")
+
+
+def _migrate_llm_cache(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            prompt_version INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
+
+
+def _migrate_transactions(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT,
+            account TEXT,
+            fingerprint INTEGER NOT NULL UNIQUE
+        )
+        """
+    )
+
+
+UNCATEGORIZED = "Uncategorized"
+
+# Month/category key and the spent/received split of one transaction row (NEW or OLD).
+_ROLLUP_KEY = "substr({r}.date, 1, 7), COALESCE({r}.category, '" + UNCATEGORIZED + "')"
+_ROLLUP_SPLIT = "max(-{r}.amount, 0), max({r}.amount, 0)"
+
+
+def _rollup_add(r: str) -> str:
+    return (
+        "INSERT INTO transaction_rollups (month, category, spent, received, n) "
+        f"VALUES ({_ROLLUP_KEY.format(r=r)}, {_ROLLUP_SPLIT.format(r=r)}, 1) "
+        "ON CONFLICT(month, category) DO UPDATE SET "
+        "spent = spent + excluded.spent, received = received + excluded.received, n = n + 1;"
+    )
+
+
+def _rollup_remove(r: str) -> str:
+    return (
+        f"UPDATE transaction_rollups SET spent = spent - max(-{r}.amount, 0), "
+        f"received = received - max({r}.amount, 0), n = n - 1 "
+        f"WHERE month = substr({r}.date, 1, 7) AND category = COALESCE({r}.category, '{UNCATEGORIZED}');"
+        "DELETE FROM transaction_rollups "
+        f"WHERE month = substr({r}.date, 1, 7) AND category = COALESCE({r}.category, '{UNCATEGORIZED}') AND n <= 0;"
+    )
+
+
+def _migrate_transaction_rollups(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date_category ON transactions(date, category)")
+    # Per month and category totals, kept current by triggers so month/range
+    # queries read O(categories) rows instead of scanning transactions.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transaction_rollups (
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            spent REAL NOT NULL,
+            received REAL NOT NULL,
+            n INTEGER NOT NULL,
+            PRIMARY KEY (month, category)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_ai AFTER INSERT ON transactions BEGIN {_rollup_add('NEW')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_ad AFTER DELETE ON transactions BEGIN {_rollup_remove('OLD')} END")
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_transactions_au AFTER UPDATE OF date, amount, category ON transactions "
+        f"BEGIN {_rollup_remove('OLD')} {_rollup_add('NEW')} END"
+    )
+    _rebuild_rollups(conn)
+
+
+def _migrate_listing_indexes(conn: sqlite3.Connection) -> None:
+    # Let filtered listings walk id order inside one frequency/category (see page_income/page_expenses).
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_income_frequency ON income_sources(frequency, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_frequency ON expenses(frequency, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category_id ON expenses(category, id)")
+
+
+def _migrate_dedupe_indexes(conn: sqlite3.Connection) -> None:
+    # The duplicate checks in insert_income_batch/insert_expense_batch look rows up by name;
+    # without these each inserted row scanned the whole table.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_income_name ON income_sources(name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expenses_name ON expenses(name)")
+
+
+def _migrate_category_rules(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS category_rules (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL CHECK (kind IN ('contains','prefix','amount')),
+            pattern TEXT NOT NULL DEFAULT '',
+            category TEXT NOT NULL,
+            min_amount REAL,
+            max_amount REAL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # Every rule insert, update and delete is logged, so a compiled rule index
+    # (categorize.py) can apply just the edits made since it was built;
+    # apply_rules() prunes the entries its index has applied.
+    conn.execute("CREATE TABLE IF NOT EXISTS category_rule_log (version INTEGER PRIMARY KEY, rule_id INTEGER NOT NULL)")
+    for name, event, row in (("ai", "INSERT", "NEW"), ("au", "UPDATE", "NEW"), ("ad", "DELETE", "OLD")):
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_category_rules_{name} AFTER {event} ON category_rules "
+            f"BEGIN INSERT INTO category_rule_log (rule_id) VALUES ({row}.id); END"
+        )
+    # The rule that chose a transaction's category; NULL when it came from the bank file or was typed in.
+    if "category_rule" not in _column_names(conn, "transactions"):
+        conn.execute("ALTER TABLE transactions ADD COLUMN category_rule INTEGER")
+
+
+# Tables whose rows are exported to the columnar snapshot (columnar.py).
+SNAPSHOT_TABLES = ("income_sources", "expenses", "transactions")
+# Changes logged since a table's snapshot last caught up before its log is
+# dropped and the next refresh rewrites it instead (about 30 bytes each).
+ROW_CHANGES_MAX = 250_000
+
+
+def _migrate_row_changes(conn: sqlite3.Connection) -> None:
+    # Updated and deleted rows of the snapshot tables; new rows need no log, the
+    # snapshot picks them up by id. Only tables with a snapshot are logged, from
+    # the seq it started at (or last caught up to), and refreshing the snapshot
+    # prunes what it applied.
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS row_changes (seq INTEGER PRIMARY KEY, tbl TEXT NOT NULL, row_id INTEGER NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_row_changes_tbl ON row_changes(tbl, seq)")
+    conn.execute("CREATE TABLE IF NOT EXISTS row_change_tables (tbl TEXT PRIMARY KEY, since INTEGER NOT NULL)")
+    for table in SNAPSHOT_TABLES:
+        for name, event in (("log_au", "UPDATE"), ("log_ad", "DELETE")):
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{name} AFTER {event} ON {table} "
+                f"WHEN EXISTS (SELECT 1 FROM row_change_tables WHERE tbl = '{table}') "
+                f"BEGIN INSERT INTO row_changes (tbl, row_id) VALUES ('{table}', OLD.id); END"
+            )
+    # A snapshot that stops refreshing loses its log past ROW_CHANGES_MAX; the
+    # newest entry stays so seq keeps counting up.
+    conn.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_row_changes_cap AFTER INSERT ON row_changes "
+        f"WHEN NEW.seq - (SELECT since FROM row_change_tables WHERE tbl = NEW.tbl) > {ROW_CHANGES_MAX} "
+        "BEGIN DELETE FROM row_change_tables WHERE tbl = NEW.tbl; "
+        "DELETE FROM row_changes WHERE tbl = NEW.tbl AND seq < NEW.seq; END"
+    )
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS: Tuple[Callable[[sqlite3.Connection], None], ...] = (
+    _migrate_monthly_amount,
+    _migrate_llm_cache,
+    _migrate_transactions,
+    _migrate_transaction_rollups,
+    _migrate_listing_indexes,
+    _migrate_dedupe_indexes,
+    _migrate_category_rules,
+    _migrate_row_changes,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for step in MIGRATIONS[version:]:
+        step(conn)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
 
     cur.execute(
@@ -22,7 +558,8 @@ def init_db() -> None:
             name TEXT NOT NULL,
             amount REAL NOT NULL,
             frequency TEXT NOT NULL CHECK (frequency IN ('weekly','biweekly','monthly')),
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            monthly_amount REAL
         )
         """
     )
@@ -35,7 +572,8 @@ def init_db() -> None:
             amount REAL NOT NULL,
             frequency TEXT NOT NULL CHECK (frequency IN ('weekly','biweekly','monthly')),
             category TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            monthly_amount REAL
         )
         """
     )
@@ -52,81 +590,632 @@ def init_db() -> None:
         """
     )
 
-    conn.commit()
-    conn.close()
+    _migrate(conn)
 
 
-#  Income CRUD 
-def add_income(name: str, amount: float, frequency: str) -> None:
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO income_sources (name, amount, frequency) VALUES (?, ?, ?)",
-        (name, amount, frequency),
+_initialized: set = set()  # DB paths already at SCHEMA_VERSION in this process
+_init_lock = threading.Lock()
+
+
+def init_db() -> None:
+    """
+    Creates and migrates the schema, once per process and database. Later
+    calls (every Streamlit rerun) return immediately, and a database already
+    at SCHEMA_VERSION is only read: no write, so no cache invalidation.
+    """
+    path = str(DB_PATH)
+    if path in _initialized:
+        return
+    with _init_lock:
+        if path in _initialized:
+            return
+        if get_conn().execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            _write(_init_schema, wait=True)
+        _initialized.add(path)
+
+
+#  Paged listing 
+# Keyset pagination: each page starts below the last id of the previous one,
+# so page 1000 costs the same as page 1 (no OFFSET scan) and rows added or
+# deleted meanwhile never shift a page.
+PAGE_SIZE = 50
+
+
+class Page(NamedTuple):
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[int]  # pass as `after` for the next page; None on the last one
+    total: int                  # rows matching the filters, across all pages
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _page(table: str, after: Optional[int], limit: int, equals: Dict[str, Optional[str]], search: Optional[str]) -> Page:
+    where: List[str] = []
+    params: List[Any] = []
+    for column, value in equals.items():
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if search:
+        where.append("name LIKE ? ESCAPE '\\'")
+        params.append(f"%{_escape_like(search)}%")
+    filters = " AND ".join(where) or "1"
+
+    # The count is the one part that grows with the table; it is cached until the next write.
+    total = _cached(
+        f"count:{table}:{filters}:{params}",
+        lambda: get_conn().execute(f"SELECT COUNT(*) FROM {table} WHERE {filters}", params).fetchone()[0],
     )
-    conn.commit()
-    conn.close()
+    keyset = "" if after is None else " AND id < ?"
+    rows = get_conn().execute(
+        f"SELECT * FROM {table} WHERE {filters}{keyset} ORDER BY id DESC LIMIT ?",
+        params + ([] if after is None else [after]) + [limit + 1],
+    ).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return Page([dict(r) for r in rows], rows[-1]["id"] if more else None, total)
 
 
-def delete_income(income_id: int) -> None:
-    conn = get_conn()
-    conn.execute("DELETE FROM income_sources WHERE id = ?", (income_id,))
-    conn.commit()
-    conn.close()
+#  Income CRUD 
+# Writes go through the writer thread. By default they return once committed;
+# wait=False returns a Future instead.
+def add_income(name: str, amount: float, frequency: str, wait: bool = True) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT INTO income_sources (name, amount, frequency, monthly_amount) VALUES (?, ?, ?, ?)",
+            (name, amount, frequency, _monthly(amount, frequency)),
+        )
+
+    return _write(op, wait)
+
+
+def delete_income(income_id: int, wait: bool = True) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM income_sources WHERE id = ?", (income_id,))
+
+    return _write(op, wait)
 
 
 def list_income() -> List[Dict[str, Any]]:
     conn = get_conn()
     rows = conn.execute("SELECT * FROM income_sources ORDER BY id DESC").fetchall()
-    conn.close()
     return [dict(r) for r in rows]
 
 
+def page_income(
+    after: Optional[int] = None, limit: int = PAGE_SIZE, frequency: Optional[str] = None, search: Optional[str] = None
+) -> Page:
+    """One page of income sources, newest first. See Page."""
+    return _page("income_sources", after, limit, {"frequency": frequency}, search)
+
+
 #  Expense CRUD 
-def add_expense(name: str, amount: float, frequency: str, category: str) -> None:
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO expenses (name, amount, frequency, category) VALUES (?, ?, ?, ?)",
-        (name, amount, frequency, category),
-    )
-    conn.commit()
-    conn.close()
+def add_expense(name: str, amount: float, frequency: str, category: str, wait: bool = True) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT INTO expenses (name, amount, frequency, category, monthly_amount) VALUES (?, ?, ?, ?, ?)",
+            (name, amount, frequency, category, _monthly(amount, frequency)),
+        )
 
+    return _write(op, wait)
 
-def delete_expense(expense_id: int) -> None:
-    conn = get_conn()
-    conn.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
-    conn.commit()
-    conn.close()
+
+def delete_expense(expense_id: int, wait: bool = True) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+
+    return _write(op, wait)
 
 
 def list_expenses() -> List[Dict[str, Any]]:
     conn = get_conn()
     rows = conn.execute("SELECT * FROM expenses ORDER BY id DESC").fetchall()
-    conn.close()
     return [dict(r) for r in rows]
 
 
-#  Profile 
-def upsert_profile(location: Optional[str], savings_goal_type: str, savings_goal_value: float, focus_categories: str) -> None:
-    conn = get_conn()
+def page_expenses(
+    after: Optional[int] = None,
+    limit: int = PAGE_SIZE,
+    category: Optional[str] = None,
+    frequency: Optional[str] = None,
+    search: Optional[str] = None,
+) -> Page:
+    """One page of fixed expenses, newest first. See Page."""
+    return _page("expenses", after, limit, {"category": category, "frequency": frequency}, search)
+
+
+#  Bulk inserts 
+# Each call is one executemany; callers stream their input in chunks.
+# rowcount rather than total_changes, which would also count trigger writes.
+def insert_income_batch(rows: List[Tuple[str, float, str]], wait: bool = True) -> Union[int, Future]:
+    """(name, amount, frequency) rows; rows identical to an existing source are skipped. Returns rows inserted."""
+    params = [(name, amount, freq, _monthly(amount, freq)) for name, amount, freq in rows]
+
+    def op(conn: sqlite3.Connection) -> int:
+        return conn.executemany(
+            """
+            INSERT INTO income_sources (name, amount, frequency, monthly_amount)
+            SELECT ?1, ?2, ?3, ?4
+            WHERE NOT EXISTS (
+                SELECT 1 FROM income_sources WHERE name = ?1 AND amount = ?2 AND frequency = ?3
+            )
+            """,
+            params,
+        ).rowcount
+
+    return _write(op, wait)
+
+
+def insert_expense_batch(rows: List[Tuple[str, float, str, str]], wait: bool = True) -> Union[int, Future]:
+    """(name, amount, frequency, category) rows; exact duplicates are skipped. Returns rows inserted."""
+    params = [(name, amount, freq, cat, _monthly(amount, freq)) for name, amount, freq, cat in rows]
+
+    def op(conn: sqlite3.Connection) -> int:
+        return conn.executemany(
+            """
+            INSERT INTO expenses (name, amount, frequency, category, monthly_amount)
+            SELECT ?1, ?2, ?3, ?4, ?5
+            WHERE NOT EXISTS (
+                SELECT 1 FROM expenses WHERE name = ?1 AND amount = ?2 AND frequency = ?3 AND category = ?4
+            )
+            """,
+            params,
+        ).rowcount
+
+    return _write(op, wait)
+
+
+def insert_transaction_batch(rows: List[tuple], wait: bool = True) -> Union[int, Future]:
+    """
+    (date, description, amount, category, account, fingerprint) rows, where
+    fingerprint is a 64-bit hash identifying the bank transaction, optionally
+    followed by the id of the rule that chose the category. Rows whose
+    fingerprint is already stored are ignored. Returns rows inserted.
+    """
+    if rows and len(rows[0]) == 7:
+        sql = (
+            "INSERT OR IGNORE INTO transactions (date, description, amount, category, account, fingerprint, "
+            "category_rule) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        )
+    else:
+        sql = (
+            "INSERT OR IGNORE INTO transactions (date, description, amount, category, account, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?)"
+        )
+
+    def op(conn: sqlite3.Connection) -> int:
+        return conn.executemany(sql, rows).rowcount
+
+    return _write(op, wait)
+
+
+#  Transactions 
+def add_transaction(
+    date: str, description: str, amount: float, category: Optional[str] = None, account: Optional[str] = None,
+    wait: bool = True,
+) -> Optional[Future]:
+    """One hand-entered transaction (amount < 0 for spending)."""
+    # Not from a bank file, so nothing to dedupe against: any unused key will do.
+    fingerprint = int.from_bytes(os.urandom(8), "big", signed=True)
+
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT INTO transactions (date, description, amount, category, account, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (date, description, amount, category, account, fingerprint),
+        )
+
+    return _write(op, wait)
+
+
+def _rebuild_rollups(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM transaction_rollups")
     conn.execute(
+        f"""
+        INSERT INTO transaction_rollups (month, category, spent, received, n)
+        SELECT {_ROLLUP_KEY.format(r="t")}, SUM(max(-t.amount, 0)), SUM(max(t.amount, 0)), COUNT(*)
+        FROM transactions AS t
+        GROUP BY 1, 2
         """
-        INSERT INTO profile (id, location, savings_goal_type, savings_goal_value, focus_categories)
-        VALUES (1, ?, ?, ?, ?)
-        ON CONFLICT(id) DO UPDATE SET
-            location=excluded.location,
-            savings_goal_type=excluded.savings_goal_type,
-            savings_goal_value=excluded.savings_goal_value,
-            focus_categories=excluded.focus_categories
-        """,
-        (location, savings_goal_type, savings_goal_value, focus_categories),
-    )
-    conn.commit()
-    conn.close()
+    )
+
+
+def rebuild_rollups(wait: bool = True) -> Optional[Future]:
+    """Recomputes transaction_rollups from scratch (the triggers keep it current otherwise)."""
+    return _write(_rebuild_rollups, wait)
+
+
+def transaction_months() -> List[str]:
+    """Months ('YYYY-MM') that have transactions, newest first."""
+    return _cached(
+        "transaction_months",
+        lambda: [r[0] for r in get_conn().execute(
+            "SELECT DISTINCT month FROM transaction_rollups ORDER BY month DESC"
+        )],
+    )
+
+
+def monthly_actuals(start_month: str, end_month: Optional[str] = None) -> Dict[str, float]:
+    """Money spent per category over the months start..end inclusive ('YYYY-MM'), from the rollups."""
+    end_month = end_month or start_month
+
+    def load() -> Dict[str, float]:
+        rows = get_conn().execute(
+            "SELECT category, SUM(spent) FROM transaction_rollups "
+            "WHERE month BETWEEN ? AND ? GROUP BY category",
+            (start_month, end_month),
+        )
+        return {r[0]: r[1] for r in rows}
+
+    return _cached(f"actuals:{start_month}:{end_month}", load)
+
+
+def rule_targets(after: int, limit: int) -> List[Tuple[int, str, float, Optional[str], Optional[int]]]:
+    """
+    (id, description, amount, category, category_rule) of transactions whose
+    category is missing or came from a rule, in id order after `after`.
+    """
+    return get_conn().execute(
+        "SELECT id, description, amount, category, category_rule FROM transactions "
+        "WHERE id > ? AND (category IS NULL OR category_rule IS NOT NULL) ORDER BY id LIMIT ?",
+        (after, limit),
+    ).fetchall()
+
+
+def set_transaction_categories(
+    updates: List[Tuple[Optional[str], Optional[int], int]], wait: bool = True
+) -> Union[int, Future]:
+    """(category, rule id, transaction id) rows, in one executemany. Returns rows updated."""
+    def op(conn: sqlite3.Connection) -> int:
+        return conn.executemany("UPDATE transactions SET category = ?, category_rule = ? WHERE id = ?", updates).rowcount
+
+    return _write(op, wait)
+
+
+#  Category rules 
+RULE_COLUMNS = "id, kind, pattern, category, min_amount, max_amount, priority"
+
+
+def add_rule(
+    kind: str, pattern: str, category: str, min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+    priority: int = 0, wait: bool = True,
+) -> Optional[Future]:
+    """kind is 'contains' or 'prefix' (matched against the description) or 'amount' (range only)."""
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT INTO category_rules (kind, pattern, category, min_amount, max_amount, priority) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, pattern, category, min_amount, max_amount, priority),
+        )
+
+    return _write(op, wait)
+
+
+def insert_rule_batch(
+    rows: List[Tuple[str, str, str, Optional[float], Optional[float], int]], wait: bool = True
+) -> Union[int, Future]:
+    """(kind, pattern, category, min_amount, max_amount, priority) rows. Returns rows inserted."""
+    def op(conn: sqlite3.Connection) -> int:
+        return conn.executemany(
+            "INSERT INTO category_rules (kind, pattern, category, min_amount, max_amount, priority) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        ).rowcount
 
+    return _write(op, wait)
 
-def get_profile() -> Optional[Dict[str, Any]]:
+
+def delete_rule(rule_id: int, wait: bool = True) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM category_rules WHERE id = ?", (rule_id,))
+
+    return _write(op, wait)
+
+
+def list_rules() -> List[Dict[str, Any]]:
+    """All rules, the ones that win ties first."""
+    return _cached(
+        "rules",
+        lambda: [dict(r) for r in get_conn().execute(
+            f"SELECT {RULE_COLUMNS}, created_at FROM category_rules ORDER BY priority DESC, length(pattern) DESC, id"
+        )],
+    )
+
+
+def rule_changes(since: int) -> Tuple[int, Dict[int, Optional[Dict[str, Any]]], bool]:
+    """
+    (current rule version, {rule id: its row, or None if deleted}, full) for
+    the rules changed after version `since`. When since is 0 or the log no
+    longer reaches back to it (see prune_rule_log), the dict holds every rule
+    instead and full is True; rules deleted meanwhile aren't in it, so start over.
+    """
+    conn = get_conn()
+    version, oldest = conn.execute(
+        "SELECT (SELECT COALESCE(MAX(version), 0) FROM category_rule_log), "
+        "(SELECT COALESCE(MIN(version), 0) FROM category_rule_log)"
+    ).fetchone()
+    if version == since:
+        return version, {}, False
+    if since == 0 or not oldest - 1 <= since <= version:
+        return version, {r["id"]: dict(r) for r in conn.execute(f"SELECT {RULE_COLUMNS} FROM category_rules")}, True
+    ids = [r[0] for r in conn.execute(
+        "SELECT DISTINCT rule_id FROM category_rule_log WHERE version > ? AND version <= ?", (since, version)
+    )]
+    changed: Dict[int, Optional[Dict[str, Any]]] = dict.fromkeys(ids)
+    for start in range(0, len(ids), 500):
+        part = ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT {RULE_COLUMNS} FROM category_rules WHERE id IN ({','.join('?' * len(part))})", part
+        )
+        changed.update((r["id"], dict(r)) for r in rows)
+    return version, changed, False
+
+
+def prune_rule_log(upto: int, wait: bool = True) -> Union[int, Future]:
+    """
+    Drops rule log entries older than version `upto`. That entry itself is
+    kept, so the version never goes back. Returns rows removed.
+    """
+    def op(conn: sqlite3.Connection) -> int:
+        return conn.execute("DELETE FROM category_rule_log WHERE version < ?", (upto,)).rowcount
+
+    return _write(op, wait)
+
+
+#  Snapshot export 
+def track_row_changes(table: str, wait: bool = True) -> Union[int, Future]:
+    """
+    Starts logging updates and deletes of `table` for row_changes(), unless
+    it already is. Returns the latest change seq: a snapshot built from rows
+    read after this call is current as of it.
+    """
+    if table not in SNAPSHOT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+
+    def op(conn: sqlite3.Connection) -> int:
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM row_changes").fetchone()[0]
+        conn.execute("INSERT OR IGNORE INTO row_change_tables (tbl, since) VALUES (?, ?)", (table, seq))
+        return seq
+
+    return _write(op, wait)
+
+
+def row_changes(table: str, since: int) -> Tuple[int, List[int], bool]:
+    """
+    (latest change seq, ids of `table` rows updated or deleted after seq
+    `since`, complete). complete is False if the log doesn't cover everything
+    after `since`: the table isn't tracked (see track_row_changes), or its
+    log was pruned or dropped past that point.
+    """
+    if table not in SNAPSHOT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
     conn = get_conn()
+    seq, tracked = conn.execute(
+        "SELECT (SELECT COALESCE(MAX(seq), 0) FROM row_changes), (SELECT since FROM row_change_tables WHERE tbl = ?)",
+        (table,),
+    ).fetchone()
+    ids = [r[0] for r in conn.execute(
+        "SELECT DISTINCT row_id FROM row_changes WHERE tbl = ? AND seq > ? AND seq <= ? ORDER BY row_id",
+        (table, since, seq),
+    )]
+    return seq, ids, tracked is not None and since >= tracked
+
+
+def prune_row_changes(table: str, upto: int, wait: bool = True) -> Optional[Future]:
+    """
+    Drops the change log of `table` up to seq `upto` once a snapshot has
+    applied it. The newest entry is kept, so seq never goes back.
+    """
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM row_changes WHERE tbl = ? AND seq <= ? AND seq < (SELECT MAX(seq) FROM row_changes)",
+            (table, upto),
+        )
+        # ROW_CHANGES_MAX counts from here now.
+        conn.execute("UPDATE row_change_tables SET since = max(since, ?) WHERE tbl = ?", (upto, table))
+
+    return _write(op, wait)
+
+
+def scan_rows(
+    table: str, columns: Sequence[str], after: int = 0, ids: Optional[Sequence[int]] = None, chunk: int = 50_000
+) -> Iterator[List[Tuple]]:
+    """
+    (id, *columns) rows of `table` in id order, a chunk at a time: every row
+    with id > after, or only the given ids (missing ones are skipped).
+    """
+    if table not in SNAPSHOT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    conn = get_conn()
+    select = f"SELECT id, {', '.join(columns)} FROM {table}"
+    if ids is not None:
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            rows = conn.execute(f"{select} WHERE id IN ({','.join('?' * len(part))}) ORDER BY id", part).fetchall()
+            if rows:
+                yield rows
+        return
+    while True:
+        rows = conn.execute(f"{select} WHERE id > ? ORDER BY id LIMIT ?", (after, chunk)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+#  Profile 
+def upsert_profile(
+    location: Optional[str], savings_goal_type: str, savings_goal_value: float, focus_categories: str,
+    wait: bool = True,
+) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            INSERT INTO profile (id, location, savings_goal_type, savings_goal_value, focus_categories)
+            VALUES (1, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                location=excluded.location,
+                savings_goal_type=excluded.savings_goal_type,
+                savings_goal_value=excluded.savings_goal_value,
+                focus_categories=excluded.focus_categories
+            """,
+            (location, savings_goal_type, savings_goal_value, focus_categories),
+        )
+
+    return _write(op, wait)
+
+
+def get_profile(conn: Optional[sqlite3.Connection] = None) -> Optional[Dict[str, Any]]:
+    conn = conn or get_conn()
     row = conn.execute("SELECT * FROM profile WHERE id = 1").fetchone()
-    conn.close()
     return dict(row) if row else None
+
+
+def load_profile() -> Optional[Dict[str, Any]]:
+    """get_profile(), cached until the next write. Shared between callers; treat as read-only."""
+    return _cached("profile", get_profile)
+
+
+#  Snapshot 
+class Snapshot(NamedTuple):
+    version: int
+    incomes: List[Dict[str, Any]]
+    expenses: List[Dict[str, Any]]
+    profile: Optional[Dict[str, Any]]
+
+
+def load_snapshot() -> Snapshot:
+    """
+    Income, expenses and profile loaded once and reused until the data changes.
+    Costs a single PRAGMA when nothing was written. The lists are shared
+    between callers; treat them as read-only.
+    """
+    return _cached(
+        "snapshot",
+        lambda: Snapshot(_write_version, list_income(), list_expenses(), get_profile()),
+    )
+
+
+#  Aggregates 
+class Totals(NamedTuple):
+    monthly_income: float
+    fixed_total: float
+    fixed_by_category: Dict[str, float]
+
+
+def read_totals(conn: sqlite3.Connection) -> Totals:
+    """
+    Monthly income, fixed total and per-category fixed totals, aggregated in
+    SQLite from the stored monthly_amount column. Works on any connection to
+    a TrueBudget database.
+    """
+    income = conn.execute("SELECT COALESCE(SUM(monthly_amount), 0.0) FROM income_sources").fetchone()[0]
+    rows = conn.execute(
+        "SELECT category, SUM(monthly_amount) FROM expenses GROUP BY category"
+    ).fetchall()
+    by_cat = {r[0]: r[1] for r in rows}
+    return Totals(income, sum(by_cat.values()), by_cat)
+
+
+def load_totals() -> Totals:
+    """read_totals() on this database, cached like load_snapshot()."""
+    return _cached("totals", lambda: read_totals(get_conn()))
+
+
+#  LLM response cache 
+# Hits not yet written: key -> (last used, hit count). Committing each one
+# would change data_version() and throw away the budget caches on every
+# cached advice lookup, so they ride along with the next put or evict.
+_llm_touches: Dict[str, Tuple[float, int]] = {}
+_llm_touches_lock = threading.Lock()
+
+
+def _take_llm_touches() -> List[Tuple[float, int, str]]:
+    with _llm_touches_lock:
+        touches = [(used, n, key) for key, (used, n) in _llm_touches.items()]
+        _llm_touches.clear()
+    return touches
+
+
+def _apply_llm_touches(conn: sqlite3.Connection, touches: List[Tuple[float, int, str]]) -> None:
+    if touches:
+        conn.executemany(
+            "UPDATE llm_cache SET last_used = max(last_used, ?), hits = hits + ? WHERE key = ?", touches
+        )
+
+
+def llm_cache_get(key: str, max_age: float) -> Optional[str]:
+    """Cached response for `key` if younger than `max_age` seconds; marks it recently used."""
+    now = time.time()
+    row = get_conn().execute(
+        "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?", (key, now - max_age)
+    ).fetchone()
+    if row is None:
+        return None
+    with _llm_touches_lock:
+        _, n = _llm_touches.get(key, (now, 0))
+        _llm_touches[key] = (now, n + 1)
+    return row["response"]
+
+
+def llm_cache_put(key: str, model: str, prompt_version: int, response: str, wait: bool = True) -> Optional[Future]:
+    now = time.time()
+    touches = _take_llm_touches()
+
+    def op(conn: sqlite3.Connection) -> None:
+        _apply_llm_touches(conn, touches)
+        conn.execute(
+            """
+            INSERT INTO llm_cache (key, model, prompt_version, response, size, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                response=excluded.response,
+                size=excluded.size,
+                created_at=excluded.created_at,
+                last_used=excluded.last_used
+            """,
+            (key, model, prompt_version, response, len(response.encode("utf-8")), now, now),
+        )
+
+    return _write(op, wait)
+
+
+def llm_cache_evict(max_entries: int, max_bytes: int, max_age: float, wait: bool = True) -> Union[int, Future]:
+    """Drops expired entries, then least-recently-used ones until both limits hold. Returns rows removed."""
+    touches = _take_llm_touches()  # so recent hits count as recently used
+
+    def op(conn: sqlite3.Connection) -> int:
+        _apply_llm_touches(conn, touches)
+        removed = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - max_age,)).rowcount
+        # Walk from most to least recently used; everything past either limit goes.
+        keep = 0
+        used = 0
+        for row in conn.execute("SELECT size FROM llm_cache ORDER BY last_used DESC"):
+            if keep + 1 > max_entries or used + row["size"] > max_bytes:
+                break
+            keep += 1
+            used += row["size"]
+        removed += conn.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (keep,),
+        ).rowcount
+        return removed
+
+    return _write(op, wait)
+
+
+def llm_cache_clear(wait: bool = True) -> Optional[Future]:
+    def op(conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM llm_cache")
+
+    return _write(op, wait)
+
+
+# Connection and writer plumbing runs inside the traced calls; timing it too would only add overhead.
+# scan_rows is a generator, so a span would only time creating it.
+perf.instrument(
+    globals(), "db",
+    skip=("get_conn", "close_conn", "stop_writer", "submit_write", "writer_stats", "data_version", "scan_rows"),
+)
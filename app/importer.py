@@ -0,0 +1,402 @@
+"""
+Streaming bulk import of bank exports and recurring items.
+
+Files are read through a generator pipeline: parse (CSV or OFX) ->
+normalize (dates, frequencies, categories) -> fingerprint for dedupe ->
+chunks of CHUNK_ROWS rows written with one executemany per transaction.
+Only one chunk of rows is held in memory, plus a small counter per distinct
+transaction for numbering repeats.
+
+CSV files are recognized by their header:
+  date, description/name/payee, amount[, category][, account]  -> transactions
+  name, amount, frequency[, category]                         -> recurring items
+    (rows with a category become expenses, rows without become income)
+
+Transactions the file leaves uncategorized get the category of the
+winning rule (categorize.py), matched in the prefetch thread.
+
+Usage: python app/importer.py FILE [FILE ...]
+"""
+import csv
+import hashlib
+import io
+import math
+import os
+import queue
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import categorize
+import db
+
+CHUNK_ROWS = 50_000
+
+FIXED_CATEGORIES = ["Rent", "Bills", "Insurance", "Debt", "Subscriptions", "Other Fixed"]
+
+FREQUENCY_ALIASES = {
+    "weekly": "weekly", "week": "weekly", "wk": "weekly", "every week": "weekly",
+    "biweekly": "biweekly", "bi-weekly": "biweekly", "fortnightly": "biweekly",
+    "every 2 weeks": "biweekly", "every two weeks": "biweekly", "2 weeks": "biweekly",
+    "monthly": "monthly", "month": "monthly", "mo": "monthly", "every month": "monthly",
+}
+
+DESCRIPTION_COLUMNS = ("description", "name", "payee", "merchant", "memo", "details")
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d.%m.%Y", "%Y/%m/%d", "%Y%m%d")
+
+
+@dataclass
+class ImportProgress:
+    kind: str = ""
+    rows_read: int = 0
+    rows_inserted: int = 0
+    rows_rejected: int = 0
+    bytes_read: int = 0
+    total_bytes: Optional[int] = None
+
+    @property
+    def rows_skipped(self) -> int:
+        """Rows that parsed fine but were already in the database."""
+        return self.rows_read - self.rows_rejected - self.rows_inserted
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(1.0, self.bytes_read / self.total_bytes)
+
+
+#  Normalization
+def normalize_frequency(value: str) -> Optional[str]:
+    return FREQUENCY_ALIASES.get(" ".join(value.lower().replace("_", " ").split()))
+
+
+def normalize_category(value: str, known: List[str] = FIXED_CATEGORIES, default: str = "Other Fixed") -> str:
+    v = value.strip().lower()
+    for k in known:
+        if k.lower() == v:
+            return k
+    return default
+
+
+def normalize_date(value: str) -> Optional[str]:
+    value = value.strip()
+    # Fast path for ISO dates, which most exports use.
+    if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        try:
+            return datetime.fromisoformat(value[:10]).strftime("%Y-%m-%d")
+        except ValueError:
+            return None  # shaped like ISO but not a real day, e.g. 2026-13-45
+    token = value.split()[0] if value else ""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(token, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value: str) -> float:
+    try:
+        amount = float(value)  # the common case: a plain decimal
+    except ValueError:
+        v = value.strip().replace(",", "").replace("$", "")
+        if v.startswith("(") and v.endswith(")"):  # accounting negative
+            v = "-" + v[1:-1]
+        amount = float(v)
+    # float() also takes "nan" and "inf", which would poison every total.
+    if not math.isfinite(amount):
+        raise ValueError(f"amount is not a finite number: {value!r}")
+    return amount
+
+
+#  Readers
+class _CountingReader(io.RawIOBase):
+    """Counts bytes pulled from the underlying binary stream (for progress)."""
+
+    def __init__(self, raw: IO[bytes], progress: ImportProgress) -> None:
+        self._raw = raw
+        self._progress = progress
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        data = self._raw.read(len(buf))
+        n = len(data)
+        buf[:n] = data
+        self._progress.bytes_read += n
+        return n
+
+
+def _text_stream(raw: IO[bytes], progress: ImportProgress) -> io.TextIOWrapper:
+    return io.TextIOWrapper(
+        io.BufferedReader(_CountingReader(raw, progress), buffer_size=1 << 20),
+        encoding="utf-8-sig",
+        errors="replace",
+        newline="",
+    )
+
+
+def read_csv(text: IO[str]) -> Tuple[List[str], Iterator[List[str]]]:
+    reader = csv.reader(text)
+    header = [h.strip().lower() for h in next(reader, [])]
+    return header, reader
+
+
+def read_ofx(text: IO[str], block: int = 1 << 16) -> Iterator[Dict[str, str]]:
+    """
+    Yields one dict per <STMTTRN> from an OFX 1.x (SGML) or 2.x (XML) file.
+    Tags are split on '<' across fixed-size reads, so tags need not be on
+    their own lines and memory stays flat.
+    """
+    current: Optional[Dict[str, str]] = None
+    account = ""  # <ACCTID> sits outside the transaction list
+    carry = ""
+    while True:
+        data = text.read(block)
+        if not data:
+            break
+        pieces = (carry + data).split("<")
+        carry = pieces.pop()  # may be cut mid-tag; finish it with the next read
+        for piece in pieces:
+            if ">" not in piece:
+                continue
+            tag, _, value = piece.partition(">")
+            tag = tag.strip().upper()
+            if tag == "STMTTRN":
+                current = {"ACCTID": account}
+            elif tag == "ACCTID" and current is None:
+                account = value.strip()
+            elif tag == "/STMTTRN":
+                if current is not None:
+                    yield current
+                current = None
+            elif current is not None and not tag.startswith("/"):
+                current[tag] = value.strip()
+
+
+#  Row pipelines
+def _fingerprint(*parts: str) -> int:
+    # 64-bit integer keys keep the UNIQUE index small, which is most of the insert cost.
+    digest = hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _transaction_rows(
+    records: Iterable[Tuple[str, str, str, Optional[str], Optional[str], Optional[str]]], progress: ImportProgress
+) -> Iterator[Tuple[str, str, float, Optional[str], Optional[str], int]]:
+    """
+    (date, description, amount, category, account, bank_id) strings ->
+    normalized rows with a fingerprint. Identical rows (two coffees on one
+    day) are numbered so a re-import is ignored but real repeats are kept.
+    The numbering spans the whole file, which need not be sorted by date; it
+    costs one small int entry per distinct row without a bank id.
+    """
+    seen: Dict[int, int] = {}  # fingerprint of the row's first occurrence -> occurrences so far
+    read = rejected = 0
+    for date, desc, amount, category, account, bank_id in records:
+        read += 1
+        day = normalize_date(date or "")
+        try:
+            value = parse_amount(amount or "")
+        except ValueError:
+            day = None
+        if day is None:
+            rejected += 1
+            continue
+        desc = " ".join((desc or "").split())
+        if bank_id:
+            fp = _fingerprint(account or "", bank_id)
+        else:
+            base = (day, desc, repr(value), account or "")
+            fp = first = _fingerprint(*base, "0")
+            n = seen.get(first, 0)
+            seen[first] = n + 1
+            if n:
+                fp = _fingerprint(*base, str(n))
+        if read & 0x3FFF == 0:  # keep progress current without touching it per row
+            progress.rows_read += read
+            progress.rows_rejected += rejected
+            read = rejected = 0
+        yield day, desc, value, (category or "").strip() or None, account or None, fp
+    progress.rows_read += read
+    progress.rows_rejected += rejected
+
+
+def _csv_transactions(header: List[str], rows: Iterator[List[str]]) -> Iterator[tuple]:
+    col = {h: i for i, h in enumerate(header)}
+    d = col["date"]
+    desc = next(col[c] for c in DESCRIPTION_COLUMNS if c in col)
+    amt = col["amount"]
+    cat = col.get("category")
+    acct = col.get("account")
+    fitid = col.get("id", col.get("transaction id"))
+    for r in rows:
+        if len(r) <= max(d, desc, amt):
+            yield None, None, None, None, None, None
+            continue
+        yield (
+            r[d], r[desc], r[amt],
+            r[cat] if cat is not None and cat < len(r) else None,
+            r[acct] if acct is not None and acct < len(r) else None,
+            r[fitid] if fitid is not None and fitid < len(r) else None,
+        )
+
+
+def _ofx_transactions(text: IO[str]) -> Iterator[tuple]:
+    for t in read_ofx(text):
+        desc = t.get("NAME") or t.get("PAYEE") or t.get("MEMO") or ""
+        yield t.get("DTPOSTED", "")[:8], desc, t.get("TRNAMT", ""), None, t.get("ACCTID"), t.get("FITID")
+
+
+def _recurring_rows(header: List[str], rows: Iterator[List[str]], progress: ImportProgress) -> Iterator[tuple]:
+    """Yields ("income", (name, amount, freq)) or ("expense", (name, amount, freq, category))."""
+    col = {h: i for i, h in enumerate(header)}
+    name_i, amt_i, freq_i = col["name"], col["amount"], col["frequency"]
+    cat_i = col.get("category")
+    for r in rows:
+        progress.rows_read += 1
+        try:
+            name = r[name_i].strip()
+            amount = parse_amount(r[amt_i])
+            freq = normalize_frequency(r[freq_i])
+        except (IndexError, ValueError):
+            name, freq = "", None
+        if not name or freq is None or amount <= 0:
+            progress.rows_rejected += 1
+            continue
+        cat = r[cat_i].strip() if cat_i is not None and cat_i < len(r) else ""
+        if cat:
+            yield "expense", (name, amount, freq, normalize_category(cat))
+        else:
+            yield "income", (name, amount, freq)
+
+
+def _chunks(rows: Iterator, size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prefetch(chunks: Iterator[list], depth: int = 2) -> Iterator[list]:
+    """
+    Parses the next chunk on a helper thread while the current one is being
+    written; SQLite releases the GIL while it works. At most `depth` chunks wait.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                q.put(chunk)
+            q.put(done)
+        except BaseException as e:  # re-raised in the consumer
+            q.put(e)
+
+    threading.Thread(target=produce, name="import-parser", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer stuck on a full queue.
+        while not q.empty():
+            q.get_nowait()
+
+
+#  Entry point
+def import_file(
+    source: Union[str, os.PathLike, IO[bytes]],
+    filename: Optional[str] = None,
+    on_progress: Optional[Callable[[ImportProgress], None]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> ImportProgress:
+    """
+    Imports a CSV or OFX file (path or binary file object) into the database.
+    on_progress is called after every committed chunk.
+    """
+    progress = ImportProgress()
+    if isinstance(source, (str, os.PathLike)):
+        filename = filename or os.fspath(source)
+        progress.total_bytes = os.path.getsize(source)
+        raw: IO[bytes] = open(source, "rb")
+    else:
+        raw = source
+        try:
+            progress.total_bytes = raw.seek(0, os.SEEK_END)
+            raw.seek(0)
+        except (AttributeError, OSError):
+            pass
+
+    def report() -> None:
+        if on_progress:
+            on_progress(progress)
+
+    with raw:
+        text = _text_stream(raw, progress)
+        if (filename or "").lower().endswith((".ofx", ".qfx")):
+            progress.kind = "transactions"
+            chunks = _chunks(_transaction_rows(_ofx_transactions(text), progress), chunk_rows)
+            for batch in _prefetch(map(categorize.get_index().categorize_rows, chunks)):
+                progress.rows_inserted += db.insert_transaction_batch(batch)
+                report()
+            return progress
+
+        header, rows = read_csv(text)
+        if "frequency" in header and "name" in header and "amount" in header:
+            progress.kind = "recurring"
+            for batch in _chunks(_recurring_rows(header, rows, progress), chunk_rows):
+                incomes = [r for kind, r in batch if kind == "income"]
+                expenses = [r for kind, r in batch if kind == "expense"]
+                if incomes:
+                    progress.rows_inserted += db.insert_income_batch(incomes)
+                if expenses:
+                    progress.rows_inserted += db.insert_expense_batch(expenses)
+                report()
+        elif "date" in header and "amount" in header and any(c in header for c in DESCRIPTION_COLUMNS):
+            progress.kind = "transactions"
+            chunks = _chunks(_transaction_rows(_csv_transactions(header, rows), progress), chunk_rows)
+            for batch in _prefetch(map(categorize.get_index().categorize_rows, chunks)):
+                progress.rows_inserted += db.insert_transaction_batch(batch)
+                report()
+        else:
+            raise ValueError(f"Unrecognized CSV header: {', '.join(header) or '(empty)'}")
+    return progress
+
+
+def main(argv: List[str]) -> int:
+    if not argv:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    db.init_db()
+    for path in argv:
+        def show(p: ImportProgress) -> None:
+            pct = f"{p.fraction:.0%}" if p.fraction is not None else "?"
+            print(f"\r{path}: {pct} {p.rows_read:,} rows read, {p.rows_inserted:,} new", end="", file=sys.stderr)
+
+        p = import_file(path, on_progress=show)
+        print(
+            f"\r{path}: {p.kind}: {p.rows_read:,} read, {p.rows_inserted:,} new, "
+            f"{p.rows_skipped:,} already present, {p.rows_rejected:,} rejected",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
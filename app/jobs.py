@@ -0,0 +1,234 @@
+"""
+Background queue for LLM advice.
+
+Advice requests run on a small pool of worker threads instead of the
+Streamlit script thread, so the dashboard stays responsive while a local
+model works. Each browser session has its own FIFO and workers take
+sessions in round-robin order, so one session queuing several requests
+can't starve the others. A request whose payload is identical to one
+already queued or running joins that job instead of starting another.
+Follow-up questions in an llm.AdviceSession wait in the same queue.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Set
+
+from llm import DEFAULT_MODEL, AdviceSession, cached_advice, payload_key, stream_advice
+
+ACTIVE = ("queued", "running")
+MAX_QUEUED_PER_SESSION = 3
+KEEP_FINISHED = 200  # finished jobs remembered for status()/result()
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    payload: Dict[str, Any]
+    model: str
+    refresh: bool
+    status: str = "queued"  # queued | running | done | failed | cancelled
+    text: str = ""          # grows while running; the full answer once done
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    sessions: Set[str] = field(default_factory=set)
+    stream: Optional[Callable[[], Iterator[str]]] = None  # follow-ups; None runs the queue's runner
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    done_event: threading.Event = field(default_factory=threading.Event)
+
+
+class JobQueue:
+    def __init__(self, workers: int = 1, runner: Callable[..., Iterator[str]] = stream_advice) -> None:
+        self._runner = runner
+        self._lock = threading.Condition()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._pending: Dict[str, Deque[str]] = {}  # session -> queued job ids
+        self._turns: Deque[str] = deque()          # sessions with queued work, in serving order
+        self._threads = [
+            threading.Thread(target=self._work, name=f"advice-worker-{i}", daemon=True) for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    #  Public API
+    def submit(self, session_id: str, payload: Dict[str, Any], model: str = DEFAULT_MODEL, refresh: bool = False) -> str:
+        """Queues an advice request and returns its job id. Raises queue.Full past MAX_QUEUED_PER_SESSION."""
+        key = payload_key(payload, model)
+        with self._lock:
+            existing = None if refresh else self._join(key, session_id)
+            if existing is not None:
+                return existing
+
+        job = Job(id=uuid.uuid4().hex, key=key, payload=payload, model=model, refresh=refresh, sessions={session_id})
+        cached = None if refresh else cached_advice(payload, model)
+
+        with self._lock:
+            # Another submit of the same payload may have queued while the cache was read.
+            existing = None if refresh else self._join(key, session_id)
+            if existing is not None:
+                return existing
+            self._jobs[job.id] = job
+            if cached is not None:
+                job.text = cached
+                self._finish(job, "done")
+                return job.id
+            self._enqueue(job, session_id)
+        return job.id
+
+    def submit_followup(self, session_id: str, chat: AdviceSession, question: str) -> str:
+        """Queues a follow-up question in an advice conversation; same limits as submit()."""
+        job = Job(
+            id=uuid.uuid4().hex, key=f"{chat.key}:{uuid.uuid4().hex}", payload=chat.payload, model=chat.model,
+            refresh=True, sessions={session_id}, stream=lambda: chat.ask(question),
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._enqueue(job, session_id)
+        return job.id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "id": job.id,
+                "status": job.status,
+                "text": job.text,
+                "error": job.error,
+                "position": self._position(job),
+                "submitted_at": job.submitted_at,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+            }
+
+    def result(self, job_id: str, timeout: Optional[float] = None) -> str:
+        """Blocks until the job finishes; returns the advice or raises."""
+        with self._lock:
+            job = self._jobs[job_id]
+        if not job.done_event.wait(timeout):
+            raise TimeoutError(job_id)
+        if job.status == "failed":
+            raise RuntimeError(job.error)
+        if job.status == "cancelled":
+            raise RuntimeError("advice request was cancelled")
+        return job.text
+
+    def cancel(self, job_id: str, session_id: str) -> bool:
+        """
+        Withdraws this session's interest. The job itself stops only when no
+        other session is waiting on it. Returns True if it was stopped.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE:
+                return False
+            job.sessions.discard(session_id)
+            if job.sessions:
+                return False
+            if job.status == "queued":
+                for sid, pending in self._pending.items():
+                    if job_id in pending:
+                        pending.remove(job_id)
+                self._finish(job, "cancelled")
+            else:
+                job.cancel_event.set()
+            return True
+
+    #  Internals (caller holds self._lock)
+    def _join(self, key: str, session_id: str) -> Optional[str]:
+        # Adds the session to the active job for key, if any, and returns its id.
+        existing = self._jobs.get(self._by_key.get(key, ""))
+        if existing is None or existing.status not in ACTIVE:
+            return None
+        existing.sessions.add(session_id)
+        return existing.id
+
+    def _enqueue(self, job: Job, session_id: str) -> None:
+        pending = self._pending.setdefault(session_id, deque())
+        if len(pending) >= MAX_QUEUED_PER_SESSION:
+            del self._jobs[job.id]
+            raise queue.Full(f"at most {MAX_QUEUED_PER_SESSION} advice requests can wait per session")
+        self._by_key[job.key] = job.id
+        pending.append(job.id)
+        if session_id not in self._turns:
+            self._turns.append(session_id)
+        self._lock.notify()
+
+    def _position(self, job: Job) -> Optional[int]:
+        if job.status != "queued":
+            return None
+        ahead = sum(1 for j in self._jobs.values() if j.status == "queued" and j.submitted_at < job.submitted_at)
+        return ahead + 1
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if self._by_key.get(job.key) == job.id:
+            del self._by_key[job.key]
+        job.done_event.set()
+        # Forget the oldest finished jobs once the table is full.
+        finished = [j.id for j in self._jobs.values() if j.status not in ACTIVE]
+        for old in finished[: max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[old]
+
+    def _next_job(self) -> Job:
+        with self._lock:
+            while True:
+                while self._turns:
+                    sid = self._turns.popleft()
+                    pending = self._pending.get(sid)
+                    if not pending:
+                        self._pending.pop(sid, None)
+                        continue
+                    job = self._jobs[pending.popleft()]
+                    if pending:
+                        self._turns.append(sid)  # back of the line behind other sessions
+                    else:
+                        del self._pending[sid]
+                    job.status = "running"
+                    job.started_at = time.time()
+                    return job
+                self._lock.wait()
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job.stream is not None:
+                stream = job.stream()
+            else:
+                stream = self._runner(job.payload, model=job.model, refresh=job.refresh)
+            try:
+                for chunk in stream:
+                    if job.cancel_event.is_set():
+                        break
+                    job.text += chunk
+            except Exception as e:
+                with self._lock:
+                    self._finish(job, "failed", str(e))
+                continue
+            finally:
+                stream.close()  # drops the HTTP connection so Ollama stops generating
+            with self._lock:
+                self._finish(job, "cancelled" if job.cancel_event.is_set() else "done")
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    """The process-wide advice queue. One worker: a local Ollama serves one request at a time."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(workers=1)
+        return _queue
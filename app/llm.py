@@ -1,50 +1,371 @@
+import hashlib
 import json
-from typing import Dict, Any, Optional
-import requests
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple
 
+if TYPE_CHECKING:
+    import requests
 
-OLLAMA_URL = "http://localhost:11434/api/chat"
+import perf
+from db import llm_cache_evict, llm_cache_get, llm_cache_put
+
+
+# Same variable the Ollama CLI reads; may be given without a scheme.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+if "://" not in OLLAMA_HOST:
+    OLLAMA_HOST = f"http://{OLLAMA_HOST}"
+OLLAMA_URL = f"{OLLAMA_HOST}/api/chat"
 DEFAULT_MODEL = "llama3.1:8b"
 
+# Bump whenever the prompt text below changes so old answers stop matching.
+PROMPT_VERSION = 2
+# How long Ollama keeps the model (and its prompt cache) loaded after a request.
+# Same variable the Ollama server reads for its own default.
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_BYTES = 5 * 1024 * 1024
+CACHE_MAX_AGE = 7 * 24 * 3600  # seconds
 
-def ollama_available() -> bool:
+# Zero-width characters some models emit; they break markdown rendering.
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+_stats = {"hits": 0, "misses": 0, "requests": 0, "prompt_tokens": 0}
+_stats_lock = threading.Lock()
+
+HEALTH_TTL = 15.0  # seconds a probe result is trusted before a background refresh
+PROBE_TIMEOUT = 1.5
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+# ok is None until the first probe finishes.
+_health: Dict[str, Any] = {"ok": None, "checked": float("-inf"), "probing": False}
+_health_lock = threading.Lock()
+
+
+def session() -> "requests.Session":
+    """
+    Process-wide keep-alive session shared by every Ollama call. requests is
+    imported here, on first use, so pages that never talk to Ollama skip it.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+def _set_health(ok: bool) -> None:
+    with _health_lock:
+        _health["ok"] = ok
+        _health["checked"] = time.monotonic()
+
+
+def _probe() -> None:
     try:
-        r = requests.get("http://localhost:11434", timeout=1.5)
-        return r.status_code in (200, 404)
+        with perf.span("llm.probe"):
+            r = session().get(OLLAMA_HOST, timeout=PROBE_TIMEOUT)
+        ok = r.status_code in (200, 404)
     except Exception:
-        return False
+        ok = False
+    _set_health(ok)
+    with _health_lock:
+        _health["probing"] = False
+
+
+def ollama_status() -> Optional[bool]:
+    """
+    Last known Ollama availability, or None if no probe has finished yet.
+    Never blocks: a stale result triggers one background re-probe.
+    """
+    with _health_lock:
+        stale = time.monotonic() - _health["checked"] > HEALTH_TTL
+        if stale and not _health["probing"]:
+            _health["probing"] = True
+            threading.Thread(target=_probe, name="ollama-probe", daemon=True).start()
+        return _health["ok"]
+
+
+def ollama_available() -> bool:
+    return bool(ollama_status())
+
+
+def clean_text(text: str) -> str:
+    """Strips zero-width spaces/joiners and BOMs."""
+    return text.translate(_ZERO_WIDTH)
+
+
+# Payload keys that are instructions rather than data; SYSTEM_PROMPT says the same.
+_PROMPT_ONLY = ("note",)
+# Left out when empty; zeros and False stay.
+_EMPTY_DROPPED = (str, list, tuple, dict, type(None))
+
+
+def _compact(value: Any) -> Any:
+    kind = type(value)
+    if kind is float:
+        value = round(value, 2)
+        return int(value) if value.is_integer() else value
+    if kind is dict:
+        return {k: _compact(v) for k, v in value.items() if v or not isinstance(v, _EMPTY_DROPPED)}
+    if kind is list or kind is tuple:
+        return [_compact(v) for v in value]
+    return value
+
+
+def encode_payload(payload: Dict[str, Any]) -> str:
+    """
+    The payload as the model sees it: sorted keys, no whitespace, amounts
+    rounded to cents (whole dollars without ".0"), empty fields and the note
+    left out. Equal budgets always give byte-identical text.
+    """
+    data = {k: v for k, v in payload.items() if k not in _PROMPT_ONLY}
+    return json.dumps(_compact(data), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def payload_key(payload: Dict[str, Any], model: str) -> str:
+    """Cache key: model + prompt version + a hash of the encoded payload."""
+    return hashlib.sha256(f"{model}\n{PROMPT_VERSION}\n{encode_payload(payload)}".encode("utf-8")).hexdigest()
+
+
+def cache_stats() -> Dict[str, int]:
+    """Cache hits/misses, plus Ollama requests and the prompt tokens it evaluated for them."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
 
 
-def generate_advice(payload: Dict[str, Any], model: str = DEFAULT_MODEL) -> str:
+def cached_advice(payload: Dict[str, Any], model: str = DEFAULT_MODEL) -> Optional[str]:
+    """Saved answer for this exact payload and model, without contacting Ollama."""
+    cached = llm_cache_get(payload_key(payload, model), CACHE_MAX_AGE)
+    if cached is not None:
+        _count("hits")
+    return cached
+
+
+def generate_advice(
+    payload: Dict[str, Any], model: str = DEFAULT_MODEL, use_cache: bool = True, refresh: bool = False
+) -> str:
     """
     Generates plain-English advice. We keep math in code; the LLM explains and suggests.
+    Identical payloads are answered from the SQLite cache; refresh=True forces a new answer.
+    """
+    if not use_cache:
+        return _request_advice(payload, model)
+
+    if not refresh:
+        cached = cached_advice(payload, model)
+        if cached is not None:
+            return cached
+
+    _count("misses")
+    advice = _request_advice(payload, model)
+    llm_cache_put(payload_key(payload, model), model, PROMPT_VERSION, advice)
+    llm_cache_evict(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_MAX_AGE, wait=False)
+    return advice
+
+
+#  Prompt
+# The same text on every request, ahead of anything that varies, so a warm
+# model reuses its evaluation of it and only prefills the budget itself.
+SYSTEM_PROMPT = (
+    "You are a helpful budgeting coach. Use ONLY the numbers provided by the app. "
+    "Do not invent income/expense values. "
+    "Give short, actionable advice. If something is missing, ask a clarifying question.\n\n"
+    "The user sends their budget as compact JSON. The app computed all numbers "
+    "(monthly dollars); use these numbers exactly.\n\n"
+    "For a budget, return:\n"
+    "1) A short summary of the situation\n"
+    "2) 3-6 bullet tips\n"
+    "3) A simple next-steps checklist (3-5 items)\n"
+    "Keep it friendly and not judgmental. Answer follow-up questions briefly, using the same numbers."
+)
+
+
+def _messages(payload: Dict[str, Any]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Budget: {encode_payload(payload)}"},
+    ]
+
+
+def _body(messages: List[Dict[str, str]], model: str, stream: bool) -> Dict[str, Any]:
+    return {"model": model, "messages": messages, "stream": stream, "keep_alive": KEEP_ALIVE}
+
+
+def _usage(final: Dict[str, Any]) -> Dict[str, float]:
     """
-    system = (
-        "You are a helpful budgeting coach. Use ONLY the numbers provided by the app. "
-        "Do not invent income/expense values. "
-        "Give short, actionable advice. If something is missing, ask a clarifying question."
-    )
-
-    user = (
-        "Create a monthly budgeting explanation and tips using this JSON data.\n\n"
-        f"{json.dumps(payload, indent=2)}\n\n"
-        "Return:\n"
-        "1) A short summary of the situation\n"
-        "2) 3-6 bullet tips\n"
-        "3) A simple next-steps checklist (3-5 items)\n"
-        "Keep it friendly and not judgmental."
-    )
-
-    body = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        "stream": False,
+    Ollama's counters from a finished response. prompt_tokens counts only the
+    tokens it had to evaluate: a prefix still cached from the previous request
+    is not included.
+    """
+    usage = {
+        "prompt_tokens": final.get("prompt_eval_count", 0),
+        "prefill_ms": final.get("prompt_eval_duration", 0) / 1e6,
+        "output_tokens": final.get("eval_count", 0),
+        "generate_ms": final.get("eval_duration", 0) / 1e6,
+        "load_ms": final.get("load_duration", 0) / 1e6,
+        "total_ms": final.get("total_duration", 0) / 1e6,
     }
+    _count("requests")
+    _count("prompt_tokens", usage["prompt_tokens"])
+    if perf.enabled():
+        perf.record("llm.prefill", final.get("prompt_eval_duration", 0))
+    return usage
+
 
-    resp = requests.post(OLLAMA_URL, json=body, timeout=180)
+#  Requests
+def _request_advice(payload: Dict[str, Any], model: str) -> str:
+    import requests
+
+    try:
+        with perf.span("llm.chat"):
+            resp = session().post(OLLAMA_URL, json=_body(_messages(payload), model, stream=False), timeout=180)
+    except requests.ConnectionError:
+        _set_health(False)
+        raise
+    _set_health(True)
     resp.raise_for_status()
     data = resp.json()
+    _usage(data)
     return data["message"]["content"]
+
+
+def _stream_chat(messages: List[Dict[str, str]], model: str, usage: Dict[str, float]) -> Iterator[str]:
+    """
+    Yields raw text chunks of Ollama's reply (NDJSON stream). Fills `usage`
+    from the final message, so an empty `usage` afterwards means the stream
+    did not finish.
+    """
+    import requests
+
+    # Spans: time to the first chunk, and to the end of the stream (including the consumer's time).
+    started = time.perf_counter_ns()
+    first = True
+    # (connect, read) timeouts: the read timeout applies between chunks, not to the whole answer.
+    try:
+        resp = session().post(OLLAMA_URL, json=_body(messages, model, stream=True), stream=True, timeout=(5, 180))
+    except requests.ConnectionError:
+        _set_health(False)
+        raise
+    _set_health(True)
+    with resp:
+        resp.raise_for_status()
+        # chunk_size=None hands over bytes as they arrive instead of buffering 512 at a time.
+        for line in resp.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"])
+            text = chunk.get("message", {}).get("content", "")
+            if first and perf.enabled():
+                perf.record("llm.stream_first_chunk", time.perf_counter_ns() - started)
+            first = False
+            if text:
+                yield text
+            if chunk.get("done"):
+                usage.update(_usage(chunk))
+                break
+    if perf.enabled():
+        perf.record("llm.stream", time.perf_counter_ns() - started)
+
+
+def stream_advice(
+    payload: Dict[str, Any], model: str = DEFAULT_MODEL, use_cache: bool = True, refresh: bool = False
+) -> Iterator[str]:
+    """
+    Like generate_advice(), but yields cleaned text chunks as Ollama produces
+    them. The full answer is cached only if the stream finishes.
+    """
+    if use_cache and not refresh:
+        cached = cached_advice(payload, model)
+        if cached is not None:
+            yield clean_text(cached)
+            return
+
+    _count("misses")
+    parts: List[str] = []
+    usage: Dict[str, float] = {}
+    for text in _stream_chat(_messages(payload), model, usage):
+        parts.append(text)
+        cleaned = clean_text(text)
+        if cleaned:
+            yield cleaned
+
+    if use_cache and usage:
+        llm_cache_put(payload_key(payload, model), model, PROMPT_VERSION, "".join(parts))
+        llm_cache_evict(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_MAX_AGE, wait=False)
+
+
+#  Conversations
+class AdviceSession:
+    """
+    A conversation about one budget. Every turn resends the history, which
+    only ever grows at the end; Ollama keeps the model loaded for KEEP_ALIVE
+    and reuses the evaluation of the prefix it saw last, so a follow-up is
+    prefilled from the new question on. usage has Ollama's counters per turn.
+    """
+
+    def __init__(self, payload: Dict[str, Any], model: str = DEFAULT_MODEL, answer: Optional[str] = None) -> None:
+        self.payload = payload
+        self.model = model
+        self.key = payload_key(payload, model)
+        self.messages = _messages(payload)
+        self.usage: List[Dict[str, float]] = []
+        if answer is not None:
+            self.messages.append({"role": "assistant", "content": answer})
+
+    @property
+    def answered(self) -> bool:
+        return self.messages[-1]["role"] == "assistant"
+
+    def add_answer(self, answer: str) -> None:
+        """Records the first answer when it was produced elsewhere (the advice queue or cache)."""
+        if not self.answered:
+            self.messages.append({"role": "assistant", "content": answer})
+
+    def turns(self) -> List[Tuple[str, str]]:
+        """(question, answer) pairs after the first answer."""
+        rest = self.messages[3:]
+        return [(rest[i]["content"], rest[i + 1]["content"]) for i in range(0, len(rest) - 1, 2)]
+
+    def ask(self, question: Optional[str] = None) -> Iterator[str]:
+        """
+        Yields cleaned chunks of the answer to `question`, or of the first
+        advice when question is None. The turn joins the history only if the
+        answer finishes, so a cancelled question leaves no trace.
+        """
+        if question is None:
+            if self.answered:
+                raise ValueError("this session already has its first answer; pass a question")
+            turn: List[Dict[str, str]] = []
+        else:
+            if not self.answered:
+                raise ValueError("ask for the first answer before follow-up questions")
+            turn = [{"role": "user", "content": question.strip()}]
+
+        parts: List[str] = []
+        usage: Dict[str, float] = {}
+        for text in _stream_chat(self.messages + turn, self.model, usage):
+            parts.append(text)
+            cleaned = clean_text(text)
+            if cleaned:
+                yield cleaned
+        if usage:
+            # One extend, so readers on other threads never see a question without its answer.
+            self.messages.extend(turn + [{"role": "assistant", "content": "".join(parts)}])
+            self.usage.append(usage)
@@ -1,42 +1,162 @@
+import queue
+import time
+import uuid
+from datetime import date
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from db import (
     init_db,
-    add_income, delete_income, list_income,
-    add_expense, delete_expense, list_expenses,
-    upsert_profile, get_profile
+    add_income, delete_income,
+    add_expense, delete_expense,
+    upsert_profile, load_snapshot, load_totals, load_profile,
+    page_income, page_expenses, PAGE_SIZE,
+    add_transaction, transaction_months, monthly_actuals,
+    add_rule, delete_rule, list_rules
 )
 from budget import (
-    summarize_income, summarize_fixed_expenses,
-    compute_savings_target, allocate_variable_budget, warnings
+    compute_savings_target, allocate_variable_budget, warnings, focus_categories, advice_payload,
+    DEFAULT_VARIABLE_WEIGHTS
 )
-from llm import ollama_available, generate_advice, DEFAULT_MODEL
+from llm import ollama_status, clean_text, cache_stats, payload_key, AdviceSession, DEFAULT_MODEL
+from jobs import get_queue
+from importer import import_file, ImportProgress
+from categorize import apply_rules, KINDS as RULE_KINDS
+import perf
+
+# pandas, numpy (scenarios, projection) and plotly (charts) are imported
+# inside the functions that use them, so they load when a table or chart
+# first renders rather than before the first paint; the Inputs page never
+# loads plotly. After the first time, each of those imports is a dict lookup.
 
 
 st.set_page_config(page_title="TrueBudget MVP", layout="wide")
 
+FREQUENCIES = ["weekly", "biweekly", "monthly"]
+FIXED_CATEGORIES = ["Rent", "Bills", "Insurance", "Debt", "Subscriptions", "Other Fixed"]
+SECTIONS = ["1) Inputs", "2) Dashboard", "3) Advice"]
+DEFAULT_PROFILE = {
+    "location": "",
+    "savings_goal_type": "amount",
+    "savings_goal_value": 300.0,
+    "focus_categories": "Groceries, Social",
+}
+
+# How a rerun is scoped:
+# - Only the selected section is rendered; switching sections is a full rerun.
+# - Widgets inside an @st.fragment rerun just that fragment. Fragments read
+#   what they need from db's cached loaders (load_profile, load_totals, ...),
+#   which cost one PRAGMA when nothing changed, so they never see stale data.
+# - A write whose effect shows outside its own fragment (saving the profile)
+#   triggers a full rerun.
+
 
 def money(x: float) -> str:
     return f"${x:,.2f}"
 
 
-init_db()
+@st.cache_data(max_entries=32, show_spinner=False)
+def scenario_grid(monthly_income: float, fixed_total: float, base_savings: int, focus: tuple):
+    from scenarios import EXPENSE_CUTS, INCOME_CHANGES, savings_axis, sweep
 
-st.title("TrueBudget (MVP) — Free Tools Only")
-st.caption("Streamlit + SQLite + Ollama (local LLM)")
+    # Every slider position (plus the profile's own target) x income change x expense cut.
+    return sweep(
+        monthly_income,
+        fixed_total,
+        savings_axis(monthly_income, step=25, extra=[base_savings]),
+        INCOME_CHANGES,
+        EXPENSE_CUTS,
+        focus,
+    )
 
-# Sidebar: Profile / Goals
-with st.sidebar:
+
+def paged_table(key: str, fetch, columns: list, filters: tuple, empty: str) -> None:
+    """
+    One page of a keyset-paginated listing plus Newer/Older buttons. The
+    cursor stack lives in session_state and resets when the filters change.
+    """
+    state = st.session_state.setdefault(key, {"filters": filters, "cursors": [None]})
+    if state["filters"] != filters:
+        state["filters"], state["cursors"] = filters, [None]
+    cursors = state["cursors"]
+
+    page = fetch(after=cursors[-1])
+    if not page.rows and len(cursors) > 1:
+        # Everything on this page was deleted; start over.
+        cursors[:] = [None]
+        page = fetch(after=None)
+    if not page.rows:
+        st.info(empty if not any(filters) else "Nothing matches these filters.")
+        return
+
+    import pandas as pd
+
+    st.dataframe(pd.DataFrame(page.rows)[columns], use_container_width=True, hide_index=True)
+    first = (len(cursors) - 1) * PAGE_SIZE + 1
+    b1, b2, b3 = st.columns([1, 1, 3])
+    b1.button("◀ Newer", key=f"{key}_newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    b2.button("Older ▶", key=f"{key}_older", disabled=page.next_cursor is None,
+              on_click=cursors.append, args=(page.next_cursor,))
+    b3.caption(f"{first:,}–{first + len(page.rows) - 1:,} of {page.total:,}")
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def run_projection(
+    version: int, start: date, monthly_variable: float, start_balance: float, months: int, paths: int, volatility: float
+):
+    from projection import default_workers, simulate
+
+    # `version` ties the cached result to the snapshot the schedule came from,
+    # `start` to the day it was run for.
+    snap = load_snapshot()
+    return simulate(
+        snap.incomes,
+        snap.expenses,
+        monthly_variable,
+        start_balance=start_balance,
+        months=months,
+        paths=paths,
+        volatility=volatility,
+        seed=0,
+        start=start,
+        workers=default_workers(paths),
+    )
+
+
+def show_advice_job(job_id: str) -> None:
+    job = get_queue().status(job_id)
+    if job is None:
+        return
+    if job["status"] == "queued":
+        st.info(f"Waiting for the local model… (#{job['position']} in line)")
+    elif job["status"] == "running":
+        st.caption("Writing…")
+    if job["text"]:
+        st.markdown(clean_text(job["text"]))
+    if job["status"] == "failed":
+        st.error("Failed to generate advice.")
+        st.code(job["error"] or "")
+        st.info("Make sure your model name is correct and Ollama is running.")
+    elif job["status"] == "cancelled":
+        st.warning("Advice request cancelled.")
+
+
+@st.fragment(run_every=1.0)
+def poll_advice_job(job_id: str) -> None:
+    # Reruns on its own every second; the rest of the page is untouched.
+    show_advice_job(job_id)
+    job = get_queue().status(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+
+
+#  Sidebar: Profile / Goals
+@st.fragment
+def profile_form() -> None:
     st.header("Profile & Goals")
 
-    prof = get_profile() or {
-        "location": "",
-        "savings_goal_type": "amount",
-        "savings_goal_value": 300.0,
-        "focus_categories": "Groceries, Social",
-    }
+    prof = load_profile() or DEFAULT_PROFILE
 
     location = st.text_input("Location (optional)", value=prof.get("location") or "")
 
@@ -54,109 +174,241 @@ with st.sidebar:
         step=25.0 if savings_goal_type == "amount" else 1.0,
     )
 
-    focus_categories = st.text_input(
+    focus = st.text_input(
         "Focus categories (comma-separated)",
         value=prof.get("focus_categories") or "",
         help="Example: Groceries, Social, Food Out"
     )
 
     if st.button("Save profile"):
-        upsert_profile(location, savings_goal_type, float(savings_goal_value), focus_categories)
+        upsert_profile(location, savings_goal_type, float(savings_goal_value), focus)
+        st.session_state["profile_saved"] = True
+        st.rerun()  # the goal feeds the dashboard and advice, outside this fragment
+    if st.session_state.pop("profile_saved", False):
         st.success("Saved!")
 
-    st.divider()
+
+def llm_settings() -> str:
     st.subheader("Local LLM (Ollama)")
-    st.write("Status:", "✅ running" if ollama_available() else "❌ not detected")
+    status = ollama_status()  # cached; refreshed in the background
+    st.write("Status:", "⏳ checking…" if status is None else "✅ running" if status else "❌ not detected")
     model = st.text_input("Model name", value=DEFAULT_MODEL)
     st.caption("If Ollama isn't detected, open the Ollama app and run: `ollama pull llama3.1:8b`")
+    return model
+
+
+#  Inputs
+@st.fragment
+def income_section() -> None:
+    st.subheader("Income sources")
+
+    with st.form("income_form", clear_on_submit=True):
+        name = st.text_input("Income name", placeholder="Job, Side gig, Freelance")
+        amount = st.number_input("Amount", min_value=0.0, value=0.0, step=50.0)
+        frequency = st.selectbox("Frequency", FREQUENCIES)
+        submitted = st.form_submit_button("Add income")
+        if submitted:
+            if not name.strip():
+                st.error("Please enter a name.")
+            elif amount <= 0:
+                st.error("Amount must be > 0.")
+            else:
+                add_income(name.strip(), float(amount), frequency)
+                st.success("Added!")
+
+    f1, f2 = st.columns(2)
+    isearch = f1.text_input("Search income", placeholder="Name contains…")
+    ifreq = f2.selectbox("Filter frequency", ["All"] + FREQUENCIES)
+    ifilters = (isearch.strip(), "" if ifreq == "All" else ifreq)
+    paged_table(
+        "income_page",
+        lambda after: page_income(after, search=ifilters[0] or None, frequency=ifilters[1] or None),
+        ["id", "name", "amount", "frequency", "created_at"],
+        ifilters,
+        "No income sources yet.",
+    )
 
+    delete_id = st.number_input("Delete income by id", min_value=0, value=0, step=1)
+    if st.button("Delete income"):
+        if delete_id > 0:
+            delete_income(int(delete_id))
+            st.success("Deleted. (Refreshes automatically)")
+
+
+@st.fragment
+def expense_section() -> None:
+    st.subheader("Fixed expenses (bills, rent, etc.)")
+
+    with st.form("expense_form", clear_on_submit=True):
+        ename = st.text_input("Expense name", placeholder="Rent, Phone bill, Internet")
+        eamount = st.number_input("Amount ", min_value=0.0, value=0.0, step=25.0)
+        efreq = st.selectbox("Frequency ", FREQUENCIES)
+        ecat = st.selectbox("Category", FIXED_CATEGORIES)
+        esub = st.form_submit_button("Add expense")
+        if esub:
+            if not ename.strip():
+                st.error("Please enter a name.")
+            elif eamount <= 0:
+                st.error("Amount must be > 0.")
+            else:
+                add_expense(ename.strip(), float(eamount), efreq, ecat)
+                st.success("Added!")
+
+    g1, g2, g3 = st.columns(3)
+    esearch = g1.text_input("Search expenses", placeholder="Name contains…")
+    efilter_cat = g2.selectbox("Filter category", ["All"] + FIXED_CATEGORIES)
+    efilter_freq = g3.selectbox("Filter frequency ", ["All"] + FREQUENCIES)
+    efilters = (
+        esearch.strip(),
+        "" if efilter_cat == "All" else efilter_cat,
+        "" if efilter_freq == "All" else efilter_freq,
+    )
+    paged_table(
+        "expense_page",
+        lambda after: page_expenses(
+            after, search=efilters[0] or None, category=efilters[1] or None, frequency=efilters[2] or None
+        ),
+        ["id", "name", "amount", "frequency", "category", "created_at"],
+        efilters,
+        "No fixed expenses yet.",
+    )
 
-# Main: Inputs 
-tab1, tab2, tab3 = st.tabs(["1) Inputs", "2) Dashboard", "3) Advice"])
-
-
-with tab1:
-    left, right = st.columns(2)
+    del_eid = st.number_input("Delete expense by id", min_value=0, value=0, step=1)
+    if st.button("Delete expense"):
+        if del_eid > 0:
+            delete_expense(int(del_eid))
+            st.success("Deleted. (Refreshes automatically)")
+
+
+@st.fragment
+def transaction_form() -> None:
+    with st.form("transaction_form", clear_on_submit=True):
+        t1, t2, t3, t4 = st.columns(4)
+        tdate = t1.date_input("Date")
+        tdesc = t2.text_input("Description", placeholder="Groceries at ...")
+        tamount = t3.number_input("Amount spent", min_value=0.0, value=0.0, step=5.0)
+        tcat = t4.selectbox("Category ", list(DEFAULT_VARIABLE_WEIGHTS) + FIXED_CATEGORIES)
+        if st.form_submit_button("Add transaction"):
+            if tamount <= 0:
+                st.error("Amount must be > 0.")
+            else:
+                # Stored bank-style: money out is negative.
+                add_transaction(tdate.isoformat(), tdesc.strip() or tcat, -float(tamount), tcat)
+                st.success("Added!")
+
+
+@st.fragment
+def import_section() -> None:
+    st.caption(
+        "Transactions: columns date, description, amount (optional category, account). "
+        "Recurring items: columns name, amount, frequency (rows with a category become expenses)."
+    )
+    upload = st.file_uploader("File", type=["csv", "ofx", "qfx"])
+    if upload is not None and st.button("Import file"):
+        bar = st.progress(0.0, text="Importing…")
 
-    with left:
-        st.subheader("Income sources")
-
-        with st.form("income_form", clear_on_submit=True):
-            name = st.text_input("Income name", placeholder="Job, Side gig, Freelance")
-            amount = st.number_input("Amount", min_value=0.0, value=0.0, step=50.0)
-            frequency = st.selectbox("Frequency", ["weekly", "biweekly", "monthly"])
-            submitted = st.form_submit_button("Add income")
-            if submitted:
-                if not name.strip():
-                    st.error("Please enter a name.")
-                elif amount <= 0:
-                    st.error("Amount must be > 0.")
-                else:
-                    add_income(name.strip(), float(amount), frequency)
-                    st.success("Added!")
-
-        incomes = list_income()
-        if incomes:
-            df = pd.DataFrame(incomes)[["id", "name", "amount", "frequency", "created_at"]]
-            st.dataframe(df, use_container_width=True, hide_index=True)
-
-            delete_id = st.number_input("Delete income by id", min_value=0, value=0, step=1)
-            if st.button("Delete income"):
-                if delete_id > 0:
-                    delete_income(int(delete_id))
-                    st.success("Deleted. (Refreshes automatically)")
-        else:
-            st.info("No income sources yet.")
+        def show_progress(p: ImportProgress) -> None:
+            bar.progress(p.fraction or 0.0, text=f"{p.rows_read:,} rows read, {p.rows_inserted:,} new")
 
-    with right:
-        st.subheader("Fixed expenses (bills, rent, etc.)")
-
-        categories = ["Rent", "Bills", "Insurance", "Debt", "Subscriptions", "Other Fixed"]
-
-        with st.form("expense_form", clear_on_submit=True):
-            ename = st.text_input("Expense name", placeholder="Rent, Phone bill, Internet")
-            eamount = st.number_input("Amount ", min_value=0.0, value=0.0, step=25.0)
-            efreq = st.selectbox("Frequency ", ["weekly", "biweekly", "monthly"])
-            ecat = st.selectbox("Category", categories)
-            esub = st.form_submit_button("Add expense")
-            if esub:
-                if not ename.strip():
-                    st.error("Please enter a name.")
-                elif eamount <= 0:
-                    st.error("Amount must be > 0.")
-                else:
-                    add_expense(ename.strip(), float(eamount), efreq, ecat)
-                    st.success("Added!")
-
-        expenses = list_expenses()
-        if expenses:
-            df2 = pd.DataFrame(expenses)[["id", "name", "amount", "frequency", "category", "created_at"]]
-            st.dataframe(df2, use_container_width=True, hide_index=True)
-
-            del_eid = st.number_input("Delete expense by id", min_value=0, value=0, step=1)
-            if st.button("Delete expense"):
-                if del_eid > 0:
-                    delete_expense(int(del_eid))
-                    st.success("Deleted. (Refreshes automatically)")
+        try:
+            result = import_file(upload, filename=upload.name, on_progress=show_progress)
+        except ValueError as e:
+            st.error(str(e))
         else:
-            st.info("No fixed expenses yet.")
+            bar.progress(1.0, text="Done")
+            st.success(
+                f"Imported {result.rows_inserted:,} new {result.kind} rows "
+                f"({result.rows_skipped:,} already present, {result.rows_rejected:,} rejected)."
+            )
 
 
-# Dashboard 
-with tab2:
-    st.subheader("Monthly Dashboard")
+@st.fragment
+def rules_section() -> None:
+    st.caption(
+        "Uncategorized transactions get the category of the best matching rule: highest priority, "
+        "then longest text. Text is matched ignoring case; amounts are compared by size."
+    )
+    with st.form("rule_form", clear_on_submit=True):
+        r1, r2, r3 = st.columns(3)
+        rkind = r1.selectbox("Match", RULE_KINDS, format_func=lambda k: {
+            "contains": "Description contains", "prefix": "Description starts with", "amount": "Amount only",
+        }[k])
+        rtext = r2.text_input("Text", placeholder="amazon, uber, whole foods")
+        rcat = r3.text_input("Rule category", placeholder="Shopping")
+        r4, r5, r6 = st.columns(3)
+        rmin = r4.number_input("Min amount (0 = none)", min_value=0.0, value=0.0, step=10.0)
+        rmax = r5.number_input("Max amount (0 = none)", min_value=0.0, value=0.0, step=10.0)
+        rprio = r6.number_input("Priority", value=0, step=1)
+        if st.form_submit_button("Add rule"):
+            if rkind != "amount" and not rtext.strip():
+                st.error("Please enter the text to match.")
+            elif not rcat.strip():
+                st.error("Please enter a category.")
+            elif rkind == "amount" and rmin <= 0 and rmax <= 0:
+                st.error("An amount rule needs a min or max amount.")
+            else:
+                add_rule(
+                    rkind, "" if rkind == "amount" else rtext.strip(), rcat.strip(),
+                    float(rmin) if rmin > 0 else None, float(rmax) if rmax > 0 else None, int(rprio),
+                )
+                st.success("Added!")
+
+    rules = list_rules()
+    if rules:
+        st.dataframe(rules, use_container_width=True, hide_index=True)
+    else:
+        st.info("No rules yet.")
+
+    c1, c2 = st.columns(2)
+    del_rid = c1.number_input("Delete rule by id", min_value=0, value=0, step=1)
+    if c1.button("Delete rule"):
+        if del_rid > 0:
+            delete_rule(int(del_rid))
+            st.success("Deleted. (Refreshes automatically)")
+    if c2.button("Apply rules to transactions"):
+        result = apply_rules()
+        st.success(f"Checked {result['scanned']:,} transactions, recategorized {result['changed']:,}.")
+
+
+def render_inputs() -> None:
+    left, right = st.columns(2)
+    with left:
+        income_section()
+    with right:
+        expense_section()
+    with st.expander("Log a transaction"):
+        transaction_form()
+    with st.expander("Bulk import (bank CSV / OFX, or recurring items CSV)"):
+        import_section()
+    with st.expander("Categorization rules"):
+        rules_section()
+
+
+#  Dashboard
+def saved_plan():
+    """
+    Totals, profile and the scenario grid for the saved savings goal. Every
+    piece is cached (db loaders, st.cache_data), so fragments can call this
+    on each of their reruns instead of receiving stale arguments.
+    """
+    prof = load_profile() or {}
+    monthly_income, fixed_total, fixed_by_cat = load_totals()
+    goal_type = prof.get("savings_goal_type", "amount")
+    goal_value = float(prof.get("savings_goal_value") or 0.0)
+    base_savings_target = compute_savings_target(monthly_income, goal_type, goal_value)
+    focus_list = focus_categories(prof)
+    grid = scenario_grid(monthly_income, fixed_total, int(round(base_savings_target)), tuple(focus_list))
+    return monthly_income, fixed_total, fixed_by_cat, base_savings_target, focus_list, grid
 
-    incomes = list_income()
-    expenses = list_expenses()
-    prof = get_profile()
 
-    monthly_income = summarize_income(incomes)
-    fixed_total, fixed_by_cat = summarize_fixed_expenses(expenses)
+@st.fragment
+def plan_section() -> None:
+    # Holds the what-if slider and everything that depends on it, so moving
+    # the slider reruns (and redraws) only this fragment.
+    import pandas as pd
+    import charts
 
-    goal_type = prof["savings_goal_type"] if prof else "amount"
-    goal_value = float(prof["savings_goal_value"]) if prof else 0.0
-        # Original computed savings target from profile
-    base_savings_target = compute_savings_target(monthly_income, goal_type, goal_value)
+    monthly_income, fixed_total, fixed_by_cat, base_savings_target, focus_list, grid = saved_plan()
 
     st.markdown("### What-if controls")
     whatif = st.slider(
@@ -169,16 +421,17 @@ with tab2:
     )
 
     savings_target = float(whatif)
-    discretionary = round(monthly_income - fixed_total - savings_target, 2)
 
-    discretionary = round(discretionary, 2)
-
-    focus_list = []
-    if prof and prof.get("focus_categories"):
-        focus_list = [x.strip() for x in prof["focus_categories"].split(",") if x.strip()]
-
-    variable_alloc = allocate_variable_budget(max(discretionary, 0.0), focus_list)
-    warn = warnings(monthly_income, fixed_total, savings_target)
+    # Moving the slider is a lookup into the precomputed grid.
+    if grid.has(savings_target):
+        scenario = grid.lookup(savings_target)
+        discretionary = scenario["discretionary"]
+        variable_alloc = scenario["variable_alloc"]
+        warn = scenario["warnings"]
+    else:
+        discretionary = round(monthly_income - fixed_total - savings_target, 2)
+        variable_alloc = allocate_variable_budget(max(discretionary, 0.0), focus_list)
+        warn = warnings(monthly_income, fixed_total, savings_target)
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Monthly Income", money(monthly_income))
@@ -238,110 +491,335 @@ with tab2:
         elif rent_pct > 40:
             st.warning("Rent is a large share of income. Consider ways to reduce housing pressure if possible.")
         else:
-            st.success("Budget looks feasible. Next step: track actual spending vs targets.")
+            st.success("Budget looks feasible. Compare actual spending with these targets below.")
 
     #  Chart 1: Donut chart for overall split 
-    overall_df = pd.DataFrame([
-        {"Bucket": "Fixed", "Amount": fixed_total},
-        {"Bucket": "Savings", "Amount": savings_target},
-        {"Bucket": "Discretionary", "Amount": max(discretionary, 0.0)},
-    ])
-
-    fig1 = px.pie(
-        overall_df,
-        names="Bucket",
-        values="Amount",
-        hole=0.5,
-        title="Where your monthly money goes (Fixed vs Savings vs Discretionary)"
-    )
-    st.plotly_chart(fig1, use_container_width=True)
+    st.plotly_chart(charts.budget_split(fixed_total, savings_target, discretionary), use_container_width=True)
 
     #  Chart 2: Fixed expenses by category (if present) 
+    # Doesn't depend on the slider; on slider reruns the figure is a cache hit.
     if fixed_by_cat:
-        fixed_cat_df = (
-            pd.DataFrame([{"Category": k, "Monthly": v} for k, v in fixed_by_cat.items()])
-            .sort_values("Monthly", ascending=False)
-        )
-        fig2 = px.bar(
-            fixed_cat_df,
-            x="Category",
-            y="Monthly",
-            title="Fixed expenses by category (monthly)"
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(charts.fixed_by_category(fixed_by_cat), use_container_width=True)
 
     #  Chart 3: Variable targets sorted (the “spending plan”) 
-    var_df = (
-        pd.DataFrame([{"Category": k, "Target": v} for k, v in variable_alloc.items()])
-        .sort_values("Target", ascending=False)
+    st.plotly_chart(charts.variable_targets(variable_alloc), use_container_width=True)
+
+
+def saved_allocation() -> dict:
+    """Variable-category targets for the saved savings goal (what the sections below compare against)."""
+    _, _, _, base_savings_target, _, grid = saved_plan()
+    return grid.lookup(float(int(round(base_savings_target))))["variable_alloc"]
+
+
+@st.fragment
+def actuals_section() -> None:
+    import pandas as pd
+    import charts
+
+    st.divider()
+    st.markdown("### Actual spending vs targets")
+    st.caption("Targets come from your saved profile, not the what-if slider.")
+    fixed_by_cat = load_totals().fixed_by_category
+    variable_alloc = saved_allocation()
+    months_with_data = transaction_months()
+    if not months_with_data:
+        st.info("No transactions yet. Import a bank export or log a transaction on the Inputs tab.")
+        return
+
+    m1, m2 = st.columns(2)
+    end_month = m1.selectbox("Through month", months_with_data, index=0)
+    span = m2.selectbox("Period", [1, 3, 6, 12], format_func=lambda n: f"{n} month{'s' if n > 1 else ''}")
+    start_month = pd.Period(end_month, freq="M") - (span - 1)
+    actuals = monthly_actuals(str(start_month), end_month)
+
+    # Targets are monthly, so scale them to the selected period.
+    targets = {**fixed_by_cat, **variable_alloc}
+    rows = [
+        {
+            "Category": c,
+            "Target": targets.get(c, 0.0) * span,
+            "Actual": actuals.get(c, 0.0),
+        }
+        for c in list(targets) + [c for c in actuals if c not in targets]
+    ]
+    actual_df = pd.DataFrame(rows)
+    actual_df["Left"] = actual_df["Target"] - actual_df["Actual"]
+    st.dataframe(actual_df, use_container_width=True, hide_index=True)
+
+    over = actual_df[actual_df["Left"] < 0]
+    if not over.empty:
+        st.warning("Over target: " + ", ".join(f"{r.Category} by {money(-r.Left)}" for r in over.itertuples()))
+
+    fig_actual = charts.actual_vs_target(actual_df, f"Actual vs target, {start_month} to {end_month}")
+    st.plotly_chart(fig_actual, use_container_width=True)
+
+
+@st.fragment
+def scenario_explorer() -> None:
+    from scenarios import EXPENSE_CUTS, INCOME_CHANGES
+    import charts
+
+    _, _, _, base_savings_target, _, grid = saved_plan()
+    savings_target = float(int(round(base_savings_target)))
+    cut = st.select_slider(
+        "Fixed expense cut",
+        options=EXPENSE_CUTS,
+        value=0.0,
+        format_func=lambda v: f"{v:.0%}",
     )
-    fig3 = px.bar(
-        var_df,
-        x="Category",
-        y="Target",
-        title="Suggested variable spending targets (monthly)"
+    e = EXPENSE_CUTS.index(cut)
+
+    fig4 = charts.feasibility_heatmap(
+        grid.discretionary[:, :, e].T, grid.savings_targets, [f"{c:+.0%}" for c in INCOME_CHANGES]
+    )
+    st.plotly_chart(fig4, use_container_width=True)
+
+    fig5 = charts.savings_sensitivity(grid.savings_targets, grid.sensitivity(0.0, cut), savings_target)
+    st.plotly_chart(fig5, use_container_width=True)
+
+    max_ok = grid.max_feasible_savings()[INCOME_CHANGES.index(0.0), e]
+    st.caption(f"Largest feasible savings target at current income with a {cut:.0%} fixed cut: {money(max_ok)}")
+
+
+@st.fragment
+def projection_section() -> None:
+    # Monte Carlo is heavier than the rest of the page, so it only runs on request.
+    if not st.toggle("Run projection", value=False):
+        return
+    import pandas as pd
+    import charts
+
+    st.caption("Variable spending follows your saved profile's plan.")
+    monthly_variable = float(sum(saved_allocation().values()))
+    p1, p2, p3, p4 = st.columns(4)
+    start_balance = p1.number_input("Starting balance", value=0.0, step=100.0)
+    months = p2.slider("Months", min_value=1, max_value=24, value=6)
+    paths = p3.select_slider("Simulated paths", options=[1000, 5000, 10000, 50000], value=10000)
+    volatility = p4.slider("Day-to-day spending variability", min_value=0.0, max_value=2.0, value=0.6, step=0.1)
+
+    proj = run_projection(
+        load_snapshot().version, date.today(), monthly_variable,
+        float(start_balance), int(months), int(paths), float(volatility),
     )
-    st.plotly_chart(fig3, use_container_width=True)
-        
 
-#  Advice 
-with tab3:
-    st.subheader("Advice (LLM-powered, local & free)")
+    q1, q2, q3 = st.columns(3)
+    q1.metric("Chance of going negative", f"{proj.prob_negative:.1%}")
+    q2.metric("Lowest expected balance", money(float(proj.expected_balance.min())) if proj.days else money(0))
+    q3.metric("Median ending balance", money(float(pd.Series(proj.end_balance).median())) if proj.paths else money(0))
 
-    incomes = list_income()
-    expenses = list_expenses()
-    prof = get_profile() or {}
+    st.plotly_chart(charts.projected_balance(proj), use_container_width=True)
 
-    monthly_income = summarize_income(incomes)
-    fixed_total, fixed_by_cat = summarize_fixed_expenses(expenses)
 
-    goal_type = prof.get("savings_goal_type", "amount")
-    goal_value = float(prof.get("savings_goal_value", 0.0))
-    savings_target = compute_savings_target(monthly_income, goal_type, goal_value)
-
-    discretionary = round(monthly_income - fixed_total - savings_target, 2)
-
-    focus_list = []
-    if prof.get("focus_categories"):
-        focus_list = [x.strip() for x in prof["focus_categories"].split(",") if x.strip()]
-
-    variable_alloc = allocate_variable_budget(max(discretionary, 0.0), focus_list)
-    warn = warnings(monthly_income, fixed_total, savings_target)
-
-    payload = {
-        "location": prof.get("location", ""),
-        "monthly_income": monthly_income,
-        "fixed_expenses_total": fixed_total,
-        "fixed_expenses_by_category": fixed_by_cat,
-        "savings_goal_type": goal_type,
-        "savings_goal_value": goal_value,
-        "savings_target_monthly": savings_target,
-        "discretionary_left": discretionary,
-        "focus_categories": focus_list,
-        "suggested_variable_targets": variable_alloc,
-        "warnings": warn,
-        "note": "The app computed all numbers. Use these numbers exactly.",
-    }
+@st.fragment
+def history_section() -> None:
+    # The first run exports every transaction to the snapshot, so this one is on request too.
+    if not st.toggle("Show spending history", value=False):
+        return
+    import charts
+    import columnar
+
+    transactions = columnar.open_table("transactions")
+    if not transactions.rows:
+        st.info("No transactions yet.")
+        return
+    months, categories, spent = columnar.monthly_spending(transactions)
+    st.plotly_chart(charts.spending_history(months, categories, spent), use_container_width=True)
+    st.caption(f"{transactions.rows:,} transactions, {months[0]} to {months[-1]}, read from the columnar snapshot.")
 
-    st.write("Click the button to generate advice from your local LLM (Ollama).")
 
-    if st.button("Generate advice"):
-        if not ollama_available():
-            st.error("Ollama not detected. Open the Ollama app, then try again.")
-            st.code("ollama pull llama3.1:8b\nollama run llama3.1:8b", language="bash")
+def render_dashboard() -> None:
+    import charts
+
+    st.subheader("Monthly Dashboard")
+    plan_section()
+    actuals_section()
+    with st.expander("Scenario explorer (savings × income × fixed-expense changes)"):
+        scenario_explorer()
+    with st.expander("Cash-flow projection (actual pay and bill dates)"):
+        projection_section()
+    with st.expander("Spending history (every month)"):
+        history_section()
+
+    stats = charts.chart_stats()
+    st.caption(
+        f"Charts since the app started: {stats['hits']} reused, {stats['misses']} built "
+        f"({stats['build_seconds'] * 1000:.0f} ms building)"
+    )
+
+
+#  Advice
+def advice_followups(chat: AdviceSession, session_id: str) -> None:
+    """Earlier follow-up turns, the one being answered, and a box for the next."""
+    jobs = get_queue()
+    for question, answer in chat.turns():
+        st.markdown(f"**You:** {question}")
+        st.markdown(clean_text(answer))
+
+    job_id = st.session_state.get("followup_job")
+    job = jobs.status(job_id) if job_id else None
+    active = job is not None and job["status"] in ("queued", "running")
+    if active:
+        st.markdown(f"**You:** {st.session_state.get('followup_question', '')}")
+        poll_advice_job(job_id)
+    elif job is not None and job["status"] != "done":
+        show_advice_job(job_id)
+    if chat.usage:
+        last = chat.usage[-1]
+        st.caption(f"Last follow-up: {last['prompt_tokens']:,} new prompt tokens, {last['prefill_ms']:,.0f} ms prefill")
+
+    with st.form("followup", clear_on_submit=True):
+        question = st.text_input("Ask a follow-up", placeholder="e.g. Where could I free up $200 a month?")
+        asked = st.form_submit_button("Ask", disabled=active)
+    if asked and question.strip():
+        # The model keeps this conversation loaded, so only the new question is prefilled.
+        try:
+            st.session_state["followup_job"] = jobs.submit_followup(session_id, chat, question)
+            st.session_state["followup_question"] = question.strip()
+        except queue.Full as e:
+            st.warning(str(e))
         else:
-            with st.spinner("Thinking..."):
-                try:
-                    advice = generate_advice(payload, model=model.strip() or DEFAULT_MODEL)
-                    cleaned = (
-                        advice.replace("\u200b", "")   # zero-width space
-                            .replace("\u200c", "")   # zero-width non-joiner
-                            .replace("\u200d", "")   # zero-width joiner
-                            .replace("\ufeff", "")   # BOM / zero-width no-break space
-                    )
-
-                    st.markdown(cleaned)
-                except Exception as e:
-                    st.error("Failed to generate advice.")
-                    st.code(str(e))
-                    st.info("Make sure your model name is correct and Ollama is running.")
+            st.rerun()
+
+
+def render_advice(model: str) -> None:
+    st.subheader("Advice (LLM-powered, local & free)")
+
+    payload = advice_payload(load_profile(), *load_totals())
+
+    st.write("Click the button to generate advice from your local LLM (Ollama).")
+    fresh = st.checkbox("Force a fresh answer", value=False, help="Skip the saved answer for this exact budget.")
+
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    jobs = get_queue()
+    job_id = st.session_state.get("advice_job")
+    job = jobs.status(job_id) if job_id else None
+    active = job is not None and job["status"] in ("queued", "running")
+
+    b1, b2 = st.columns([1, 5])
+    if b1.button("Generate advice", disabled=active):
+        model_name = model.strip() or DEFAULT_MODEL
+        # Only a known-bad status stops us; an unknown one is settled by trying.
+        # Saved answers are served by the queue without touching Ollama.
+        try:
+            job_id = jobs.submit(session_id, payload, model_name, refresh=fresh)
+        except queue.Full as e:
+            st.warning(str(e))
+        else:
+            if jobs.status(job_id)["status"] != "done" and ollama_status() is False:
+                jobs.cancel(job_id, session_id)
+                st.error("Ollama not detected. Open the Ollama app, then try again.")
+                st.code("ollama pull llama3.1:8b\nollama run llama3.1:8b", language="bash")
+            else:
+                st.session_state["advice_job"] = job_id
+                st.session_state["advice_chat"] = AdviceSession(payload, model_name)
+                st.session_state.pop("followup_job", None)
+                job = jobs.status(job_id)
+                active = job["status"] in ("queued", "running")
+
+    if active and b2.button("Cancel"):
+        jobs.cancel(job_id, session_id)
+        active = False
+
+    if active:
+        poll_advice_job(st.session_state["advice_job"])
+    elif st.session_state.get("advice_job"):
+        show_advice_job(st.session_state["advice_job"])
+        job = jobs.status(st.session_state["advice_job"])
+        chat = st.session_state.get("advice_chat")
+        if job is not None and job["status"] == "done" and chat is not None:
+            chat.add_answer(job["text"])
+            if chat.key == payload_key(payload, chat.model):
+                advice_followups(chat, session_id)
+            else:
+                st.caption("Your budget changed since this advice. Generate new advice to ask follow-ups.")
+
+    stats = cache_stats()
+    st.caption(f"Advice cache since the app started: {stats['hits']} hits, {stats['misses']} misses")
+
+
+#  Performance panel
+def perf_scopes() -> list:
+    # Spans from a session's script thread (full runs and fragment reruns) also count
+    # for that session and its latest run; other threads only count process-wide.
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return []
+    state = st.session_state
+    return [r for r in (state.get("perf_session"), state.get("perf_run")) if r is not None]
+
+
+@st.fragment
+def perf_panel() -> None:
+    with st.expander("Performance"):
+        st.toggle(
+            "Record timings",
+            key="perf_on",
+            on_change=lambda: perf.enable(st.session_state["perf_on"]),
+            help="Times db, budget, chart and Ollama calls for everyone using this app while on.",
+        )
+        if not perf.enabled():
+            st.caption("Off. Instrumented calls cost one flag check.")
+            return
+        scopes = {
+            "Last run": st.session_state["perf_run"],
+            "Session": st.session_state["perf_session"],
+            "Process": perf.PROCESS,
+        }
+        scope = st.radio("Scope", list(scopes), horizontal=True, key="perf_scope")
+        recorder = scopes[scope]
+        stats = recorder.stats()
+        if not stats:
+            st.caption("Nothing recorded yet.")
+            return
+        if scope == "Last run":
+            st.caption("Since the last full rerun; fragment reruns add to it.")
+        st.dataframe(
+            [
+                {"span": name, "calls": int(row["count"]), "total ms": row["total_ms"],
+                 "p50 ms": row["p50_ms"], "p90 ms": row["p90_ms"], "max ms": row["max_ms"]}
+                for name, row in stats.items()
+            ],
+            hide_index=True,
+            column_config={c: st.column_config.NumberColumn(format="%.2f")
+                           for c in ("total ms", "p50 ms", "p90 ms", "max ms")},
+        )
+        c1, c2 = st.columns(2)
+        c1.download_button("JSON lines", perf.to_jsonl(recorder, scope.lower().replace(" ", "_")),
+                           file_name="truebudget-perf.jsonl", mime="application/x-ndjson")
+        c2.download_button("Prometheus", perf.to_prometheus(recorder),
+                           file_name="truebudget-perf.prom", mime="text/plain")
+
+
+#  Page
+# Recording is process-wide (TRUEBUDGET_PERF or any session's toggle, applied before
+# the run by its callback); the toggle shows the current state.
+st.session_state["perf_on"] = perf.enabled()
+perf.set_scope_hook(perf_scopes)
+st.session_state.setdefault("perf_session", perf.Recorder())
+st.session_state["perf_run"] = perf.Recorder()
+run_started = time.perf_counter_ns()
+
+init_db()
+
+st.title("TrueBudget (MVP) — Free Tools Only")
+st.caption("Streamlit + SQLite + Ollama (local LLM)")
+
+with st.sidebar:
+    profile_form()
+    st.divider()
+    model = llm_settings()
+    perf_slot = st.container()
+
+# Sections are rendered lazily: only the selected one runs on a rerun.
+section = st.radio("Section", SECTIONS, horizontal=True, label_visibility="collapsed", key="section")
+
+if section == SECTIONS[0]:
+    render_inputs()
+elif section == SECTIONS[1]:
+    render_dashboard()
+else:
+    render_advice(model)
+
+if perf.enabled():
+    perf.record("main.run", time.perf_counter_ns() - run_started)
+with perf_slot:
+    perf_panel()
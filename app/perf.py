@@ -0,0 +1,186 @@
+"""
+Lightweight timing spans.
+
+db, budget and charts wrap their public functions with instrument(); llm
+times its HTTP requests with span(). While recording is off (the default)
+a wrapped call costs one global check. Turn it on with TRUEBUDGET_PERF=1
+or enable(True).
+
+Each span's duration goes to the process-wide recorder and to whatever
+scopes the scope hook returns for the calling thread (main.py supplies
+the current session and the current run). A Recorder keeps exact counts
+and totals per span name plus the last MAX_SAMPLES durations for
+percentiles. Recorders export as JSON lines or Prometheus text.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+MAX_SAMPLES = 1024
+QUANTILES = (0.5, 0.9, 0.99)
+
+_enabled = os.environ.get("TRUEBUDGET_PERF", "") not in ("", "0")
+
+
+class Recorder:
+    """Counts, totals and recent durations per span name. Thread-safe."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spans: Dict[str, List[Any]] = {}  # name -> [count, total_ns, samples]
+
+    def add(self, name: str, ns: int) -> None:
+        with self._lock:
+            entry = self._spans.get(name)
+            if entry is None:
+                entry = self._spans[name] = [0, 0, deque(maxlen=MAX_SAMPLES)]
+            entry[0] += 1
+            entry[1] += ns
+            entry[2].append(ns)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """{name: {count, total_ms, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}}, slowest total first."""
+        with self._lock:
+            entries = [(name, count, total, sorted(samples)) for name, (count, total, samples) in self._spans.items()]
+        out = {}
+        for name, count, total, samples in sorted(entries, key=lambda e: -e[2]):
+            row = {"count": count, "total_ms": total / 1e6, "mean_ms": total / count / 1e6}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}_ms"] = _quantile(samples, q) / 1e6
+            row["max_ms"] = samples[-1] / 1e6
+            out[name] = row
+        return out
+
+
+def _quantile(sorted_ns: Sequence[int], q: float) -> float:
+    # Nearest rank over the retained samples.
+    return sorted_ns[min(len(sorted_ns) - 1, int(q * len(sorted_ns)))]
+
+
+PROCESS = Recorder()
+_scopes: Optional[Callable[[], Iterable[Recorder]]] = None
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    """Turns recording on or off for the whole process."""
+    global _enabled
+    _enabled = on
+
+
+def set_scope_hook(hook: Optional[Callable[[], Iterable[Recorder]]]) -> None:
+    """hook() returns the extra recorders for the calling thread (e.g. its session's); called per span."""
+    global _scopes
+    _scopes = hook
+
+
+def record(name: str, ns: int) -> None:
+    PROCESS.add(name, ns)
+    if _scopes is not None:
+        for r in _scopes():
+            r.add(name, ns)
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        record(self.name, time.perf_counter_ns() - self.started)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str) -> Any:
+    """Context manager timing its block as `name`; a shared no-op while disabled."""
+    return _Span(name) if _enabled else _NO_SPAN
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call as `name`."""
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter_ns() - started)
+
+        wrapper.__wrapped_by_perf__ = True
+        return wrapper
+
+    return wrap
+
+
+def instrument(namespace: Dict[str, Any], prefix: str, skip: Iterable[str] = ()) -> None:
+    """
+    Wraps every public function defined in a module with traced("<prefix>.<name>").
+    Called as instrument(globals(), ...) at the end of the module, so both
+    importers and the module's own calls see the wrapped versions.
+    """
+    module = namespace["__name__"]
+    skip = set(skip)
+    for name, obj in list(namespace.items()):
+        if (
+            name.startswith("_") or name in skip or not inspect.isfunction(obj)
+            or obj.__module__ != module or getattr(obj, "__wrapped_by_perf__", False)
+        ):
+            continue
+        namespace[name] = traced(f"{prefix}.{name}")(obj)
+
+
+#  Export
+def to_jsonl(recorder: Recorder, scope: str = "process") -> str:
+    """One JSON object per span name."""
+    return "".join(
+        json.dumps({"scope": scope, "span": name, **{k: round(v, 4) for k, v in row.items()}}) + "\n"
+        for name, row in recorder.stats().items()
+    )
+
+
+def to_prometheus(recorder: Recorder, metric: str = "truebudget_span_seconds") -> str:
+    """Prometheus text exposition: one summary per span name."""
+    lines = [
+        f"# HELP {metric} Time spent in instrumented TrueBudget calls.",
+        f"# TYPE {metric} summary",
+    ]
+    for name, row in recorder.stats().items():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for q in QUANTILES:
+            lines.append(f'{metric}{{span="{label}",quantile="{q}"}} {row[f"p{int(q * 100)}_ms"] / 1e3:.9f}')
+        lines.append(f'{metric}_sum{{span="{label}"}} {row["total_ms"] / 1e3:.9f}')
+        lines.append(f'{metric}_count{{span="{label}"}} {int(row["count"])}')
+    return "\n".join(lines) + "\n"
+
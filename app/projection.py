@@ -0,0 +1,194 @@
+"""
+Multi-month cash-flow projection.
+
+The monthly view in budget.py averages weekly/biweekly items into
+FREQ_TO_MONTHLY amounts, which hides pay timing. Here every income and bill
+is laid out on its actual dates over the horizon, the running balance is
+simulated day by day, and Monte Carlo paths with randomized variable
+spending estimate how likely the balance is to dip below zero.
+
+Paths are generated in fixed-size chunks, each with its own child of
+SeedSequence(seed), so results depend only on the seed and not on how many
+worker processes ran the chunks. Chunks run in one long-lived pool of
+spawned processes: forking the threaded Streamlit server is unsafe.
+"""
+import calendar
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+STEP_DAYS = {"weekly": 7, "biweekly": 14}
+CHUNK_PATHS = 2000
+
+
+#  Calendar
+def _anchor(item: dict, start: date) -> date:
+    # The first occurrence is the day the item was entered, if we know it.
+    raw = item.get("created_at") or item.get("start_date")
+    if raw:
+        try:
+            return datetime.fromisoformat(str(raw)[:10]).date()
+        except ValueError:
+            pass
+    return start
+
+
+def _add_months(d: date, months: int, day: int) -> date:
+    m = d.month - 1 + months
+    year, month = d.year + m // 12, m % 12 + 1
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def occurrences(item: dict, start: date, end: date) -> List[date]:
+    """Dates in [start, end) on which a recurring item is paid."""
+    anchor = _anchor(item, start)
+    freq = item["frequency"]
+    if freq in STEP_DAYS:
+        step = STEP_DAYS[freq]
+        first = anchor if anchor >= start else anchor + timedelta(days=-(-(start - anchor).days // step) * step)
+        return [first + timedelta(days=i) for i in range(0, (end - first).days, step)] if first < end else []
+    if freq == "monthly":
+        out = []
+        k = 0
+        while True:
+            d = _add_months(anchor, k, anchor.day)
+            if d >= end:
+                return out
+            if d >= start:
+                out.append(d)
+            k += 1
+    raise ValueError(f"Unknown frequency: {freq}")
+
+
+def horizon_end(start: date, months: int) -> date:
+    return _add_months(start, months, start.day)
+
+
+def daily_fixed_flows(incomes: Sequence[dict], expenses: Sequence[dict], start: date, months: int) -> np.ndarray:
+    """Net scheduled money per day (income in, bills out) over the horizon."""
+    end = horizon_end(start, months)
+    flows = np.zeros((end - start).days, dtype=np.float64)
+    for items, sign in ((incomes, 1.0), (expenses, -1.0)):
+        for item in items:
+            days = [(d - start).days for d in occurrences(item, start, end)]
+            np.add.at(flows, days, sign * float(item["amount"]))
+    return flows
+
+
+#  Simulation
+def _simulate_chunk(
+    fixed: np.ndarray, start_balance: float, daily_mean: float, volatility: float, n_paths: int, seed: np.random.SeedSequence
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    if daily_mean > 0 and volatility > 0:
+        # Gamma keeps spending positive and right-skewed; shape sets the coefficient of variation.
+        shape = 1.0 / volatility ** 2
+        spend = rng.gamma(shape, daily_mean / shape, size=(n_paths, len(fixed)))
+    else:
+        spend = np.full((n_paths, len(fixed)), daily_mean)
+    balance = start_balance + np.cumsum(fixed - spend, axis=1)
+    return (
+        (balance < 0).sum(axis=0),
+        balance.sum(axis=0),
+        np.square(balance).sum(axis=0),
+        balance.min(axis=1),
+        balance[:, -1],
+    )
+
+
+@dataclass(frozen=True)
+class Projection:
+    start: date
+    days: int
+    paths: int
+    expected_balance: np.ndarray      # (days,) with average variable spending
+    mean_balance: np.ndarray          # (days,) across paths
+    std_balance: np.ndarray           # (days,)
+    prob_negative_by_day: np.ndarray  # (days,)
+    min_balance: np.ndarray           # (paths,) lowest point of each path
+    end_balance: np.ndarray           # (paths,)
+
+    @property
+    def prob_negative(self) -> float:
+        """Probability the balance goes below zero at any point in the horizon."""
+        return float(np.mean(self.min_balance < 0)) if self.paths else 0.0
+
+    def dates(self) -> List[date]:
+        return [self.start + timedelta(days=i) for i in range(self.days)]
+
+
+def simulate(
+    incomes: Sequence[dict],
+    expenses: Sequence[dict],
+    monthly_variable: float,
+    start_balance: float = 0.0,
+    months: int = 6,
+    paths: int = 10000,
+    volatility: float = 0.6,
+    seed: int = 0,
+    start: Optional[date] = None,
+    workers: Optional[int] = None,
+) -> Projection:
+    """
+    Projects the running balance and runs `paths` Monte Carlo paths in which
+    variable spending averages `monthly_variable` per month with day-to-day
+    coefficient of variation `volatility`. workers=1 runs in-process.
+    """
+    start = start or date.today()
+    fixed = daily_fixed_flows(incomes, expenses, start, months)
+    daily_mean = max(0.0, float(monthly_variable)) * 12 / 365
+    expected = start_balance + np.cumsum(fixed - daily_mean)
+
+    sizes = [min(CHUNK_PATHS, paths - i) for i in range(0, paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(fixed, float(start_balance), daily_mean, float(volatility), n, s) for n, s in zip(sizes, seeds)]
+
+    if workers == 1 or len(args) <= 1:
+        results = [_simulate_chunk(*a) for a in args]
+    else:
+        results = list(_get_pool(workers or os.cpu_count() or 1).map(_simulate_chunk, *zip(*args)))
+
+    n_days = len(fixed)
+    if results:
+        neg = sum(r[0] for r in results)
+        total = sum(r[1] for r in results)
+        total_sq = sum(r[2] for r in results)
+        mins = np.concatenate([r[3] for r in results])
+        ends = np.concatenate([r[4] for r in results])
+        mean = total / paths
+        std = np.sqrt(np.maximum(total_sq / paths - np.square(mean), 0.0))
+        prob = neg / paths
+    else:
+        mean = std = prob = np.zeros(n_days)
+        mins = ends = np.zeros(0)
+
+    return Projection(start, n_days, paths, expected, mean, std, prob, mins, ends)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """The shared worker pool, grown to at least `workers` processes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def default_workers(paths: int) -> int:
+    """One process per chunk, up to the number of CPUs."""
+    return max(1, min(os.cpu_count() or 1, math.ceil(paths / CHUNK_PATHS)))
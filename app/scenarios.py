@@ -0,0 +1,136 @@
+"""
+Batched what-if scenarios.
+
+sweep() evaluates every combination of savings target x income change x
+expense cut in one vectorized pass: discretionary money, the variable
+category targets and the numbers behind the warnings. The dashboard draws
+the whole feasibility surface from it and answers a slider move with an
+index lookup. Every scenario matches the scalar path in budget.py
+(allocate_variable_budget() and warnings()) for its income and fixed total.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from budget_vec import (
+    VARIABLE_CATEGORIES, allocate_batch, focus_counts, round_cents, variable_weights, warning_text,
+)
+
+
+@dataclass(frozen=True)
+class ScenarioGrid:
+    monthly_income: float
+    fixed_total: float
+    savings_targets: np.ndarray  # (S,)
+    income_changes: np.ndarray   # (I,) fraction, e.g. -0.1 = income drops 10%
+    expense_cuts: np.ndarray     # (E,) fraction of fixed expenses removed
+    weights: np.ndarray          # (K,) normalized variable-category weights
+    income: np.ndarray           # (I,) adjusted monthly income
+    fixed: np.ndarray            # (E,) adjusted fixed total
+    discretionary: np.ndarray    # (S, I, E) rounded to cents
+    variable_alloc: np.ndarray   # (S, I, E, K) variable-category targets
+    fixed_pct: np.ndarray        # (I, E) fixed total as a percentage of income
+    gap: np.ndarray              # (S, I, E) fixed + savings - income; positive means over
+
+    @property
+    def shape(self):
+        return self.discretionary.shape
+
+    @property
+    def feasible(self) -> np.ndarray:
+        return self.discretionary >= 0
+
+    def max_feasible_savings(self) -> np.ndarray:
+        """Largest savings target that keeps the plan feasible, per (income change, expense cut)."""
+        return np.maximum(self.income[:, None] - self.fixed[None, :], 0.0)
+
+    def sensitivity(self, income_change: float = 0.0, expense_cut: float = 0.0) -> np.ndarray:
+        """Discretionary money as a function of the savings target (one row of the grid)."""
+        return self.discretionary[:, self._index(self.income_changes, income_change), self._index(self.expense_cuts, expense_cut)]
+
+    def allocations(self) -> np.ndarray:
+        """Variable-category targets for every scenario; shape (S, I, E, K)."""
+        return self.variable_alloc
+
+    def has(self, savings_target: float) -> bool:
+        return bool(np.any(self.savings_targets == savings_target))
+
+    def lookup(self, savings_target: float, income_change: float = 0.0, expense_cut: float = 0.0) -> Dict[str, object]:
+        """One scenario, in the same shape the dashboard computes it."""
+        s = self._index(self.savings_targets, savings_target)
+        i = self._index(self.income_changes, income_change)
+        e = self._index(self.expense_cuts, expense_cut)
+        income = float(self.income[i])
+        return {
+            "monthly_income": income,
+            "fixed_total": float(self.fixed[e]),
+            "savings_target": float(self.savings_targets[s]),
+            "discretionary": float(self.discretionary[s, i, e]),
+            "variable_alloc": dict(zip(VARIABLE_CATEGORIES, self.variable_alloc[s, i, e].tolist())),
+            "warnings": warning_text(income, float(self.fixed_pct[i, e]), float(self.gap[s, i, e])),
+        }
+
+    @staticmethod
+    def _index(axis: np.ndarray, value: float) -> int:
+        hits = np.flatnonzero(axis == value)
+        if not len(hits):
+            raise KeyError(f"{value} is not on the scenario grid")
+        return int(hits[0])
+
+
+def sweep(
+    monthly_income: float,
+    fixed_total: float,
+    savings_targets: Sequence[float],
+    income_changes: Sequence[float] = (0.0,),
+    expense_cuts: Sequence[float] = (0.0,),
+    focus_categories: Sequence[str] = (),
+) -> ScenarioGrid:
+    """Evaluates the full savings x income x expense grid at once."""
+    savings = np.asarray(savings_targets, dtype=np.float64)
+    changes = np.asarray(income_changes, dtype=np.float64)
+    cuts = np.asarray(expense_cuts, dtype=np.float64)
+
+    income = monthly_income * (1.0 + changes)
+    fixed = fixed_total * (1.0 - cuts)
+    # Same operation order as the scalar path: (income - fixed) - savings.
+    discretionary = round_cents((income[None, :, None] - fixed[None, None, :]) - savings[:, None, None])
+    weights = variable_weights(focus_counts([list(focus_categories)]))[0]
+    alloc = allocate_batch(discretionary.ravel(), weights).reshape(discretionary.shape + (len(weights),))
+    # And as budget.warnings(): fixed / income * 100, (fixed + savings) - income.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fixed_pct = (fixed[None, :] / income[:, None]) * 100.0
+    gap = (fixed[None, None, :] + savings[:, None, None]) - income[None, :, None]
+
+    return ScenarioGrid(
+        monthly_income=float(monthly_income),
+        fixed_total=float(fixed_total),
+        savings_targets=savings,
+        income_changes=changes,
+        expense_cuts=cuts,
+        weights=weights,
+        income=income,
+        fixed=fixed,
+        discretionary=discretionary,
+        variable_alloc=alloc,
+        fixed_pct=fixed_pct,
+        gap=gap,
+    )
+
+
+def savings_axis(monthly_income: float, step: float = 25, extra: Sequence[float] = ()) -> np.ndarray:
+    """Savings targets matching the dashboard slider (0..income in `step`s), plus any extra points."""
+    top = max(0.0, float(int(monthly_income)))
+    return np.union1d(np.arange(0.0, top + 1.0, step), np.asarray(extra, dtype=np.float64))
+
+
+def percent_axis(low: float, high: float, step: float) -> List[float]:
+    """Evenly spaced fractions such as -0.3..0.3; rounded so 0.0 is hit exactly."""
+    n = int(round((high - low) / step))
+    return [round(low + i * step, 6) for i in range(n + 1)]
+
+
+# Axes the dashboard's scenario explorer sweeps.
+INCOME_CHANGES = percent_axis(-0.30, 0.30, 0.05)
+EXPENSE_CUTS = percent_axis(0.0, 0.30, 0.05)
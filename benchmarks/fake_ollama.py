@@ -0,0 +1,245 @@
+"""
+A stand-in for a local Ollama server.
+
+Speaks the parts of the API the app uses: GET / (health probe) and
+POST /api/chat, streamed as NDJSON or not. Each answer waits `latency`
+seconds plus `prefill` seconds per prompt token it has to evaluate, and
+then emits `tokens` words `token_delay` seconds apart. The final message
+carries Ollama's counters (prompt_eval_count, eval_count, ..._duration in
+ns). Answers are deterministic per prompt, so cached and fresh answers
+compare equal.
+
+Like Ollama, each model remembers the last conversation it evaluated
+(prompt and answer) while it stays loaded; a request sharing a prefix with
+it evaluates only the rest. A model stays loaded for the request's
+keep_alive (default 5m) and costs `load_time` seconds to load again.
+Tokens are counted as 4 characters of the rendered chat. With `drop_after`
+set, a streamed answer is cut off after that many tokens, as if the server
+died mid-answer.
+
+Point the app at it with OLLAMA_HOST=http://127.0.0.1:PORT.
+
+Usage: python benchmarks/fake_ollama.py [--port 11435] [--latency 0.5] [--prefill 0.002] [--load-time 2]
+                                        [--token-delay 0.01] [--tokens 80]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+DEFAULT_KEEP_ALIVE = 300.0  # seconds, Ollama's default
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(value: Any) -> float:
+    """Ollama's keep_alive: seconds as a number or a duration like "30m" / "1h30m"; negative = forever."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        try:
+            seconds = float(text)
+        except ValueError:
+            parts = _DURATION.findall(text)
+            if not parts or "".join(n + u for n, u in parts) != text.lstrip("-"):
+                raise ValueError(f"bad keep_alive {value!r}")
+            seconds = sum(float(n) * _UNITS[u] for n, u in parts) * (-1 if text.startswith("-") else 1)
+    return float("inf") if seconds < 0 else seconds
+
+
+def render(messages: List[Dict[str, str]]) -> str:
+    """The chat as one prompt string, like a model's chat template."""
+    return "".join(f"<|{m.get('role', 'user')}|>\n{m.get('content', '')}\n" for m in messages)
+
+
+class FakeOllama:
+    def __init__(
+        self, latency: float = 0.2, token_delay: float = 0.0, tokens: int = 60, port: int = 0,
+        prefill: float = 0.0, load_time: float = 0.0, drop_after: Optional[int] = None,
+    ) -> None:
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.prefill = prefill      # seconds per evaluated prompt token
+        self.load_time = load_time  # seconds to load a model that is not loaded
+        self.drop_after = drop_after  # streamed tokens before the connection is cut
+        self.requests = 0
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, Tuple[float, str]] = {}  # model -> (unload at, last evaluated text)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def answer(self, messages: List[Dict[str, str]]) -> List[str]:
+        """The reply for a conversation, as tokens."""
+        seed = hashlib.blake2b(json.dumps(messages, sort_keys=True).encode(), digest_size=4).hexdigest()
+        return [f"Advice {seed}:"] + [f" point{i}" for i in range(1, self.tokens)]
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def evaluate(self, model: str, prompt: str, keep_alive: float) -> Tuple[bool, int, int]:
+        """(needs loading, prompt tokens, tokens cached from the last request) for a request."""
+        now = time.monotonic()
+        with self._lock:
+            unload_at, last = self._loaded.get(model, (0.0, ""))
+            cold = unload_at <= now
+            if cold:
+                self.loads += 1
+                last = ""
+            self._loaded[model] = (now + keep_alive, last)
+        total = max(1, len(prompt) // CHARS_PER_TOKEN)
+        # At least one token is always evaluated, even for an exact repeat.
+        cached = min(len(os.path.commonprefix([prompt, last])) // CHARS_PER_TOKEN, total - 1)
+        return cold, total, cached
+
+    def remember(self, model: str, text: str) -> None:
+        """What the model evaluated for this request, prompt plus answer."""
+        with self._lock:
+            if model in self._loaded:
+                unload_at, _ = self._loaded[model]
+                self._loaded[model] = (unload_at, text)
+
+
+def _handler(fake: FakeOllama) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            fake.count()
+            started = time.perf_counter_ns()
+            model = req.get("model", "")
+            messages = req.get("messages", [])
+            prompt = render(messages)
+            try:
+                keep_alive = keep_alive_seconds(req.get("keep_alive"))
+            except ValueError as e:
+                self._json(400, {"error": str(e)})
+                return
+            cold, total, cached = fake.evaluate(model, prompt, keep_alive)
+            if cold and fake.load_time:
+                time.sleep(fake.load_time)
+            loaded = time.perf_counter_ns()
+            time.sleep(fake.latency + fake.prefill * (total - cached))
+            prompt_done = time.perf_counter_ns()
+            tokens = fake.answer(messages)
+            fake.remember(model, prompt + render([{"role": "assistant", "content": "".join(tokens)}]))
+            stats = {
+                "load_duration": loaded - started,
+                "prompt_eval_count": total - cached,
+                "prompt_eval_duration": prompt_done - loaded,
+                "eval_count": len(tokens),
+            }
+
+            if req.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, tok in enumerate(tokens):
+                    if i == fake.drop_after:
+                        # No final message and no terminating chunk: the client sees a broken stream.
+                        self.close_connection = True
+                        return
+                    self._chunk({"model": model, "message": {"role": "assistant", "content": tok}, "done": False})
+                    if fake.token_delay:
+                        time.sleep(fake.token_delay)
+                end = time.perf_counter_ns()
+                self._chunk({
+                    "model": model, "message": {"role": "assistant", "content": ""}, "done": True,
+                    **stats, "eval_duration": end - prompt_done, "total_duration": end - started,
+                })
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            time.sleep(fake.token_delay * len(tokens))
+            end = time.perf_counter_ns()
+            self._json(200, {
+                "model": model, "message": {"role": "assistant", "content": "".join(tokens)}, "done": True,
+                **stats, "eval_duration": end - prompt_done, "total_duration": end - started,
+            })
+
+        def _json(self, status: int, obj: Dict[str, Any]) -> None:
+            body = json.dumps(obj).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, obj: Dict[str, Any]) -> None:
+            data = json.dumps(obj).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.5, help="fixed seconds before the first token")
+    parser.add_argument("--prefill", type=float, default=0.002, help="seconds per evaluated prompt token")
+    parser.add_argument("--load-time", type=float, default=2.0, help="seconds to load a model")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=80, help="tokens per answer")
+    args = parser.parse_args(argv)
+    fake = FakeOllama(args.latency, args.token_delay, args.tokens, args.port, args.prefill, args.load_time).start()
+    print(f"fake Ollama on {fake.url} (OLLAMA_HOST={fake.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
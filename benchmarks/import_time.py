@@ -0,0 +1,168 @@
+"""
+Startup cost of the Streamlit app.
+
+Runs `python -X importtime` over the modules app/main.py imports at the
+top level (read from main.py itself, so a new import shows up here), and
+optionally times the first script run and later reruns through Streamlit's
+AppTest in a fresh process. The import report can be compared against a
+checked-in baseline: the run fails if a module that is meant to load lazily
+(pandas, plotly.express, requests, ...) is imported at startup again, or if
+the number of modules or the total time grows by more than --tolerance.
+
+Times depend on the machine and are noisy on a busy one; refresh the
+baseline with --save when moving it. The module checks are exact.
+
+Usage: python benchmarks/import_time.py [--runs 5] [--app] [--baseline PATH] [--save]
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "app"
+BASELINE = Path(__file__).resolve().parent / "import_time_baseline.json"
+
+# Only the tab or chart that needs these may import them. (Streamlit itself
+# imports plotly.graph_objects, but that is a lazy stub.)
+LAZY_MODULES = ["pandas", "numpy", "plotly.express", "requests", "pyarrow"]
+
+
+def startup_imports() -> List[str]:
+    """Module names main.py imports at module level."""
+    names = []
+    for node in ast.parse((APP / "main.py").read_text()).body:
+        if isinstance(node, ast.Import):
+            names += [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def importtime(modules: List[str]) -> Dict[str, Dict[str, int]]:
+    """{module: {"self": us, "cumulative": us, "depth": n}} for one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=APP, capture_output=True, text=True, check=True,
+    )
+    result = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        result[name.strip()] = {"self": int(self_us), "cumulative": int(cumulative), "depth": depth}
+    return result
+
+
+def import_report(runs: int) -> Dict:
+    modules = startup_imports()
+    samples = [importtime(modules) for _ in range(runs)]
+    loaded = sorted(set.intersection(*(set(s) for s in samples)))
+
+    def median(name: str, key: str) -> int:
+        return int(statistics.median(s[name][key] for s in samples))
+
+    top_level = {m: median(m, "cumulative") for m in loaded if samples[0][m]["depth"] == 0}
+    return {
+        "modules": modules,
+        "total_ms": round(statistics.median(sum(v["self"] for v in s.values()) for s in samples) / 1000, 1),
+        "module_count": len(loaded),
+        "top_level_ms": {m: round(us / 1000, 1) for m, us in sorted(top_level.items(), key=lambda kv: -kv[1])},
+        "lazy_loaded": [m for m in LAZY_MODULES if m in loaded],
+    }
+
+
+# Runs in a fresh interpreter: first paint of the default page, then full reruns.
+_APP_SNIPPET = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+t = time.perf_counter(); at.run(); first = time.perf_counter() - t
+reruns = []
+for _ in range(int(sys.argv[2])):
+    t = time.perf_counter(); at.run(); reruns.append(time.perf_counter() - t)
+assert not at.exception, at.exception
+print(json.dumps({"first": first, "reruns": reruns}))
+"""
+
+_SEED_SNIPPET = """
+import db
+db.init_db()
+for i in range(20):
+    db.add_income(f"pay {i}", 1000.0 + i, "biweekly", wait=False)
+    db.add_expense(f"bill {i}", 50.0 + i, "monthly", "Bills", wait=False)
+db.stop_writer()
+"""
+
+
+def app_report(runs: int, reruns: int = 10) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="truebudget-startup-") as tmp:
+        env = {**os.environ, "TRUEBUDGET_DB": os.path.join(tmp, "startup.sqlite3")}
+        subprocess.run([sys.executable, "-c", _SEED_SNIPPET], cwd=APP, env=env, check=True)
+        firsts, rerun_times = [], []
+        for _ in range(runs):
+            proc = subprocess.run(
+                [sys.executable, "-c", _APP_SNIPPET, str(APP / "main.py"), str(reruns)],
+                cwd=APP, env=env, capture_output=True, text=True, check=True,
+            )
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            firsts.append(r["first"])
+            rerun_times += r["reruns"]
+    return {
+        "first_run_ms": round(statistics.median(firsts) * 1000, 1),
+        "rerun_ms": round(statistics.median(rerun_times) * 1000, 1),
+    }
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    problems = [f"{m} is imported at startup again" for m in report["lazy_loaded"]]
+    if report["module_count"] > baseline["module_count"] * (1 + tolerance):
+        problems.append(f"{report['module_count']} modules imported at startup, baseline {baseline['module_count']}")
+    limit = baseline["total_ms"] * (1 + tolerance)
+    if report["total_ms"] > limit:
+        problems.append(f"startup imports take {report['total_ms']} ms, baseline {baseline['total_ms']} ms (limit {limit:.1f})")
+    new = sorted(set(report["top_level_ms"]) - set(baseline["top_level_ms"]))
+    if new:
+        print(f"new top-level imports: {', '.join(new)}")
+    return problems
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--app", action="store_true", help="also time the first script run and reruns")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed growth of module count and import time")
+    parser.add_argument("--save", action="store_true", help="write this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    report = import_report(args.runs)
+    print(f"startup imports: {report['total_ms']} ms, {report['module_count']} modules")
+    for name, ms in report["top_level_ms"].items():
+        if ms >= 1.0:
+            print(f"  {name:<24}{ms:>8.1f} ms")
+    if args.app:
+        report.update(app_report(args.runs))
+        print(f"first run: {report['first_run_ms']} ms, rerun: {report['rerun_ms']} ms")
+
+    if args.save:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        return 0
+    problems = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+    for p in problems:
+        print(f"REGRESSION: {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
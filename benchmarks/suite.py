@@ -0,0 +1,439 @@
+"""
+Benchmark suite for db, budget and the Streamlit script.
+
+Fills a fresh database with seeded synthetic data (see synthetic.py), then
+times each scenario:
+
+  listing      keyset pages, filtered pages, deep pages
+  aggregation  totals, snapshot, monthly actuals (cold = after a change)
+  allocation   allocate_variable_budget, the constrained allocation engine
+               (scalar and batched), household payloads, scenario grid
+  rerun        AppTest first run and full reruns of each section
+  crud         single writes, deletes and batch inserts through the writer
+  categorize   compiling 1,000 merchant rules, matching descriptions against
+               them, a rule edit, and recategorizing stored transactions
+  columnar     exporting and refreshing the memory-mapped snapshot, and
+               loading every transaction into a DataFrame of monthly
+               spending from SQLite vs from the snapshot (time and peak RSS,
+               each in a fresh process)
+  llm          advice jobs and follow-up questions against a fake Ollama
+               server (fake_ollama.py); prompt tokens are the ones it evaluated
+
+Writes {"meta": ..., "metrics": {name: {"value", "unit", "better"}}} as
+JSON. With --baseline (any earlier results file), each metric is compared
+and the run fails when one is worse by more than --tolerance. Numbers
+depend on the machine, so compare against a baseline from the same one;
+on a shared or throttled machine small metrics swing by a third between
+runs, hence the loose default.
+
+Usage: python benchmarks/suite.py [--scale small] [--seed 0] [--only listing crud ...]
+                                  [--latency 0.2] [--prefill 0.0005] [-o results.json] [--baseline FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+# The app modules read these at import time, so they are set first.
+_tmp = tempfile.mkdtemp(prefix="truebudget-bench-")
+os.environ["TRUEBUDGET_DB"] = os.path.join(_tmp, "bench.sqlite3")
+_fake = FakeOllama().start()
+os.environ["OLLAMA_HOST"] = _fake.url
+
+import budget  # noqa: E402
+import db  # noqa: E402
+import synthetic  # noqa: E402
+
+Metric = Dict[str, Any]
+
+
+def metric(value: float, unit: str, better: str = "lower") -> Metric:
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def per_call(fn: Callable[[], Any], number: int, repeat: int = 5) -> float:
+    """Seconds per call in the best of `repeat` rounds of `number` calls (the least disturbed one)."""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return min(rounds)
+
+
+def cold(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """fn preceded by what a write does to the caches (without the write)."""
+    def run() -> Any:
+        db._bump_version()
+        return fn()
+    return run
+
+
+#  Scenarios
+def bench_listing(scale: synthetic.Scale) -> Dict[str, Metric]:
+    def walk(pages: int) -> None:
+        after = None
+        for _ in range(pages):
+            page = db.page_income(after)
+            after = page.next_cursor
+            if after is None:
+                break
+
+    return {
+        "first_page_ms": metric(per_call(lambda: db.page_income(), 200) * 1e3, "ms"),
+        "first_page_cold_ms": metric(per_call(cold(lambda: db.page_income()), 50) * 1e3, "ms"),
+        "walk_20_pages_ms": metric(per_call(lambda: walk(20), 10) * 1e3, "ms"),
+        "search_page_cold_ms": metric(per_call(cold(lambda: db.page_income(search="Income 1")), 20) * 1e3, "ms"),
+        "category_page_cold_ms": metric(
+            per_call(cold(lambda: db.page_expenses(category="Rent", frequency="monthly")), 20) * 1e3, "ms"
+        ),
+    }
+
+
+def bench_aggregation(scale: synthetic.Scale) -> Dict[str, Metric]:
+    months = db.transaction_months()
+    first, last = (months[-1], months[0]) if months else ("2025-01", "2025-12")
+    return {
+        "totals_cold_ms": metric(per_call(cold(db.load_totals), 50) * 1e3, "ms"),
+        "totals_warm_us": metric(per_call(db.load_totals, 2000) * 1e6, "us"),
+        "snapshot_cold_ms": metric(per_call(cold(db.load_snapshot), 5) * 1e3, "ms"),
+        "actuals_12_months_cold_ms": metric(per_call(cold(lambda: db.monthly_actuals(first, last)), 50) * 1e3, "ms"),
+        "transaction_months_cold_ms": metric(per_call(cold(db.transaction_months), 50) * 1e3, "ms"),
+        "rebuild_rollups_ms": metric(per_call(db.rebuild_rollups, 1, repeat=3) * 1e3, "ms"),
+    }
+
+
+def bench_allocation(scale: synthetic.Scale) -> Dict[str, Metric]:
+    import numpy as np
+
+    from allocation import allocate
+    from batch import run, read_tasks
+    from budget_vec import allocate_batch
+    from scenarios import EXPENSE_CUTS, INCOME_CHANGES, savings_axis, sweep
+
+    homes = list(synthetic.households(scale.households))
+    path = os.path.join(_tmp, "households.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(h) + "\n" for h in homes)
+
+    def payloads() -> None:
+        for h in homes:
+            budget.household_payload(h["profile"], h["incomes"], h["expenses"])
+
+    def batch_run() -> None:
+        for _ in run(read_tasks([path]), workers=1):
+            pass
+
+    # A household with 1,000 user-defined categories, and 10,000 totals at once.
+    rng = random.Random(1)
+    names = [f"Category {i}" for i in range(1000)]
+    weights = {n: rng.uniform(0.1, 5.0) for n in names}
+    floors = {n: rng.uniform(0.0, 20.0) for n in names}
+    caps = {n: rng.uniform(20.0, 200.0) for n in names}
+    priorities = {n: rng.randint(0, 2) for n in names}
+    totals = np.round(np.random.default_rng(1).uniform(0.0, 8000.0, 10_000), 2)
+    batch_weights = np.array(list(weights.values())[:20])
+    batch_caps = np.array(list(caps.values())[:20]) * 10
+
+    income, fixed, _ = db.load_totals()
+    focus = tuple(budget.focus_categories(db.load_profile()))
+    payload_s = per_call(payloads, 1, repeat=3)
+    batch_s = per_call(batch_run, 1, repeat=3)
+    return {
+        "allocate_us": metric(per_call(lambda: budget.allocate_variable_budget(1234.56, ["Groceries"]), 20000) * 1e6, "us"),
+        "allocate_1000_categories_ms": metric(
+            per_call(lambda: allocate(50_000.0, weights, floors, caps, priorities), 20) * 1e3, "ms"
+        ),
+        "allocate_batch_per_s": metric(
+            len(totals) / per_call(lambda: allocate_batch(totals, batch_weights, caps=batch_caps), 3), "totals/s", "higher"
+        ),
+        "household_payload_us": metric(payload_s / len(homes) * 1e6, "us"),
+        "batch_profiles_per_s": metric(len(homes) / batch_s, "profiles/s", "higher"),
+        "scenario_grid_ms": metric(
+            per_call(lambda: sweep(income, fixed, savings_axis(income, extra=[300]), INCOME_CHANGES, EXPENSE_CUTS, focus), 5)
+            * 1e3, "ms",
+        ),
+    }
+
+
+def bench_rerun(scale: synthetic.Scale) -> Dict[str, Metric]:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app" / "main.py"), default_timeout=120)
+    started = time.perf_counter()
+    at.run()
+    out = {"first_run_ms": metric((time.perf_counter() - started) * 1e3, "ms")}
+    for section in ("1) Inputs", "2) Dashboard", "3) Advice"):
+        at.radio(key="section").set_value(section).run()
+        name = section.split(") ")[1].lower()
+        out[f"{name}_rerun_ms"] = metric(per_call(at.run, 3, repeat=5) * 1e3, "ms")
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return out
+
+
+def bench_crud(scale: synthetic.Scale) -> Dict[str, Metric]:
+    n = 300
+    add_expense = metric(1 / per_call(lambda: db.add_expense("bench", 42.0, "monthly", "Bills"), n, 3), "ops/s", "higher")
+    # Deletes the rows just added.
+    ids = [r[0] for r in db.get_conn().execute("SELECT id FROM expenses WHERE name = 'bench'")]
+    # Fresh rows each round, so every round inserts rather than skipping duplicates.
+    rounds = iter([synthetic.expenses(random.Random(seed), 20_000) for seed in range(1, 4)])
+    return {
+        "add_income_per_s": metric(1 / per_call(lambda: db.add_income("bench", 100.0, "biweekly"), n, 3), "ops/s", "higher"),
+        "add_expense_per_s": add_expense,
+        "delete_expense_per_s": metric(1 / per_call(lambda: db.delete_expense(ids.pop()), n, 3), "ops/s", "higher"),
+        "add_transaction_per_s": metric(
+            1 / per_call(lambda: db.add_transaction("2025-06-01", "bench", -5.0, "Misc"), n, 3), "ops/s", "higher"
+        ),
+        "batch_insert_rows_per_s": metric(20_000 / per_call(lambda: db.insert_expense_batch(next(rounds)), 1, 3), "rows/s", "higher"),
+    }
+
+
+def bench_categorize(scale: synthetic.Scale) -> Dict[str, Metric]:
+    import categorize
+
+    rng = random.Random(7)
+    names = synthetic.merchants(rng, 1_000)
+    db.insert_rule_batch(synthetic.category_rules(rng, names))
+    rules = [categorize.Rule.from_row(r) for r in db.rule_changes(0)[1].values()]
+    rows = list(synthetic.merchant_transactions(rng, names, 50_000, first_fingerprint=10 ** 9))
+    descriptions = [r[1] for r in rows]
+    amounts = [r[2] for r in rows]
+
+    def match_all() -> None:
+        # A fresh index each round, so every description is matched rather than memoized.
+        categorize.RuleIndex(rules).categorize(descriptions, amounts)
+
+    edits = iter(range(10 ** 6))
+    db.insert_transaction_batch(rows)
+    started = time.perf_counter()
+    result = categorize.apply_rules()
+    apply_s = time.perf_counter() - started
+    return {
+        "compile_1000_rules_ms": metric(per_call(lambda: categorize.RuleIndex(rules), 3) * 1e3, "ms"),
+        "categorize_rows_per_s": metric(len(rows) / per_call(match_all, 1, 3), "rows/s", "higher"),
+        "rule_edit_ms": metric(
+            per_call(lambda: (db.add_rule("contains", f"bench {next(edits)}", "Misc"), categorize.get_index()), 20) * 1e3,
+            "ms",
+        ),
+        "apply_rules_rows_per_s": metric(result["scanned"] / apply_s, "rows/s", "higher"),
+    }
+
+
+# Run in a fresh process so peak RSS covers only the load. Prints {"ms", "rss_mb"}.
+_LOAD = """
+import json, resource, sys, time
+sys.path.insert(0, {app!r})
+import pandas as pd
+import columnar, db
+
+def peak():
+    # VmHWM starts over at exec; ru_maxrss can carry the parent's peak on Linux.
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+base = peak()
+started = time.perf_counter()
+if {mode!r} == "sqlite":
+    df = pd.DataFrame([dict(r) for r in db.get_conn().execute(
+        "SELECT id, date, amount, category, account FROM transactions")])
+    df["month"] = df["date"].str[:7]
+    df.assign(spent=(-df["amount"]).clip(lower=0)).groupby(["month", "category"], dropna=False)["spent"].sum()
+else:
+    tx = columnar.open_table("transactions")
+    columnar.monthly_spending(tx)
+    df = tx.frame()
+print(json.dumps({{"ms": (time.perf_counter() - started) * 1e3, "rss_mb": peak() - base}}))
+"""
+
+
+def _load(mode: str) -> Dict[str, float]:
+    code = _LOAD.format(app=str(ROOT / "app"), mode=mode)
+    return json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+
+def bench_columnar(scale: synthetic.Scale) -> Dict[str, Metric]:
+    import columnar
+
+    started = time.perf_counter()
+    rows = columnar.refresh("transactions", rebuild=True).rows
+    export_s = time.perf_counter() - started
+    fingerprints = iter(range(2 * 10 ** 9, 3 * 10 ** 9))
+
+    def insert_and_refresh() -> None:
+        db.insert_transaction_batch([("2025-12-31", "bench", -1.0, None, "checking", next(fingerprints))])
+        columnar.refresh("transactions")
+
+    out = {
+        "export_rows_per_s": metric(rows / export_s, "rows/s", "higher"),
+        "refresh_after_insert_ms": metric(per_call(insert_and_refresh, 20) * 1e3, "ms"),
+    }
+    for mode in ("sqlite", "snapshot"):
+        runs = [_load(mode) for _ in range(3)]
+        out[f"{mode}_load_ms"] = metric(statistics.median(r["ms"] for r in runs), "ms")
+        out[f"{mode}_load_rss_mb"] = metric(statistics.median(r["rss_mb"] for r in runs), "MB")
+    return out
+
+
+def bench_llm(scale: synthetic.Scale) -> Dict[str, Metric]:
+    import llm
+    from jobs import JobQueue
+
+    queue = JobQueue(workers=1)
+    homes = list(synthetic.households(12, seed=1))
+    payloads = [budget.household_payload(h["profile"], h["incomes"], h["expenses"]) for h in homes]
+
+    before = llm.cache_stats()
+    started = time.perf_counter()
+    job_ids = [queue.submit(f"s{i}", p, refresh=True) for i, p in enumerate(payloads)]
+    for job_id in job_ids:
+        queue.result(job_id, timeout=120)
+    fresh = time.perf_counter() - started
+    after = llm.cache_stats()
+    prompt_tokens = (after["prompt_tokens"] - before["prompt_tokens"]) / (after["requests"] - before["requests"])
+    latencies = [queue.status(j)["finished_at"] - queue.status(j)["submitted_at"] for j in job_ids]
+
+    first_chunk = []
+    for p in payloads[:3]:
+        started = time.perf_counter()
+        stream = llm.stream_advice(p, refresh=True)
+        next(stream)
+        first_chunk.append(time.perf_counter() - started)
+        for _ in stream:
+            pass
+
+    chat = llm.AdviceSession(payloads[0])
+    for _ in chat.ask():
+        pass
+    for question in ("Where could I free up $200 a month?", "Is my rent too high?", "How fast can I save $5,000?"):
+        for _ in chat.ask(question):
+            pass
+    followups = chat.usage[1:]
+
+    cached = per_call(lambda: llm.generate_advice(payloads[0]), 200)
+    return {
+        "advice_jobs_per_s": metric(len(payloads) / fresh, "jobs/s", "higher"),
+        "advice_latency_p50_s": metric(statistics.median(latencies), "s"),
+        "first_chunk_ms": metric(statistics.median(first_chunk) * 1e3, "ms"),
+        "prompt_tokens_per_advice": metric(prompt_tokens, "tokens"),
+        "followup_prompt_tokens": metric(statistics.median(u["prompt_tokens"] for u in followups), "tokens"),
+        "followup_prefill_ms": metric(statistics.median(u["prefill_ms"] for u in followups), "ms"),
+        "cached_advice_us": metric(cached * 1e6, "us"),
+    }
+
+
+# Read-only scenarios first, so the writes don't change what they measure.
+SCENARIOS: Dict[str, Callable[[synthetic.Scale], Dict[str, Metric]]] = {
+    "listing": bench_listing,
+    "aggregation": bench_aggregation,
+    "allocation": bench_allocation,
+    "rerun": bench_rerun,
+    "crud": bench_crud,
+    "categorize": bench_categorize,
+    "columnar": bench_columnar,
+    "llm": bench_llm,
+}
+
+
+#  Results
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Prints current vs baseline per metric; returns the metrics worse by more than `tolerance`."""
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, cur in results["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if base is None or not base["value"]:
+            print(f"{name:<44}{'-':>12}{cur['value']:>12.4g}")
+            continue
+        change = cur["value"] / base["value"] - 1
+        worse = change > tolerance if cur["better"] == "lower" else change < -tolerance
+        flag = "  worse" if worse else ""
+        print(f"{name:<44}{base['value']:>12.4g}{cur['value']:>12.4g}{change:>+9.0%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(synthetic.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Ollama seconds before the first token")
+    parser.add_argument("--prefill", type=float, default=0.0005, help="fake Ollama seconds per prompt token")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown per metric")
+    args = parser.parse_args(argv)
+    _fake.latency = args.latency
+    _fake.prefill = args.prefill
+    scale = synthetic.SCALES[args.scale]
+
+    started = time.perf_counter()
+    counts = synthetic.populate(scale, args.seed)
+    print(f"generated {args.scale} data in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{v:,} {k}" for k, v in counts.items()))
+
+    results = {
+        "meta": {
+            "scale": args.scale,
+            "seed": args.seed,
+            "fake_latency_s": args.latency,
+            "fake_prefill_s": args.prefill,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "metrics": {},
+    }
+    for name in args.only or SCENARIOS:
+        started = time.perf_counter()
+        for key, value in SCENARIOS[name](scale).items():
+            results["metrics"][f"{name}.{key}"] = value
+            print(f"  {name}.{key:<36}{value['value']:>12.4g} {value['unit']}")
+        print(f"{name}: {time.perf_counter() - started:.1f}s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    db.close_conn()
+    _fake.stop()
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,195 @@
+"""
+Seeded synthetic budgets for benchmarks.
+
+One household's data (profile, incomes, expenses, transactions) is
+generated at a named scale and loaded into the current database through
+db's batch inserts; households() yields the JSONL records app/batch.py
+reads, and merchants() / category_rules() / merchant_transactions() give
+bank-style descriptions and rules to categorize them. The same seed always
+produces the same data.
+
+Usage: python benchmarks/synthetic.py [--scale small|medium|large] [--seed 0]
+                                      [--db out.sqlite3] [--households out.jsonl]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from budget import DEFAULT_VARIABLE_WEIGHTS  # noqa: E402
+
+
+@dataclass(frozen=True)
+class Scale:
+    incomes: int
+    expenses: int
+    transactions: int
+    households: int  # JSONL records for the batch runner
+
+
+SCALES = {
+    "small": Scale(incomes=20, expenses=100, transactions=2_000, households=1_000),
+    "medium": Scale(incomes=2_000, expenses=10_000, transactions=100_000, households=10_000),
+    "large": Scale(incomes=50_000, expenses=200_000, transactions=1_000_000, households=100_000),
+}
+
+FREQUENCIES = ["weekly", "biweekly", "monthly"]
+FIXED_CATEGORIES = ["Rent", "Bills", "Insurance", "Debt", "Subscriptions", "Other Fixed"]
+VARIABLE_CATEGORIES = list(DEFAULT_VARIABLE_WEIGHTS)
+LOCATIONS = ["Seattle", "Austin", "Toronto", "Denver", "", "Chicago"]
+MERCHANT_PARTS = [
+    "am", "zon", "star", "buck", "wal", "mart", "tar", "get", "shell", "uber", "lyft", "cost", "co",
+    "whole", "foods", "net", "flix", "spot", "ify", "king", "burger", "fresh", "market", "city",
+]
+# Fixed, so the same seed gives the same months whenever it runs.
+LAST_DAY = date(2025, 12, 31)
+MONTHS = 12
+CHUNK_ROWS = 50_000
+
+
+def profile(rng: random.Random) -> Dict[str, Any]:
+    goal_type = rng.choice(["amount", "percent"])
+    return {
+        "location": rng.choice(LOCATIONS),
+        "savings_goal_type": goal_type,
+        "savings_goal_value": float(rng.randrange(50, 1500, 25) if goal_type == "amount" else rng.randint(0, 40)),
+        "focus_categories": ", ".join(rng.sample(VARIABLE_CATEGORIES, rng.randint(0, 3))),
+    }
+
+
+def incomes(rng: random.Random, n: int) -> List[Tuple[str, float, str]]:
+    """(name, amount, frequency) rows."""
+    rows = []
+    for i in range(n):
+        frequency = rng.choice(FREQUENCIES)
+        base = {"weekly": 450, "biweekly": 1100, "monthly": 2600}[frequency]
+        rows.append((f"Income {i}", round(base * rng.uniform(0.4, 1.8), 2), frequency))
+    return rows
+
+
+def expenses(rng: random.Random, n: int) -> List[Tuple[str, float, str, str]]:
+    """(name, amount, frequency, category) rows, mostly monthly like real bills."""
+    rows = []
+    for i in range(n):
+        category = rng.choice(FIXED_CATEGORIES)
+        frequency = "monthly" if rng.random() < 0.8 else rng.choice(FREQUENCIES)
+        high = 1800 if category == "Rent" else 300
+        rows.append((f"{category} {i}", round(rng.uniform(10, high), 2), frequency, category))
+    return rows
+
+
+def transactions(rng: random.Random, n: int) -> Iterator[Tuple[str, str, float, Optional[str], Optional[str], int]]:
+    """Rows for db.insert_transaction_batch over the MONTHS before LAST_DAY; fingerprints are unique."""
+    span = MONTHS * 30
+    for i in range(n):
+        day = LAST_DAY - timedelta(days=rng.randrange(span))
+        if rng.random() < 0.05:
+            yield day.isoformat(), f"Payroll {i}", round(rng.uniform(800, 3000), 2), None, "checking", i
+            continue
+        category = rng.choice(VARIABLE_CATEGORIES) if rng.random() < 0.9 else None
+        yield day.isoformat(), f"Purchase {i}", -round(rng.uniform(2, 250), 2), category, "checking", i
+
+
+def merchants(rng: random.Random, n: int) -> List[str]:
+    """n distinct merchant names."""
+    names: Dict[str, None] = {}
+    while len(names) < n:
+        names["".join(rng.sample(MERCHANT_PARTS, rng.randint(2, 4)))] = None
+    return list(names)
+
+
+def category_rules(rng: random.Random, names: List[str]) -> List[Tuple[str, str, str, Optional[float], Optional[float], int]]:
+    """One rule per merchant for db.insert_rule_batch, a few of them limited to an amount range."""
+    rows = []
+    for name in names:
+        kind = "prefix" if rng.random() < 0.2 else "contains"
+        low, high = (None, None) if rng.random() < 0.9 else (float(rng.choice([0, 20, 50])), float(rng.choice([100, 500])))
+        rows.append((kind, name.upper(), rng.choice(VARIABLE_CATEGORIES), low, high, rng.randint(0, 2)))
+    return rows
+
+
+def merchant_transactions(
+    rng: random.Random, names: List[str], n: int, first_fingerprint: int = 0
+) -> Iterator[Tuple[str, str, float, Optional[str], Optional[str], int]]:
+    """Uncategorized card purchases described the way banks export them."""
+    span = MONTHS * 30
+    for i in range(n):
+        day = LAST_DAY - timedelta(days=rng.randrange(span))
+        name = rng.choice(names)
+        description = f"{name.upper()} #{rng.randrange(1, 9999)} {rng.choice(LOCATIONS).upper()}"
+        if rng.random() < 0.5:
+            description = "POS " + description
+        yield day.isoformat(), description, -round(rng.uniform(2, 250), 2), None, "checking", first_fingerprint + i
+
+
+def household(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {
+        "id": f"h{i}",
+        "profile": profile(rng),
+        "incomes": [{"amount": a, "frequency": f} for _, a, f in incomes(rng, rng.randint(1, 3))],
+        "expenses": [{"amount": a, "frequency": f, "category": c} for _, a, f, c in expenses(rng, rng.randint(2, 12))],
+    }
+
+
+def households(n: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(n):
+        yield household(rng, i)
+
+
+def populate(scale: Scale, seed: int = 0) -> Dict[str, int]:
+    """Fills the current database (db.DB_PATH) with one household at `scale`. Returns row counts."""
+    import db
+
+    rng = random.Random(seed)
+    db.init_db()
+    p = profile(rng)
+    db.upsert_profile(p["location"], p["savings_goal_type"], p["savings_goal_value"], p["focus_categories"])
+    counts = {
+        "incomes": db.insert_income_batch(incomes(rng, scale.incomes)),
+        "expenses": db.insert_expense_batch(expenses(rng, scale.expenses)),
+        "transactions": 0,
+    }
+    batch = []
+    for row in transactions(rng, scale.transactions):
+        batch.append(row)
+        if len(batch) == CHUNK_ROWS:
+            counts["transactions"] += db.insert_transaction_batch(batch)
+            batch = []
+    if batch:
+        counts["transactions"] += db.insert_transaction_batch(batch)
+    return counts
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="database to fill (created if missing)")
+    parser.add_argument("--households", help="JSONL file of households for app/batch.py")
+    args = parser.parse_args(argv)
+    if not args.db and not args.households:
+        parser.error("give --db and/or --households")
+
+    scale = SCALES[args.scale]
+    if args.db:
+        os.environ["TRUEBUDGET_DB"] = args.db  # read when db is first imported
+        counts = populate(scale, args.seed)
+        print(f"{args.db}: " + ", ".join(f"{v:,} {k}" for k, v in counts.items()))
+    if args.households:
+        with open(args.households, "w", encoding="utf-8") as f:
+            for h in households(scale.households, args.seed):
+                f.write(json.dumps(h, separators=(",", ":")) + "\n")
+        print(f"{args.households}: {scale.households:,} households")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""
+Many concurrent writers against one database.
+
+Each thread stands in for a browser session adding incomes and expenses.
+The same workload runs twice: once through db's single writer thread
+(group commit), and once the old way, with every thread committing on its
+own connection. Reports writes/sec and failed writes per thread count.
+
+Usage: python benchmarks/write_stress.py [--threads 1 4 16 64] [--writes 200] [--window 0.002]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ["TRUEBUDGET_DB"] = os.path.join(tempfile.mkdtemp(prefix="truebudget-stress-"), "stress.sqlite3")
+
+import db  # noqa: E402
+
+
+def _writer_session(i: int, writes: int, errors: List[Exception]) -> None:
+    for k in range(writes):
+        try:
+            if k % 2:
+                db.add_expense(f"bill {i}-{k}", 10.0 + k, "monthly", "Utilities")
+            else:
+                db.add_income(f"pay {i}-{k}", 100.0 + k, "biweekly")
+        except Exception as e:
+            errors.append(e)
+
+
+def _direct_session(i: int, writes: int, errors: List[Exception]) -> None:
+    # Baseline: a connection per session and a commit per write.
+    conn = sqlite3.connect(db.DB_PATH, timeout=5.0)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    try:
+        for k in range(writes):
+            try:
+                if k % 2:
+                    conn.execute(
+                        "INSERT INTO expenses (name, amount, frequency, category) VALUES (?, ?, 'monthly', 'Utilities')",
+                        (f"bill {i}-{k}", 10.0 + k),
+                    )
+                else:
+                    conn.execute(
+                        "INSERT INTO income_sources (name, amount, frequency) VALUES (?, ?, 'biweekly')",
+                        (f"pay {i}-{k}", 100.0 + k),
+                    )
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                errors.append(e)
+    finally:
+        conn.close()
+
+
+def run(session: Callable[[int, int, List[Exception]], None], threads: int, writes: int) -> Dict[str, float]:
+    errors: List[Exception] = []
+    workers = [threading.Thread(target=session, args=(i, writes, errors)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done = threads * writes - len(errors)
+    return {"threads": threads, "writes": done, "errors": len(errors), "seconds": elapsed, "per_sec": done / elapsed}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--window", type=float, default=db.GROUP_COMMIT_WINDOW, help="group commit window, seconds")
+    args = parser.parse_args(argv)
+    db.GROUP_COMMIT_WINDOW = args.window
+
+    db.init_db()
+    print(f"{'mode':<14}{'threads':>8}{'writes/s':>12}{'errors':>8}{'commits':>9}")
+    for threads in args.threads:
+        for mode, session in (("group commit", _writer_session), ("per-session", _direct_session)):
+            before = db.writer_stats()["commits"]
+            r = run(session, threads, args.writes)
+            commits = db.writer_stats()["commits"] - before if session is _writer_session else r["writes"]
+            print(f"{mode:<14}{threads:>8}{r['per_sec']:>12.0f}{r['errors']:>8}{commits:>9}")
+
+    # Every successful write must be there.
+    conn = db.get_conn()
+    stored = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("income_sources", "expenses"))
+    print(f"rows stored: {stored}")
+    db.close_conn()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
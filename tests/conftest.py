@@ -0,0 +1,29 @@
+"""
+Shared test setup: app/ on sys.path, and a fresh migrated database per
+test (the fresh_db fixture) so nothing touches truebudget.sqlite3.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+# db reads TRUEBUDGET_DB when it is first imported.
+os.environ["TRUEBUDGET_DB"] = os.path.join(tempfile.mkdtemp(prefix="truebudget-tests-"), "default.sqlite3")
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """The db module pointed at a new database under tmp_path."""
+    db.close_conn()
+    path = tmp_path / "test.sqlite3"
+    monkeypatch.setattr(db, "DB_PATH", path)
+    monkeypatch.setenv("TRUEBUDGET_DB", str(path))
+    db.init_db()
+    yield db
+    db.close_conn()
@@ -0,0 +1,163 @@
+"""allocation.allocate(): exact cent totals, floors, caps, priorities, and the columnar allocate_batch()."""
+import math
+import random
+
+import numpy as np
+import pytest
+
+import budget
+import budget_vec as bv
+from allocation import allocate
+
+NAMES = ["a", "b", "c", "d", "e", "f"]
+
+
+def _cents(values):
+    return sum(round(v * 100) for v in values)
+
+
+def _random_case(rng):
+    k = rng.randint(1, len(NAMES))
+    names = NAMES[:k]
+    weights = {n: rng.choice([0.0, rng.uniform(0.01, 5.0)]) for n in names}
+    floors = {n: round(rng.uniform(0, 300), 2) for n in names if rng.random() < 0.5}
+    caps = {n: round(rng.uniform(50, 900), 2) for n in names if rng.random() < 0.5}
+    priorities = {n: rng.randint(0, 2) for n in names} if rng.random() < 0.5 else None
+    total = round(rng.uniform(0, 2500), 2)
+    return total, weights, floors, caps, priorities
+
+
+CASES = [_random_case(random.Random(seed)) for seed in range(400)]
+
+
+@pytest.mark.parametrize("total, weights, floors, caps, priorities", CASES[:200])
+def test_sums_to_total_and_respects_floors_and_caps(total, weights, floors, caps, priorities):
+    out = allocate(total, weights, floors, caps, priorities)
+    assert list(out) == list(weights)
+    assert all(v == round(v, 2) for v in out.values())
+
+    # A floor above its cap wins; a weight-0 category can only get its floor.
+    floor_cents = {n: round(floors.get(n, 0.0) * 100) for n in weights}
+    top = {n: max(round(caps[n] * 100), floor_cents[n]) if n in caps else math.inf for n in weights}
+    room = sum(top[n] if weights[n] > 0 else floor_cents[n] for n in weights)
+    assert _cents(out.values()) == (min(round(total * 100), room) if total > 0 else 0)
+    for n, v in out.items():
+        assert round(v * 100) <= top[n]
+        if 0 < sum(floor_cents.values()) <= round(total * 100):
+            assert round(v * 100) >= floor_cents[n]
+
+
+def test_plain_split_sums_exactly():
+    weights = {n: 1.0 for n in NAMES[:3]}
+    out = allocate(100.0, weights)
+    assert _cents(out.values()) == 10000
+    # Equal remainders go to the earlier category.
+    assert out == {"a": 33.34, "b": 33.33, "c": 33.33}
+
+
+def test_floor_is_part_of_the_share_not_on_top():
+    # b is held at its floor until the proportional share passes it.
+    assert allocate(100.0, {"a": 1.0, "b": 1.0}, floors={"b": 80.0}) == {"a": 20.0, "b": 80.0}
+    assert allocate(200.0, {"a": 1.0, "b": 1.0}, floors={"b": 80.0}) == {"a": 100.0, "b": 100.0}
+
+
+def test_short_floors_scale_down_evenly():
+    out = allocate(60.0, {"a": 1.0, "b": 1.0}, floors={"a": 40.0, "b": 80.0})
+    assert out == {"a": 20.0, "b": 40.0}
+
+
+def test_caps_spill_to_the_others():
+    out = allocate(300.0, {"a": 3.0, "b": 1.0, "c": 1.0}, caps={"a": 100.0})
+    assert out == {"a": 100.0, "b": 100.0, "c": 100.0}
+
+
+def test_everything_capped_leaves_the_rest_unallocated():
+    out = allocate(500.0, {"a": 1.0, "b": 1.0}, caps={"a": 50.0, "b": 75.5})
+    assert out == {"a": 50.0, "b": 75.5}
+
+
+def test_higher_priority_funded_first():
+    weights = {"a": 1.0, "b": 1.0, "c": 1.0}
+    priorities = {"a": 0, "b": 2, "c": 1}
+    # b fills to its cap, then c, and only then a.
+    out = allocate(250.0, weights, caps={"b": 100.0, "c": 100.0}, priorities=priorities)
+    assert out == {"a": 50.0, "b": 100.0, "c": 100.0}
+    out = allocate(150.0, weights, caps={"b": 100.0, "c": 100.0}, priorities=priorities)
+    assert out == {"a": 0.0, "b": 100.0, "c": 50.0}
+
+
+def test_higher_priority_floors_first():
+    out = allocate(
+        100.0, {"a": 1.0, "b": 1.0}, floors={"a": 80.0, "b": 80.0}, priorities={"a": 0, "b": 1}
+    )
+    assert out == {"a": 20.0, "b": 80.0}
+
+
+@pytest.mark.parametrize("total", [0.0, -5.0])
+def test_nothing_to_allocate(total):
+    assert allocate(total, {"a": 1.0}, floors={"a": 10.0}) == {"a": 0.0}
+
+
+def test_zero_weight_gets_only_its_floor():
+    out = allocate(100.0, {"a": 0.0, "b": 1.0}, floors={"a": 10.0})
+    assert out == {"a": 10.0, "b": 90.0}
+
+
+def _as_columns(names, d, default):
+    return np.array([float(d.get(n, default)) for n in names]) if d else None
+
+
+@pytest.mark.parametrize("total, weights, floors, caps, priorities", CASES)
+def test_matches_allocate_batch(total, weights, floors, caps, priorities):
+    names = list(weights)
+    expected = allocate(total, weights, floors, caps, priorities)
+    got = bv.allocate_batch(
+        np.array([total]),
+        np.array(list(weights.values())),
+        _as_columns(names, floors, 0.0),
+        _as_columns(names, caps, math.inf),
+        [priorities.get(n, 0) for n in names] if priorities else None,
+    )
+    assert got.shape == (1, len(names))
+    assert got[0].tolist() == list(expected.values())
+
+
+def test_allocate_batch_many_totals():
+    weights = np.array([0.30, 0.15, 0.15, 0.15, 0.15, 0.10])
+    totals = np.round(np.random.default_rng(3).uniform(-50, 5000, 300), 2)
+    got = bv.allocate_batch(totals, weights)
+    names = NAMES[: len(weights)]
+    for total, row in zip(totals.tolist(), got.tolist()):
+        assert row == list(allocate(total, dict(zip(names, weights.tolist()))).values())
+
+
+def _baseline_allocation(discretionary, focus):
+    # allocate_variable_budget() before the allocation engine: each category rounded on its own.
+    if discretionary <= 0:
+        return {k: 0.0 for k in budget.DEFAULT_VARIABLE_WEIGHTS}
+    weights = budget.DEFAULT_VARIABLE_WEIGHTS.copy()
+    for c in focus:
+        if c in weights:
+            weights[c] += 0.08
+    total_w = sum(weights.values())
+    return {k: round(discretionary * v / total_w, 2) for k, v in weights.items()}
+
+
+def test_variable_budget_within_a_cent_of_the_baseline():
+    # The deliberate change: the baseline rounded each category separately,
+    # so its amounts could miss the total by a few cents. Now they add up
+    # exactly, and each moves by at most the one cent that fixes the sum.
+    rng = random.Random(22)
+    moved = 0
+    for _ in range(2000):
+        discretionary = round(rng.uniform(0, 6000), 2)
+        focus = rng.sample(list(budget.DEFAULT_VARIABLE_WEIGHTS), rng.randint(0, 3))
+        new = budget.allocate_variable_budget(discretionary, focus)
+        old = _baseline_allocation(discretionary, focus)
+        assert list(new) == list(old)
+        assert _cents(new.values()) == round(discretionary * 100)
+        for k in new:
+            assert abs(round(new[k] * 100) - round(old[k] * 100)) <= 1
+        moved += new != old
+    # Some inputs really do differ, or this test would not be saying anything.
+    assert moved > 0
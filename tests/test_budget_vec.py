@@ -0,0 +1,102 @@
+"""budget_vec.evaluate() against the scalar functions in budget.py."""
+import random
+
+import numpy as np
+import pytest
+
+import budget
+import budget_vec as bv
+
+CATEGORIES = ["Rent", "Bills", "Insurance", "Debt", "Subscriptions", "Other Fixed"]
+
+
+def _profile(rng, n_incomes, n_expenses, goal_type, goal_value, focus):
+    freqs = bv.FREQUENCIES
+    incomes = [{"amount": round(rng.uniform(50, 3000), 2), "frequency": rng.choice(freqs)} for _ in range(n_incomes)]
+    expenses = [
+        {"amount": round(rng.uniform(5, 1500), 2), "frequency": rng.choice(freqs), "category": rng.choice(CATEGORIES)}
+        for _ in range(n_expenses)
+    ]
+    return {"incomes": incomes, "expenses": expenses, "goal_type": goal_type, "goal_value": goal_value, "focus": focus}
+
+
+def _random_profiles(seed, n):
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(n):
+        focus = rng.sample(bv.VARIABLE_CATEGORIES + ("Not a category",), rng.randint(0, 3))
+        if rng.random() < 0.2:
+            focus += focus[:1]  # a repeated focus category is boosted twice
+        goal_type = rng.choice(["amount", "percent"])
+        goal_value = rng.uniform(0, 40) if goal_type == "percent" else round(rng.uniform(0, 2500), 2)
+        profiles.append(_profile(rng, rng.randint(0, 4), rng.randint(0, 12), goal_type, goal_value, focus))
+    return profiles
+
+
+EDGE_CASES = [
+    # zero income
+    {"incomes": [], "expenses": [{"amount": 900.0, "frequency": "monthly", "category": "Rent"}],
+     "goal_type": "amount", "goal_value": 100.0, "focus": ["Groceries"]},
+    # negative discretionary: fixed costs and savings exceed income
+    {"incomes": [{"amount": 1200.0, "frequency": "biweekly"}],
+     "expenses": [{"amount": 2400.0, "frequency": "monthly", "category": "Rent"}],
+     "goal_type": "percent", "goal_value": 20.0, "focus": ["Social", "Misc"]},
+    # empty focus list, no expenses
+    {"incomes": [{"amount": 4000.0, "frequency": "monthly"}], "expenses": [],
+     "goal_type": "amount", "goal_value": 500.0, "focus": []},
+    # nothing at all
+    {"incomes": [], "expenses": [], "goal_type": "percent", "goal_value": 10.0, "focus": []},
+]
+
+
+def _evaluate(profiles):
+    incomes = [(p, i) for p, prof in enumerate(profiles) for i in prof["incomes"]]
+    expenses = [(p, e) for p, prof in enumerate(profiles) for e in prof["expenses"]]
+    inc_amounts, inc_freqs, _, _ = bv.columns_from_records([i for _, i in incomes])
+    exp_amounts, exp_freqs, exp_cats, _ = bv.columns_from_records([e for _, e in expenses], CATEGORIES)
+    if exp_cats is None:
+        exp_cats = np.zeros(0, dtype=np.int64)
+    return bv.evaluate(
+        inc_amounts, inc_freqs, exp_amounts, exp_freqs, exp_cats, len(CATEGORIES),
+        np.array([p["goal_type"] == "percent" for p in profiles]),
+        np.array([p["goal_value"] for p in profiles], dtype=np.float64),
+        bv.focus_counts([p["focus"] for p in profiles]),
+        income_profile_ids=np.array([p for p, _ in incomes], dtype=np.int64),
+        expense_profile_ids=np.array([p for p, _ in expenses], dtype=np.int64),
+        n_profiles=len(profiles),
+    )
+
+
+@pytest.mark.parametrize("profiles", [_random_profiles(11, 500), EDGE_CASES], ids=["random", "edge-cases"])
+def test_evaluate_matches_budget(profiles):
+    out = _evaluate(profiles)
+    for p, prof in enumerate(profiles):
+        income = budget.summarize_income(prof["incomes"])
+        fixed, by_cat = budget.summarize_fixed_expenses(prof["expenses"])
+        savings = budget.compute_savings_target(income, prof["goal_type"], prof["goal_value"])
+        discretionary = round(income - fixed - savings, 2)
+
+        assert out["monthly_income"][p] == income
+        assert out["fixed_total"][p] == fixed
+        present = np.isin(np.arange(len(CATEGORIES)), [CATEGORIES.index(c) for c in by_cat])
+        assert bv.category_dict(out["fixed_by_category"][p], CATEGORIES, present) == by_cat
+        assert out["savings_target"][p] == savings
+        assert out["discretionary"][p] == discretionary
+        alloc = budget.allocate_variable_budget(max(discretionary, 0.0), prof["focus"])
+        assert dict(zip(bv.VARIABLE_CATEGORIES, out["variable_alloc"][p].tolist())) == alloc
+        assert out["warnings"][p] == budget.warnings(income, fixed, savings)
+
+
+def test_edge_cases_are_covered():
+    out = _evaluate(EDGE_CASES)
+    assert out["monthly_income"][0] == 0 and out["warnings"][0] == [
+        "No income entered yet. Add at least one income source."
+    ]
+    assert out["discretionary"][1] < 0 and not out["variable_alloc"][1].any()
+    assert out["variable_alloc"][2].sum() == pytest.approx(4000.0 - 500.0)
+
+
+def test_round_cents_matches_round():
+    rng = random.Random(3)
+    values = [rng.uniform(-1e4, 1e4) for _ in range(20_000)] + [k / 1000 for k in range(-5000, 5000, 5)]
+    assert bv.round_cents(np.array(values)).tolist() == [round(v, 2) for v in values]
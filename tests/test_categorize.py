@@ -0,0 +1,45 @@
+"""Rule log pruning and catching up a compiled rule index."""
+import categorize
+
+
+def _log_rows(db):
+    return db.get_conn().execute("SELECT COUNT(*) FROM category_rule_log").fetchone()[0]
+
+
+def test_apply_rules_prunes_the_rule_log(fresh_db):
+    db = fresh_db
+    db.insert_transaction_batch([("2026-01-05", "COFFEE BAR 12", -4.5, None, None, 1)])
+    db.insert_rule_batch([("contains", f"shop {i}", "Misc", None, None, 0) for i in range(50)])
+    db.add_rule("contains", "coffee", "Dining")
+    assert _log_rows(db) == 51
+
+    assert categorize.apply_rules()["changed"] == 1
+    version = categorize.get_index().version
+    assert _log_rows(db) == 1
+    assert db.rule_changes(version)[0] == version  # the newest entry keeps the version
+
+    db.add_rule("prefix", "coffee bar", "Cafes", priority=5)
+    index = categorize.get_index()
+    assert index.version == version + 1
+    assert index.match("Coffee Bar 12", -4.5).category == "Cafes"
+
+
+def test_index_behind_the_pruned_log_is_rebuilt(fresh_db):
+    db = fresh_db
+    db.add_rule("contains", "coffee", "Dining")
+    db.add_rule("contains", "grocer", "Groceries")
+    stale = categorize.get_index()
+    coffee = next(r.id for r in stale.rules.values() if r.pattern == "coffee")
+
+    # Another process edits the rules and prunes past this index's version.
+    db.delete_rule(coffee)
+    db.add_rule("contains", "fuel", "Transport")
+    version = db.rule_changes(0)[0]
+    db.prune_rule_log(version)
+    assert db.rule_changes(stale.version)[2]
+
+    index = categorize.get_index()
+    assert index is not stale
+    assert index.version == version
+    assert sorted(r.pattern for r in index.rules.values()) == ["fuel", "grocer"]
+    assert index.match("COFFEE", -3.0) is None
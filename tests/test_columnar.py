@@ -0,0 +1,98 @@
+"""Columnar snapshot refreshes and the row change log behind them."""
+import numpy as np
+
+import columnar
+
+
+def _transactions(db, n, first=1):
+    db.insert_transaction_batch([
+        (f"2026-0{1 + i % 3}-1{i % 9}", f"t{i}", -float(i), "Dining" if i % 2 else None, None, i)
+        for i in range(first, first + n)
+    ])
+
+
+def _run(db, sql):
+    db.submit_write(lambda conn: conn.execute(sql)).result()
+
+
+def _log(db):
+    return db.get_conn().execute("SELECT seq, tbl, row_id FROM row_changes ORDER BY seq").fetchall()
+
+
+def _assert_current(db, snapshot):
+    rows = db.get_conn().execute("SELECT id, amount FROM transactions ORDER BY id").fetchall()
+    assert snapshot.rows == len(rows)
+    assert np.array_equal(snapshot["id"], [r[0] for r in rows])
+    assert np.array_equal(snapshot["amount"], [r[1] for r in rows])
+
+
+def test_changes_are_only_logged_for_snapshot_tables(fresh_db):
+    db = fresh_db
+    _transactions(db, 20)
+    _run(db, "UPDATE transactions SET amount = amount - 1")
+    _run(db, "DELETE FROM transactions WHERE id > 15")
+    assert _log(db) == []
+
+    _assert_current(db, columnar.refresh("transactions"))
+    _run(db, "UPDATE transactions SET amount = amount - 1 WHERE id = 3")
+    _run(db, "UPDATE expenses SET amount = 1")  # no expenses snapshot, no rows either
+    assert [(t, r) for _, t, r in _log(db)] == [("transactions", 3)]
+
+
+def test_refresh_applies_every_change_after_pruning(fresh_db):
+    db = fresh_db
+    _transactions(db, 100)
+    columnar.refresh("transactions")
+    _run(db, "UPDATE transactions SET amount = amount - 1 WHERE id <= 5")
+    _assert_current(db, columnar.refresh("transactions"))
+    last = _log(db)[-1][0]
+
+    # Deleted ids are reused by the next inserts; all ten must be patched.
+    _run(db, "DELETE FROM transactions WHERE id > 90")
+    _transactions(db, 10, first=1000)
+    assert _log(db)[0][0] >= last  # pruning keeps the newest entry, so seq never restarts
+    _assert_current(db, columnar.refresh("transactions"))
+    assert len(_log(db)) == 1
+
+
+def test_capped_log_rewrites_the_snapshot(fresh_db):
+    db = fresh_db
+    _transactions(db, 50)
+    columnar.refresh("transactions")
+    # As if ROW_CHANGES_MAX changes had piled up with no refresh.
+    _run(db, f"UPDATE row_change_tables SET since = since - {db.ROW_CHANGES_MAX}")
+    _run(db, "UPDATE transactions SET amount = 7 WHERE id = 1")
+    assert db.row_changes("transactions", 0)[2] is False
+    _run(db, "UPDATE transactions SET amount = 8 WHERE id = 2")
+    assert len(_log(db)) == 1  # no longer logging
+
+    snapshot = columnar.refresh("transactions")
+    assert snapshot.header["generation"] == 2
+    _assert_current(db, snapshot)
+    assert db.row_changes("transactions", snapshot.header["log_seq"])[2]
+
+
+def test_open_table_survives_refreshes(fresh_db):
+    db = fresh_db
+    _transactions(db, 100)
+    before = columnar.refresh("transactions")
+    amounts = np.array(before["amount"])
+    days = np.array(before["day"])
+
+    _run(db, "UPDATE transactions SET amount = amount - 1 WHERE id <= 5")
+    patched = columnar.refresh("transactions")  # a new copy of amount; the old file is unlinked
+    assert patched.header["columns"]["amount"]["file"] != before.header["columns"]["amount"]["file"]
+
+    _run(db, "DELETE FROM transactions WHERE id > 90")
+    rebuilt = columnar.refresh("transactions")  # a new generation of every file
+    _transactions(db, 10, first=1000)
+    appended = columnar.refresh("transactions")
+    assert not any((before.path / spec["file"]).exists() for spec in before.header["columns"].values())
+
+    # The tables opened earlier still read their own rows from the unlinked files.
+    assert np.array_equal(before["amount"], amounts)
+    assert np.array_equal(before["day"], days)
+    assert before.frame()["amount"].sum() == amounts.sum()
+    assert patched["amount"][0] == amounts[0] - 1
+    assert rebuilt.rows == 90
+    _assert_current(db, appended)
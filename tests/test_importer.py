@@ -0,0 +1,94 @@
+"""Importer row validation."""
+import pytest
+
+import importer
+
+
+def _import(tmp_path, text):
+    path = tmp_path / "upload.csv"
+    path.write_text(text)
+    return importer.import_file(path)
+
+
+@pytest.mark.parametrize("value", ["nan", "NaN", "inf", "-inf", "Infinity", "1e999"])
+def test_parse_amount_rejects_non_finite(value):
+    with pytest.raises(ValueError):
+        importer.parse_amount(value)
+
+
+def test_parse_amount_formats():
+    assert importer.parse_amount("12.50") == 12.5
+    assert importer.parse_amount(" $1,234.00 ") == 1234.0
+    assert importer.parse_amount("(40)") == -40.0
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2026-01-05", "2026-01-05"),
+    ("2026-01-05T09:30:00", "2026-01-05"),
+    ("01/05/2026", "2026-01-05"),
+    ("2026-13-45", None),
+    ("2026-02-30", None),
+    ("2026-xx-01", None),
+])
+def test_normalize_date(value, expected):
+    assert importer.normalize_date(value) == expected
+
+
+def test_impossible_dates_are_rejected(fresh_db, tmp_path):
+    progress = _import(tmp_path, (
+        "date,description,amount\n"
+        "2026-01-05,Coffee,-4.50\n"
+        "2026-13-45,Broken,-1.00\n"
+        "2026-02-30,Broken,-1.00\n"
+    ))
+    assert (progress.rows_read, progress.rows_inserted, progress.rows_rejected) == (3, 1, 2)
+
+
+def test_non_finite_transactions_are_rejected(fresh_db, tmp_path):
+    progress = _import(tmp_path, (
+        "date,description,amount\n"
+        "2026-01-05,Coffee,-4.50\n"
+        "2026-01-06,Broken,nan\n"
+        "2026-01-07,Broken,inf\n"
+        "2026-01-08,Broken,-Infinity\n"
+    ))
+    assert (progress.rows_read, progress.rows_inserted, progress.rows_rejected, progress.rows_skipped) == (4, 1, 3, 0)
+    rows = fresh_db.get_conn().execute("SELECT description, amount FROM transactions").fetchall()
+    assert [tuple(r) for r in rows] == [("Coffee", -4.5)]
+
+
+def test_non_finite_recurring_rows_are_rejected(fresh_db, tmp_path):
+    progress = _import(tmp_path, (
+        "name,amount,frequency,category\n"
+        "Salary,4000,monthly,\n"
+        "Rent,nan,monthly,Rent\n"
+        "Bonus,inf,monthly,\n"
+    ))
+    assert (progress.rows_inserted, progress.rows_rejected) == (1, 2)
+    assert [i["name"] for i in fresh_db.list_income()] == ["Salary"]
+    assert fresh_db.list_expenses() == []
+
+
+UNSORTED = (
+    "date,description,amount\n"
+    "2026-01-05,Coffee,-4.50\n"
+    "2026-01-06,Lunch,-12.00\n"
+    "2026-01-05,Coffee,-4.50\n"
+    "2026-01-04,Coffee,-4.50\n"
+    "2026-01-05,Coffee,-4.50\n"
+)
+
+
+def test_repeats_are_kept_in_unsorted_files(fresh_db, tmp_path):
+    progress = _import(tmp_path, UNSORTED)
+    assert (progress.rows_read, progress.rows_inserted, progress.rows_skipped) == (5, 5, 0)
+    coffees = fresh_db.get_conn().execute(
+        "SELECT COUNT(*) FROM transactions WHERE date = '2026-01-05' AND description = 'Coffee'"
+    ).fetchone()[0]
+    assert coffees == 3
+
+    # The same file again adds nothing, however its rows are ordered.
+    again = _import(tmp_path, UNSORTED)
+    assert (again.rows_inserted, again.rows_skipped) == (0, 5)
+    reordered = "date,description,amount\n" + "".join(sorted(UNSORTED.splitlines(True)[1:]))
+    assert _import(tmp_path, reordered).rows_inserted == 0
@@ -0,0 +1,41 @@
+"""JobQueue deduplication under concurrent submits."""
+import threading
+import time
+
+import jobs
+
+
+def test_concurrent_submits_of_one_payload_share_a_job(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def runner(payload, model, refresh):
+        calls.append(payload)
+        release.wait(10)
+        yield "advice"
+
+    def slow_cache_miss(payload, model):
+        # Holds every submit between its two lock sections, where the race was.
+        time.sleep(0.05)
+        return None
+
+    monkeypatch.setattr(jobs, "cached_advice", slow_cache_miss)
+    q = jobs.JobQueue(workers=1, runner=runner)
+    payload = {"income": 4000, "expenses": 1500}
+    ids = []
+    start = threading.Barrier(8)
+
+    def submit(n):
+        start.wait()
+        ids.append(q.submit(f"session-{n}", payload))
+
+    threads = [threading.Thread(target=submit, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    release.set()
+
+    assert len(set(ids)) == 1
+    assert q.result(ids[0], timeout=10) == "advice"
+    assert len(calls) == 1
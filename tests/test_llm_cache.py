@@ -0,0 +1,27 @@
+"""LLM cache hits must not invalidate the budget caches."""
+import time
+
+
+def test_cache_hit_keeps_data_version(fresh_db):
+    db = fresh_db
+    db.llm_cache_put("k1", "m", 1, "advice one")
+    db.load_totals()
+    version = db.data_version()
+    for _ in range(5):
+        assert db.llm_cache_get("k1", 3600) == "advice one"
+    time.sleep(0.05)  # a queued write would have landed by now
+    assert db.data_version() == version
+
+
+def test_hits_count_as_recent_use_on_evict(fresh_db):
+    db = fresh_db
+    db.llm_cache_put("old", "m", 1, "a")
+    time.sleep(0.01)
+    db.llm_cache_put("new", "m", 1, "b")
+    time.sleep(0.01)
+    assert db.llm_cache_get("old", 3600) == "a"
+    assert db.llm_cache_evict(max_entries=1, max_bytes=1 << 20, max_age=3600) == 1
+    assert db.llm_cache_get("old", 3600) == "a"
+    assert db.llm_cache_get("new", 3600) is None
+    hits = db.get_conn().execute("SELECT hits FROM llm_cache WHERE key = 'old'").fetchone()[0]
+    assert hits == 1  # the second get is still pending
@@ -0,0 +1,56 @@
+"""Streaming advice from Ollama's NDJSON chat API, against benchmarks/fake_ollama.py."""
+import sys
+
+import pytest
+import requests
+
+import llm
+from budget import advice_payload
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+from fake_ollama import FakeOllama  # noqa: E402
+
+PAYLOAD = advice_payload(None, 4000.0, 1500.0, {"Rent": 1500.0})
+
+
+@pytest.fixture
+def ollama(request, monkeypatch):
+    fake = FakeOllama(latency=0.0, tokens=25, **getattr(request, "param", {})).start()
+    monkeypatch.setattr(llm, "OLLAMA_HOST", fake.url)
+    monkeypatch.setattr(llm, "OLLAMA_URL", f"{fake.url}/api/chat")
+    yield fake
+    fake.stop()
+
+
+@pytest.mark.usefixtures("fresh_db")
+def test_stream_is_reassembled_and_cached(ollama):
+    chunks = list(llm.stream_advice(PAYLOAD))
+    expected = "".join(ollama.answer(llm._messages(PAYLOAD)))
+    assert len(chunks) == 25
+    assert "".join(chunks) == expected
+    assert llm.cached_advice(PAYLOAD) == expected
+
+    # The second request is answered from the cache without reaching the server.
+    assert "".join(llm.stream_advice(PAYLOAD)) == expected
+    assert ollama.requests == 1
+
+
+@pytest.mark.usefixtures("fresh_db")
+@pytest.mark.parametrize("ollama", [{"drop_after": 7}], indirect=True)
+def test_dropped_stream_is_not_cached(ollama):
+    received = []
+    with pytest.raises(requests.RequestException):
+        for chunk in llm.stream_advice(PAYLOAD):
+            received.append(chunk)
+    assert len(received) == 7
+    assert llm.cached_advice(PAYLOAD) is None
+
+
+@pytest.mark.usefixtures("fresh_db")
+def test_stream_usage_comes_from_the_final_message(ollama):
+    usage = {}
+    text = "".join(llm._stream_chat(llm._messages(PAYLOAD), llm.DEFAULT_MODEL, usage))
+    assert text == "".join(ollama.answer(llm._messages(PAYLOAD)))
+    assert usage["output_tokens"] == 25
+    assert usage["prompt_tokens"] > 0
@@ -0,0 +1,52 @@
+"""Reruns must not wait on Ollama's health probe, whether it refuses or never answers."""
+import socket
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import db
+import llm
+from conftest import ROOT
+
+
+@pytest.fixture(params=["refused", "silent"])
+def dead_ollama(request, monkeypatch):
+    """An OLLAMA_HOST that refuses connections, or accepts them and never answers."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    if request.param == "refused":
+        sock.close()
+    else:
+        sock.listen(16)  # connections complete in the backlog; nothing ever reads them
+    monkeypatch.setattr(llm, "OLLAMA_HOST", f"http://127.0.0.1:{port}")
+    monkeypatch.setattr(llm, "OLLAMA_URL", f"http://127.0.0.1:{port}/api/chat")
+    # Every rerun finds the last probe stale, so each one would pay for a blocking probe.
+    monkeypatch.setattr(llm, "HEALTH_TTL", 0.0)
+    monkeypatch.setitem(llm._health, "ok", None)
+    monkeypatch.setitem(llm._health, "checked", float("-inf"))
+    monkeypatch.setitem(llm._health, "probing", False)
+    yield
+    sock.close()
+
+
+@pytest.mark.usefixtures("fresh_db", "dead_ollama")
+def test_reruns_stay_flat_when_ollama_is_unreachable():
+    db.add_income("Salary", 4000, "monthly")
+    db.add_expense("Rent", 1500, "monthly", "Housing")
+    at = AppTest.from_file(str(ROOT / "app" / "main.py"), default_timeout=60).run()
+    assert not at.exception
+    for section in ("3) Advice", "2) Dashboard", "1) Inputs"):
+        at.radio(key="section").set_value(section).run()
+        assert not at.exception
+
+    times = []
+    for _ in range(5):
+        started = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - started)
+    assert not at.exception
+    # A rerun that waited for the probe would take at least PROBE_TIMEOUT (or the refusal round trip every time).
+    assert max(times) < llm.PROBE_TIMEOUT, times
+    assert llm.ollama_status() is not True
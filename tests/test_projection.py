@@ -0,0 +1,73 @@
+"""Cash-flow projection: pay calendar and seeded simulation."""
+from datetime import date
+
+import numpy as np
+import pytest
+
+import projection
+
+INCOMES = [
+    {"amount": 1850.0, "frequency": "biweekly", "created_at": "2026-01-02 09:00:00"},
+    {"amount": 120.0, "frequency": "weekly"},
+]
+EXPENSES = [
+    {"amount": 1400.0, "frequency": "monthly", "category": "Rent", "created_at": "2025-12-31"},
+    {"amount": 60.0, "frequency": "monthly", "category": "Bills", "created_at": "2026-02-15"},
+]
+
+
+def _dates(item, start, end):
+    return [d.isoformat() for d in projection.occurrences(item, start, end)]
+
+
+def test_biweekly_keeps_its_anchor():
+    item = {"frequency": "biweekly", "created_at": "2026-01-02"}
+    assert _dates(item, date(2026, 1, 20), date(2026, 3, 1)) == ["2026-01-30", "2026-02-13", "2026-02-27"]
+    # An anchor after the start is the first payment.
+    assert _dates(item, date(2025, 12, 1), date(2026, 1, 17)) == ["2026-01-02", "2026-01-16"]
+
+
+def test_weekly_without_anchor_starts_on_start():
+    assert _dates({"frequency": "weekly"}, date(2026, 3, 3), date(2026, 3, 24)) == ["2026-03-03", "2026-03-10", "2026-03-17"]
+
+
+def test_monthly_month_end_anchor():
+    item = {"frequency": "monthly", "created_at": "2026-01-31"}
+    assert _dates(item, date(2026, 1, 1), date(2026, 5, 1)) == ["2026-01-31", "2026-02-28", "2026-03-31", "2026-04-30"]
+    # Leap years give February its 29th; the anchor day comes back after a short month.
+    leap = {"frequency": "monthly", "start_date": "2027-12-30"}
+    assert _dates(leap, date(2028, 1, 15), date(2028, 4, 1)) == ["2028-01-30", "2028-02-29", "2028-03-30"]
+
+
+def test_monthly_anchor_before_start_and_end_is_exclusive():
+    item = {"frequency": "monthly", "created_at": "2025-06-15"}
+    assert _dates(item, date(2026, 1, 1), date(2026, 3, 15)) == ["2026-01-15", "2026-02-15"]
+
+
+def test_unknown_frequency():
+    with pytest.raises(ValueError):
+        projection.occurrences({"frequency": "yearly"}, date(2026, 1, 1), date(2026, 2, 1))
+
+
+def test_fixed_seed_is_independent_of_workers():
+    kwargs = dict(monthly_variable=900.0, start_balance=500.0, months=3, paths=5000, seed=42, start=date(2026, 1, 5))
+    one = projection.simulate(INCOMES, EXPENSES, workers=1, **kwargs)
+    two = projection.simulate(INCOMES, EXPENSES, workers=2, **kwargs)
+    again = projection.simulate(INCOMES, EXPENSES, workers=1, **kwargs)
+    for field in ("expected_balance", "mean_balance", "std_balance", "prob_negative_by_day", "min_balance", "end_balance"):
+        assert np.array_equal(getattr(one, field), getattr(two, field)), field
+        assert np.array_equal(getattr(one, field), getattr(again, field)), field
+    assert one.paths == 5000 and len(one.min_balance) == 5000
+    other = projection.simulate(INCOMES, EXPENSES, workers=1, **{**kwargs, "seed": 43})
+    assert not np.array_equal(one.end_balance, other.end_balance)
+
+
+def test_expected_balance_follows_the_calendar():
+    proj = projection.simulate(INCOMES, EXPENSES, 0.0, start_balance=100.0, months=1, paths=10, start=date(2026, 1, 1))
+    assert proj.days == 31
+    # Rent on Dec 31 is anchored to month end, so it is paid on Jan 31, the last day.
+    paid = {d.isoformat(): float(v) for d, v in zip(proj.dates(), np.diff(np.r_[100.0, proj.expected_balance]))}
+    assert paid["2026-01-02"] == 1850.0
+    assert paid["2026-01-01"] == paid["2026-01-08"] == 120.0
+    assert paid["2026-01-31"] == -1400.0
+    assert proj.std_balance.max() == 0.0  # no variable spending, so every path is the same
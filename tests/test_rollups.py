@@ -0,0 +1,50 @@
+"""transaction_rollups stays equal to a recompute as transactions change."""
+import random
+
+
+def _rollups(db):
+    rows = db.get_conn().execute("SELECT month, category, spent, received, n FROM transaction_rollups")
+    return {(m, c): (round(s, 6), round(r, 6), n) for m, c, s, r, n in rows}
+
+
+def _recomputed(db):
+    db.rebuild_rollups()
+    return _rollups(db)
+
+
+def test_rollups_follow_updates_and_deletes(fresh_db):
+    db = fresh_db
+    rng = random.Random(7)
+    categories = ["Groceries", "Dining", "Travel", None]
+    db.insert_transaction_batch([
+        (f"2026-{rng.randint(1, 4):02d}-{rng.randint(1, 28):02d}", f"t{i}", round(rng.uniform(-200, 100), 2),
+         rng.choice(categories), None, i)
+        for i in range(400)
+    ])
+
+    def op(conn):
+        ids = [r[0] for r in conn.execute("SELECT id FROM transactions")]
+        rng.shuffle(ids)
+        for tid in ids[:100]:
+            conn.execute(
+                "UPDATE transactions SET category = ?, amount = ?, date = ? WHERE id = ?",
+                (rng.choice(categories), round(rng.uniform(-200, 100), 2), f"2026-0{rng.randint(1, 5)}-15", tid),
+            )
+        conn.executemany("DELETE FROM transactions WHERE id = ?", [(t,) for t in ids[100:250]])
+        # Empty one month/category completely; its rollup row must go.
+        conn.execute("DELETE FROM transactions WHERE substr(date, 1, 7) = '2026-02' AND category = 'Travel'")
+
+    db.submit_write(op).result()
+    live = _rollups(db)
+    assert live == _recomputed(db)
+    assert ("2026-02", "Travel") not in live
+    assert all(n > 0 for _, _, n in live.values())
+
+
+def test_rollup_cleanup_is_keyed(fresh_db):
+    # The emptied-row DELETE must name its month and category, not scan the table.
+    sql = fresh_db.get_conn().execute(
+        "SELECT group_concat(sql, ' ') FROM sqlite_master WHERE name IN ('trg_transactions_ad', 'trg_transactions_au')"
+    ).fetchone()[0]
+    assert "WHERE n <= 0" not in sql
+    assert sql.count("AND n <= 0") == 2
@@ -0,0 +1,40 @@
+"""Scenario grid lookups against the scalar budget.py path."""
+import random
+
+import pytest
+
+import budget
+import scenarios
+
+
+@pytest.mark.parametrize("income, fixed, focus", [
+    (5230.17, 1890.55, ["Social"]),
+    (3100.0, 2750.0, []),                       # fixed costs high: warnings and negative discretionary
+    (0.0, 450.0, ["Groceries", "Groceries"]),   # no income
+])
+def test_grid_matches_budget(income, fixed, focus):
+    savings = scenarios.savings_axis(income, extra=[333.33])
+    grid = scenarios.sweep(income, fixed, savings, scenarios.INCOME_CHANGES, scenarios.EXPENSE_CUTS, focus)
+    rng = random.Random(5)
+    points = [(s, i, e) for s in savings[:3] for i in scenarios.INCOME_CHANGES[:2] for e in scenarios.EXPENSE_CUTS[:2]]
+    points += [
+        (rng.choice(savings), rng.choice(scenarios.INCOME_CHANGES), rng.choice(scenarios.EXPENSE_CUTS))
+        for _ in range(300)
+    ]
+    for s, i, e in points:
+        got = grid.lookup(s, i, e)
+        inc, fix = got["monthly_income"], got["fixed_total"]
+        assert inc == income * (1.0 + i) and fix == fixed * (1.0 - e)
+        discretionary = round(inc - fix - s, 2)
+        assert got["discretionary"] == discretionary
+        assert got["variable_alloc"] == budget.allocate_variable_budget(max(discretionary, 0.0), focus)
+        assert got["warnings"] == budget.warnings(inc, fix, float(s))
+
+
+def test_allocations_are_the_lookup_values():
+    grid = scenarios.sweep(4000.0, 1500.0, scenarios.savings_axis(4000.0), scenarios.INCOME_CHANGES, [0.0, 0.1])
+    alloc = grid.allocations()
+    assert alloc.shape == grid.shape + (6,)
+    s, i, e = 17, 3, 1
+    looked_up = grid.lookup(float(grid.savings_targets[s]), scenarios.INCOME_CHANGES[i], 0.1)["variable_alloc"]
+    assert list(looked_up.values()) == alloc[s, i, e].tolist()
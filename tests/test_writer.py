@@ -0,0 +1,89 @@
+"""
+The single writer thread under concurrent sessions: every write lands, none
+time out on SQLite's lock, and a failing op only fails its own future.
+"""
+import sqlite3
+import threading
+
+import pytest
+
+THREADS = 16
+WRITES = 60
+
+
+def test_concurrent_writers_lose_nothing(fresh_db):
+    db = fresh_db
+    errors = []
+
+    def session(i):
+        pending = []
+        for k in range(WRITES):
+            try:
+                # Mix waited writes with fire-and-forget ones, as the UI does.
+                if k % 3 == 0:
+                    pending.append(db.add_expense(f"bill {i}-{k}", 10.0 + k, "monthly", "Utilities", wait=False))
+                elif k % 3 == 1:
+                    db.add_income(f"pay {i}-{k}", 100.0 + k, "biweekly")
+                else:
+                    db.insert_income_batch([(f"batch {i}-{k}", 1.0, "weekly")])
+            except Exception as e:
+                errors.append(e)
+        for fut in pending:
+            try:
+                fut.result()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    incomes = {r["name"] for r in db.list_income()}
+    expenses = {r["name"] for r in db.list_expenses()}
+    assert len(incomes) == THREADS * sum(1 for k in range(WRITES) if k % 3)
+    assert len(expenses) == THREADS * sum(1 for k in range(WRITES) if k % 3 == 0)
+    assert {f"pay 3-{k}" for k in range(1, WRITES, 3)} <= incomes
+    assert {f"bill 7-{k}" for k in range(0, WRITES, 3)} <= expenses
+    # Grouping means fewer commits than writes, never more.
+    stats = db.writer_stats()
+    assert stats["ops"] >= THREADS * WRITES
+    assert stats["commits"] <= stats["ops"]
+
+
+def test_failing_op_only_fails_its_own_future(fresh_db):
+    db = fresh_db
+
+    def boom(conn):
+        conn.execute("INSERT INTO income_sources (name, amount, frequency) VALUES ('rolled back', 1, 'weekly')")
+        raise KeyboardInterrupt
+
+    bad = db.submit_write(boom)
+    good = db.add_income("kept", 5.0, "monthly", wait=False)
+    with pytest.raises(KeyboardInterrupt):
+        bad.result()
+    good.result()
+    db.add_income("after", 6.0, "monthly")
+    assert {r["name"] for r in db.list_income()} == {"kept", "after"}
+
+
+def test_dead_writer_is_replaced(fresh_db):
+    db = fresh_db
+    writer = db._get_writer()
+
+    def close_connection(conn):
+        # Leaves the writer unable even to roll back: past per-op recovery.
+        conn.close()
+        raise RuntimeError("op failed")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.submit_write(close_connection).result()
+    writer.thread.join(timeout=5)
+    assert writer.dead is not None
+    with pytest.raises(RuntimeError, match="died"):
+        writer.submit(lambda conn: None)
+    # The next write starts a fresh writer.
+    db.add_income("still works", 1.0, "monthly")
+    assert [r["name"] for r in db.list_income()] == ["still works"]